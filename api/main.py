@@ -1,13 +1,26 @@
 import sys
 import os
-from fastapi import FastAPI, UploadFile, File
+import asyncio
+from typing import List
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.responses import JSONResponse
 from api.routes import chat, tools
-from rag.retriever import ingest_multimodal_data
+from api.services.ingestion import ingestion_jobs
+from api.services.analytics import flight_analytics
+from api.services.startup import WARMUP_ON_STARTUP, start_warm_up, readiness
 
 # Add the project root to the python path to allow imports from sibling directories
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-app = FastAPI(title="India Drone Intel API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Vector store, LLM clients, pandas and fpdf are otherwise loaded by the first request that needs them
+    if WARMUP_ON_STARTUP:
+        start_warm_up()
+    yield
+
+app = FastAPI(title="India Drone Intel API", lifespan=lifespan)
 
 # Register modular routes
 app.include_router(chat.router, tags=["AI Chat"])
@@ -19,24 +32,61 @@ async def root():
 
 @app.get("/analytics")
 async def analytics():
-    return {"status": "System Operational", "active_modules": ["RAG", "Flight Calc", "ROI Calc", "Compliance", "Recommendation"]}
+    report = {"status": "System Operational", "active_modules": ["RAG", "Flight Calc", "ROI Calc", "Compliance", "Recommendation", "Fleet Analytics"]}
+    try:
+        # Only log rows appended since the last call are parsed
+        report["flight_logs"] = await asyncio.to_thread(flight_analytics.report)
+    except FileNotFoundError:
+        report["flight_logs"] = {"error": "Flight logs not found. Please run data_generation.py"}
+    except Exception as e:
+        report["flight_logs"] = {"error": str(e)}
+    return report
+
+@app.get("/ready")
+async def ready():
+    # 503 until the optional startup warm-up has finished
+    is_ready, report = readiness()
+    return JSONResponse(report, status_code=200 if is_ready else 503)
+
+async def _spool_and_submit(file: UploadFile):
+    # Stream the upload to a unique spool file instead of reading it into memory
+    fd, spool_path = ingestion_jobs.new_spool_file(file.filename)
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await file.read(1024 * 1024):
+                await asyncio.to_thread(buffer.write, chunk)
+    except Exception:
+        os.remove(spool_path)
+        raise
+
+    # Parsing, vision and embedding run on the background ingestion workers
+    return ingestion_jobs.submit(spool_path, file.filename, file.content_type)
 
 @app.post("/upload")
 async def upload_document(file: UploadFile = File(...)):
-    # Save file temporarily to handle it as a path for multi-modal ingestion
-    temp_filename = f"temp_{file.filename}"
-    with open(temp_filename, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
-    
     try:
-        chunks = ingest_multimodal_data(temp_filename, file.content_type)
-        return {"message": "Document processed successfully", "chunks_added": chunks}
+        job_id = await _spool_and_submit(file)
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
+    return {"message": "Document queued for processing", "job_id": job_id, "status": "queued"}
+
+@app.post("/upload/batch")
+async def upload_documents(files: List[UploadFile] = File(...)):
+    # One job per file; vision calls across jobs share the vision model's concurrency cap
+    jobs = []
+    for file in files:
+        try:
+            jobs.append({"filename": file.filename, "job_id": await _spool_and_submit(file), "status": "queued"})
+        except Exception as e:
+            jobs.append({"filename": file.filename, "job_id": None, "status": "failed", "error": str(e)})
+    return {"message": f"{len(files)} documents queued for processing", "jobs": jobs}
+
+@app.get("/upload/{job_id}")
+async def upload_status(job_id: str):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job.")
+    return job
 
 if __name__ == "__main__":
     import uvicorn
@@ -9,6 +9,24 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     sources: List[str]
+    cached: bool = False
+    context_tokens: Optional[int] = None
+    context_budget: Optional[int] = None
+
+# Models for Batch Chat
+class BatchChatRequest(BaseModel):
+    prompts: List[str]
+
+class BatchChatItem(BaseModel):
+    answer: Optional[str] = None
+    sources: List[str] = []
+    cached: bool = False
+    context_tokens: Optional[int] = None
+    context_budget: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatItem]
 
 # Model for Drone Recommendation Input
 class RecommendRequest(BaseModel):
@@ -27,3 +45,35 @@ class ComplianceRequest(BaseModel):
     zone: str
     altitude_ft: float
     purpose: str = "Recreational"
+
+
+# Models for the flight-envelope sweep
+# Values per axis; the route also caps the whole grid (FLIGHT_SWEEP_MAX_POINTS)
+SWEEP_MAX_STEPS = 100_000
+
+class SweepRange(BaseModel):
+    start: float = Field(ge=0, le=1e6)
+    stop: float = Field(ge=0, le=1e6)
+    steps: int = Field(1, ge=1, le=SWEEP_MAX_STEPS)  # evenly spaced values from start to stop, both included
+
+class FlightSweepRequest(BaseModel):
+    battery_ah: SweepRange
+    drone_weight: SweepRange
+    payload: SweepRange
+    wind: List[str] = ["Calm"]
+
+# Models for the Monte Carlo ROI simulation
+class DistributionSpec(BaseModel):
+    dist: str  # fixed, uniform, normal, lognormal, triangular or empirical
+    params: List[float]
+
+class RoiSimulationRequest(BaseModel):
+    investment: Optional[DistributionSpec] = None
+    daily_revenue: Optional[DistributionSpec] = None
+    utilisation_days: Optional[DistributionSpec] = None  # revenue days per year
+    operating_costs: Optional[DistributionSpec] = None  # monthly, as in /calculate/roi
+    use_case: str = "General"
+    samples: int = Field(1_000_000, ge=1)
+    seed: Optional[int] = None
+    horizon_years: int = Field(5, ge=1, le=50)
+    discount_rate: float = Field(0.12, gt=-1)
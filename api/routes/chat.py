@@ -1,9 +1,14 @@
+import os
+import json
 from fastapi import APIRouter, HTTPException
-from api.models.schemas import ChatRequest, ChatResponse
+from fastapi.responses import StreamingResponse
+from api.models.schemas import ChatRequest, ChatResponse, BatchChatRequest, BatchChatResponse
 from api.services.orchestrator import drone_orchestrator
 
 router = APIRouter()
 
+CHAT_BATCH_MAX_PROMPTS = int(os.getenv("CHAT_BATCH_MAX_PROMPTS", "256"))
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(input_data: ChatRequest):
     """
@@ -18,7 +23,48 @@ async def chat_endpoint(input_data: ChatRequest):
         # orchestrator returns dict with "answer" and "sources"
         return ChatResponse(
             answer=result.get("answer", "No answer generated."),
-            sources=result.get("sources", [])
+            sources=result.get("sources", []),
+            cached=result.get("cached", False),
+            context_tokens=result.get("context_tokens"),
+            context_budget=result.get("context_budget")
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Chat Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Chat Error: {str(e)}")
+
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch_endpoint(input_data: BatchChatRequest):
+    """
+    Answers many prompts in one call (evaluation runs, FAQ pre-generation).
+    Results come back in input order, with per-item errors.
+    """
+    if len(input_data.prompts) > CHAT_BATCH_MAX_PROMPTS:
+        raise HTTPException(status_code=413, detail=f"At most {CHAT_BATCH_MAX_PROMPTS} prompts per batch.")
+    results = await drone_orchestrator.process_batch(input_data.prompts)
+    return BatchChatResponse(results=results)
+
+@router.get("/chat/stats")
+async def chat_stats():
+    """
+    Answer-cache, request-coalescing and model-client (connection reuse, queueing) counters.
+    """
+    return drone_orchestrator.stats()
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(input_data: ChatRequest):
+    """
+    Server-Sent Events variant of /chat.
+    Sends the sources as soon as retrieval finishes, then the answer token by token.
+    """
+    async def event_stream():
+        try:
+            async for event in drone_orchestrator.stream_query(input_data.prompt):
+                data = {k: v for k, v in event.items() if k != "event"}
+                yield f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Chat Error: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,20 +1,25 @@
 import os
+import json
 import uuid
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import FileResponse
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from starlette.background import BackgroundTask
-from fpdf import FPDF
-from fpdf.enums import XPos, YPos
 
-from api.models.schemas import ComplianceRequest, RecommendRequestSimple
+from api.models.schemas import ComplianceRequest, RecommendRequestSimple, FlightSweepRequest, RoiSimulationRequest
 from mcp_server.server import mcp_engine
-from mcp_server.tools.flight_calc import get_flight_estimates
+from mcp_server.catalog import drone_catalog
+from mcp_server.tools.flight_calc import get_flight_estimates, get_flight_sweep
 from mcp_server.tools.roi_calc import get_roi_analysis
+from mcp_server.tools.roi_simulation import simulate_roi
 from mcp_server.tools.compliance import check_regulation_compliance
+from api.services.compliance_batch import BatchInputError, read_flights, flights_from_records, evaluate_flights, iter_ndjson
 
 router = APIRouter()
 
+FLIGHT_SWEEP_MAX_POINTS = int(os.getenv("FLIGHT_SWEEP_MAX_POINTS", "1000000"))
+
 # Helper to sanitize text for core fonts (Latin-1)
 def clean_text(text):
     return text.encode('latin-1', 'replace').decode('latin-1')
@@ -23,14 +28,95 @@ def clean_text(text):
 async def flight_tool(bat: float, weight: float, pay: float, wind: str = "Calm"):
     return get_flight_estimates(bat, weight, pay, wind)
 
+@router.post("/calculate/flight/sweep")
+async def flight_sweep_tool(params: FlightSweepRequest):
+    """
+    Evaluates /calculate/flight over a whole grid of battery, weight, payload and wind values.
+    The matrices are nested lists indexed [wind][battery_ah][drone_weight][payload].
+    """
+    import math
+    import numpy as np
+    if not params.wind:
+        raise HTTPException(status_code=422, detail="Give at least one wind condition.")
+    ranges = {"battery_ah": params.battery_ah, "drone_weight": params.drone_weight, "payload": params.payload}
+    # Checked on the requested sizes, before anything is allocated
+    shape = [len(params.wind)] + [r.steps for r in ranges.values()]
+    if math.prod(shape) > FLIGHT_SWEEP_MAX_POINTS:
+        raise HTTPException(status_code=413, detail=f"At most {FLIGHT_SWEEP_MAX_POINTS} grid points per sweep.")
+    axes = {name: np.linspace(r.start, r.stop, r.steps) for name, r in ranges.items()}
+    if (np.add.outer(axes["drone_weight"], axes["payload"]) == 0).any():
+        raise HTTPException(status_code=422, detail="drone_weight + payload must not be zero anywhere in the grid.")
+
+    def render():
+        # Computed and serialized in the worker thread: converting a large grid to lists blocks like the math does
+        with np.errstate(over="ignore"):
+            result = get_flight_sweep(axes["battery_ah"], axes["drone_weight"], axes["payload"], params.wind)
+        # Near-zero masses can overflow to inf, which JSON cannot carry
+        if not all(np.isfinite(matrix).all() for matrix in result.values()):
+            return None
+        return json.dumps({
+            "dims": ["wind", "battery_ah", "drone_weight", "payload"],
+            "shape": shape,
+            "axes": {"wind": params.wind, **{name: values.tolist() for name, values in axes.items()}},
+            **{name: matrix.tolist() for name, matrix in result.items()}
+        }, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    body = await asyncio.to_thread(render)
+    if body is None:
+        raise HTTPException(status_code=422, detail="The grid overflows: increase drone_weight + payload or reduce battery_ah.")
+    # Sent pre-rendered: skips FastAPI's per-element encoding of large nested lists
+    return Response(body, media_type="application/json")
+
 @router.get("/calculate/roi")
 async def roi_tool(inv: float, rev: float, op_costs: float = 2500, use_case: str = "General"):
     return get_roi_analysis(inv, rev, op_costs, use_case)
 
+@router.post("/calculate/roi/simulate")
+async def roi_simulation_tool(params: RoiSimulationRequest):
+    """
+    Break-even and NPV percentiles over sampled revenue, utilisation and costs (see simulate_roi).
+    """
+    distributions = {name: getattr(params, name).model_dump()
+                     for name in ("investment", "daily_revenue", "utilisation_days", "operating_costs")
+                     if getattr(params, name) is not None}
+    try:
+        return await asyncio.to_thread(simulate_roi, distributions, params.use_case, params.samples, params.seed,
+                                       params.horizon_years, params.discount_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 @router.get("/check/compliance")
 async def compliance_tool(params: ComplianceRequest = Depends()):
     return check_regulation_compliance(params.weight_kg, params.zone, params.altitude_ft, params.purpose)
 
+@router.post("/check/compliance/batch")
+async def compliance_batch_tool(request: Request, weight_kg: float = None, purpose: str = "Recreational"):
+    """
+    Checks many flights at once: a CSV/Parquet upload (multipart field "file") or a JSON array of
+    {"weight_kg", "zone", "altitude_ft", "purpose"} objects. Streams one NDJSON result line per row.
+    """
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise BatchInputError("Upload the flights as a file in the 'file' field.")
+            frame = await asyncio.to_thread(read_flights, await upload.read(), upload.filename or "", upload.content_type)
+        else:
+            frame = await asyncio.to_thread(flights_from_records, await request.json())
+        codes, results = await asyncio.to_thread(evaluate_flights, frame, weight_kg, purpose)
+    except BatchInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        # Malformed JSON body
+        raise HTTPException(status_code=422, detail=f"Invalid request body: {e}")
+
+    return StreamingResponse(
+        iter_ndjson(frame, codes, results),
+        media_type="application/x-ndjson",
+        headers={"X-Total-Rows": str(len(codes))}
+    )
+
 @router.get("/tools/regulation-check")
 async def regulation_check(params: ComplianceRequest = Depends()):
     # This endpoint implements specific logic for frontend display
@@ -66,23 +152,17 @@ async def get_recommendation(params: RecommendRequestSimple = Depends()):
 
 @router.get("/tools/find-drones")
 async def find_drones(category: str = None, budget: float = None, endurance: int = None, min_flight_time: int = 0, technical_reqs: str = None):
-    import pandas as pd
     try:
-        base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        data_path = os.path.join(base_path, "data", "processed", "drone_models.csv")
-        
-        if not os.path.exists(data_path):
+        if not drone_catalog.exists():
              return {"error": "Data file not found."}
 
-        df = pd.read_csv(data_path)
-        if category and category != "All":
-            df = df[df['class'].str.lower() == category.lower()]
-        if budget:
-            df = df[df['price_inr'] <= budget]
-        if endurance:
-            df = df[df['endurance_min'] >= endurance]
-        if min_flight_time:
-            df = df[df['endurance_min'] >= min_flight_time]
+        # Both endurance filters are lower bounds, so only the larger one matters
+        min_endurance = max([e for e in (endurance, min_flight_time) if e], default=None)
+        df = drone_catalog.query(
+            max_price=budget or None,
+            min_endurance=min_endurance,
+            category=category if category and category != "All" else None
+        )
             
         return df.to_dict(orient="records")
     except Exception as e:
@@ -90,6 +170,8 @@ async def find_drones(category: str = None, budget: float = None, endurance: int
 
 @router.get("/tools/download-report")
 async def download_report(weight: float, zone: str, alt: float, category: str, status: str):
+    from fpdf import FPDF
+    from fpdf.enums import XPos, YPos
     try:
         pdf = FPDF()
         pdf.add_page()
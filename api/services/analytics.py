@@ -0,0 +1,211 @@
+import io
+import os
+import csv
+import math
+import time
+import threading
+import numpy as np
+from mcp_server.tools.compliance import check_compliance_batch
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FLIGHT_LOGS_PATH = os.getenv("FLIGHT_LOGS_PATH", os.path.join(BASE_DIR, "data", "synthetic", "flight_logs.csv"))
+
+# Bytes of log read and aggregated at a time; memory use does not grow with the file
+ANALYTICS_CHUNK_BYTES = int(os.getenv("ANALYTICS_CHUNK_BYTES", str(8 * 1024 * 1024)))
+ALTITUDE_BIN_FT = int(os.getenv("ALTITUDE_BIN_FT", "50"))
+# pandas offset alias for the time-bucketed counts ("1h", "1D", ...)
+ANALYTICS_TIME_BUCKET = os.getenv("ANALYTICS_TIME_BUCKET", "1D")
+
+AGGREGATED_COLUMNS = ("zone", "altitude_ft", "battery_drain_%", "timestamp")
+
+# Bytes at the start of the file compared on every refresh to notice a rewritten (not appended) log
+_HEAD_BYTES = 4096
+
+class QuantileSketch:
+    """
+    Streaming quantiles with a fixed relative error (DDSketch-style log buckets).
+    Memory depends on the value range, not on how many values were added.
+    """
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}  # bucket index -> count
+        self.zero_count = 0  # values <= 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        indexes, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return self.min
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i], kept inside the observed range
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+class FlightLogAnalytics:
+    """
+    Incremental fleet statistics over an append-only flight log CSV.
+    Each refresh parses only the bytes appended since the last one, in ANALYTICS_CHUNK_BYTES chunks,
+    and folds them into running aggregates. A shrunk or rewritten file is re-read from the start.
+    """
+    def __init__(self, path: str = None):
+        self.path = path or FLIGHT_LOGS_PATH
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.columns = None
+        self.offset = 0  # bytes consumed, always at a line boundary
+        self._head = b""
+        self._stat = None
+        self.flights = 0
+        self.zones = {}  # zone -> {"flights", "violations", "conditional"}
+        self.altitude_bins = {}  # bin start (ft) -> flights
+        self.battery_drain = QuantileSketch()
+        self.time_buckets = {}  # bucket start -> flights
+        self.last_refresh = {"rows": 0, "seconds": 0.0, "full_rebuild": False}
+
+    def _is_rewritten(self, f, size: int):
+        if size < self.offset:
+            return True
+        head = f.read(len(self._head))
+        f.seek(0)
+        return head != self._head
+
+    def refresh(self):
+        """
+        Folds rows appended since the last refresh into the aggregates. Returns the rows processed.
+        """
+        with self._lock:
+            stat = os.stat(self.path)
+            if self._stat == (stat.st_mtime_ns, stat.st_size):
+                return 0
+            started = time.perf_counter()
+            rows, full_rebuild = 0, False
+            with open(self.path, "rb") as f:
+                if self.columns is not None and self._is_rewritten(f, stat.st_size):
+                    self._reset()
+                    full_rebuild = True
+                if self.columns is None:
+                    header = f.readline()
+                    if not header.endswith(b"\n"):
+                        return 0
+                    self.columns = next(csv.reader([header.decode("utf-8-sig").strip()]))
+                    self.offset = len(header)
+                rows = self._consume(f)
+            self._stat = (stat.st_mtime_ns, stat.st_size)
+            self.last_refresh = {"rows": rows, "seconds": round(time.perf_counter() - started, 3), "full_rebuild": full_rebuild}
+            return rows
+
+    def _consume(self, f):
+        # 1. Read fixed-size chunks from the last processed line; an unterminated last line waits for the next refresh
+        f.seek(self.offset)
+        rows, carry = 0, b""
+        while True:
+            data = f.read(ANALYTICS_CHUNK_BYTES)
+            if not data:
+                break
+            data = carry + data
+            cut = data.rfind(b"\n") + 1
+            carry = data[cut:]
+            if cut:
+                rows += self._aggregate(data[:cut])
+                self.offset += cut
+        # Fingerprint of the processed start of the file (grows until it is _HEAD_BYTES long)
+        if len(self._head) < _HEAD_BYTES:
+            f.seek(0)
+            self._head = f.read(min(_HEAD_BYTES, self.offset))
+        return rows
+
+    def _aggregate(self, block: bytes):
+        import pandas as pd
+        # Only the aggregated columns are parsed (flight IDs are the most expensive ones to parse)
+        frame = pd.read_csv(io.BytesIO(block), header=None, names=self.columns, skip_blank_lines=True,
+                            usecols=[c for c in self.columns if c in AGGREGATED_COLUMNS] or None)
+        if frame.empty:
+            return 0
+        self.flights += len(frame)
+
+        # 2. Zone / altitude rules, as the compliance checker applies them (weight does not affect the status)
+        if "zone" in frame.columns and "altitude_ft" in frame.columns:
+            altitude = pd.to_numeric(frame["altitude_ft"], errors="coerce").to_numpy()
+            zones = frame["zone"].to_numpy(dtype=object)
+            codes, results = check_compliance_batch(np.zeros(len(frame)), zones, altitude)
+            statuses = np.array([r["status"] for r in results] + ["Unknown"], dtype=object)[codes]
+            summary = pd.DataFrame({"zone": frame["zone"].fillna("Unknown").astype(str),
+                                    "violations": statuses == "Non-Compliant",
+                                    "conditional": statuses == "Conditional"})
+            for zone, flights, violations, conditional in summary.groupby("zone").agg(
+                    flights=("violations", "size"), violations=("violations", "sum"),
+                    conditional=("conditional", "sum")).itertuples():
+                totals = self.zones.setdefault(zone, {"flights": 0, "violations": 0, "conditional": 0})
+                totals["flights"] += int(flights)
+                totals["violations"] += int(violations)
+                totals["conditional"] += int(conditional)
+
+            # 3. Altitude histogram with ALTITUDE_BIN_FT-wide bins
+            altitude = altitude[np.isfinite(altitude)]
+            bins, counts = np.unique((altitude // ALTITUDE_BIN_FT).astype(np.int64) * ALTITUDE_BIN_FT, return_counts=True)
+            for start, count in zip(bins.tolist(), counts.tolist()):
+                self.altitude_bins[start] = self.altitude_bins.get(start, 0) + count
+
+        # 4. Battery drain quantiles
+        if "battery_drain_%" in frame.columns:
+            self.battery_drain.add(pd.to_numeric(frame["battery_drain_%"], errors="coerce").to_numpy())
+
+        # 5. Flights per time bucket
+        if "timestamp" in frame.columns:
+            timestamps = pd.to_datetime(frame["timestamp"], errors="coerce").dropna()
+            for bucket, count in timestamps.dt.floor(ANALYTICS_TIME_BUCKET).value_counts().items():
+                key = bucket.isoformat()
+                self.time_buckets[key] = self.time_buckets.get(key, 0) + int(count)
+        return len(frame)
+
+    def report(self):
+        """
+        Refreshes, then returns the aggregates as a JSON-ready dict.
+        """
+        self.refresh()
+        with self._lock:
+            sketch = self.battery_drain
+            drain = {f"p{int(q * 100)}": round(sketch.quantile(q), 2) for q in (0.5, 0.9, 0.99)} if sketch.count else {}
+            if sketch.count:
+                drain.update({"min": round(sketch.min, 2), "max": round(sketch.max, 2), "mean": round(sketch.total / sketch.count, 2)})
+            return {
+                "source": os.path.relpath(self.path, BASE_DIR).replace(os.sep, "/"),
+                "flights": self.flights,
+                "zones": {zone: dict(totals) for zone, totals in sorted(self.zones.items())},
+                "altitude_histogram_ft": [
+                    {"from": start, "to": start + ALTITUDE_BIN_FT, "flights": count}
+                    for start, count in sorted(self.altitude_bins.items())
+                ],
+                "battery_drain_pct": drain,
+                "flights_per_bucket": {"bucket": ANALYTICS_TIME_BUCKET, "counts": dict(sorted(self.time_buckets.items()))},
+                "last_refresh": dict(self.last_refresh)
+            }
+
+flight_analytics = FlightLogAnalytics()
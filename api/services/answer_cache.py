@@ -0,0 +1,118 @@
+import os
+import re
+import time
+from collections import OrderedDict
+import numpy as np
+from rag.embedder import get_collection_version, on_collection_change
+
+def normalize_query(text: str):
+    """
+    Lower-cases, strips punctuation and collapses whitespace so trivially different phrasings share a key.
+    """
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+class AnswerCache:
+    """
+    Caches generated chat answers.
+    A query hits on its normalized text, or on a cached query whose embedding has a
+    cosine similarity above `similarity_threshold`. Entries expire after `ttl_seconds`,
+    the least recently used are evicted beyond `max_entries`, and everything is dropped
+    when the knowledge-base collection changes. The collection version file is re-read at
+    most every `version_check_s` seconds, or on the next access after `invalidate()`.
+    """
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, similarity_threshold: float = 0.95,
+                 version_check_s: float = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version_check_s = version_check_s
+        self._entries = OrderedDict()  # normalized query -> (result, unit embedding or None, created_at)
+        self._version = None
+        self._version_checked_at = None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """
+        Makes the next access re-read the collection version (e.g. right after an upload).
+        """
+        self._version_checked_at = None
+
+    def _refresh(self):
+        # Drop everything if /upload or the setup script changed the collection
+        now = time.time()
+        if self._version_checked_at is None or now - self._version_checked_at >= self.version_check_s:
+            self._version_checked_at = now
+            version = get_collection_version()
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+        cutoff = now - self.ttl_seconds
+        for key in [k for k, (_, _, created_at) in self._entries.items() if created_at < cutoff]:
+            del self._entries[key]
+
+    def get(self, query: str):
+        """
+        Returns the cached result for an exact (normalized) match, or None.
+        """
+        self._refresh()
+        key = normalize_query(query)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        return None
+
+    def get_similar(self, embedding):
+        """
+        Returns the result of the most similar cached query above the threshold, or None.
+        Called after `get` missed; this is where misses are counted.
+        """
+        self._refresh()
+        candidates = [(k, e) for k, (_, e, _) in self._entries.items() if e is not None]
+        if embedding is not None and candidates and self.similarity_threshold > 0:
+            scores = np.stack([e for _, e in candidates]) @ _unit(embedding)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity_threshold:
+                match = candidates[best][0]
+                self._entries.move_to_end(match)
+                self.hits += 1
+                self.semantic_hits += 1
+                return self._entries[match][0]
+
+        self.misses += 1
+        return None
+
+    def set(self, query: str, result: dict, embedding=None):
+        self._refresh()
+        key = normalize_query(query)
+        vector = _unit(embedding) if embedding is not None else None
+        self._entries[key] = (result, vector, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses
+        }
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_S", "3600")),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+    version_check_s=float(os.getenv("ANSWER_CACHE_VERSION_CHECK_S", "1"))
+)
+# Uploads in this process invalidate at once; the setup script's are seen within version_check_s
+on_collection_change(answer_cache.invalidate)
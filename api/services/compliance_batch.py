@@ -0,0 +1,93 @@
+import io
+import os
+import json
+from json.encoder import encode_basestring
+from mcp_server.tools.compliance import check_compliance_batch
+
+# NDJSON lines rendered per chunk of the streamed response
+COMPLIANCE_BATCH_BLOCK_ROWS = int(os.getenv("COMPLIANCE_BATCH_BLOCK_ROWS", "20000"))
+
+# Columns echoed back on every result line, when the input has them
+ID_COLUMNS = ("flight_id",)
+
+class BatchInputError(ValueError):
+    """The uploaded flights cannot be checked (unreadable file, missing or non-numeric columns)."""
+
+def read_flights(content: bytes, filename: str = "", content_type: str = ""):
+    """
+    Parses an uploaded CSV or Parquet file (by extension or content type) into a DataFrame.
+    """
+    import pandas as pd
+    is_parquet = filename.lower().endswith((".parquet", ".pq")) or "parquet" in (content_type or "")
+    try:
+        if is_parquet:
+            return pd.read_parquet(io.BytesIO(content))
+        return pd.read_csv(io.BytesIO(content))
+    except ImportError as e:
+        raise BatchInputError(f"Parquet uploads need pyarrow or fastparquet installed ({e}).")
+    except Exception as e:
+        raise BatchInputError(f"Could not read {filename or 'upload'}: {e}")
+
+def flights_from_records(records):
+    """
+    Turns a JSON array of flight objects into a DataFrame.
+    """
+    import pandas as pd
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise BatchInputError("Expected a JSON array of flight objects.")
+    return pd.DataFrame.from_records(records)
+
+def _column(frame, name: str, default):
+    import pandas as pd
+    if name in frame.columns:
+        return frame[name]
+    if default is None:
+        raise BatchInputError(f"Missing column '{name}' (or pass it as a query parameter for every row).")
+    return pd.Series(default, index=frame.index)
+
+def evaluate_flights(frame, weight_kg: float = None, purpose: str = "Recreational"):
+    """
+    Runs the columnar compliance check over a flights DataFrame.
+    weight_kg / purpose fill in for missing columns (flight logs often have neither).
+    Returns (codes, results) as in check_compliance_batch.
+    """
+    import numpy as np
+    import pandas as pd
+    # Nothing to check (e.g. "[]" or a header-only CSV): no columns to validate either
+    if not len(frame):
+        return np.empty(0, dtype=np.int64), []
+    weights, altitudes = _column(frame, "weight_kg", weight_kg), _column(frame, "altitude_ft", None)
+    try:
+        weights, altitudes = pd.to_numeric(weights), pd.to_numeric(altitudes)
+    except (TypeError, ValueError) as e:
+        raise BatchInputError(f"weight_kg and altitude_ft must be numeric: {e}")
+    return check_compliance_batch(weights.to_numpy(), _column(frame, "zone", None).to_numpy(dtype=object),
+                                  altitudes.to_numpy(), _column(frame, "purpose", purpose))
+
+def _json_values(values):
+    # The C string encoder is much faster than json.dumps per value
+    return [encode_basestring(v) if isinstance(v, str) else json.dumps(None if v != v else v, default=str) for v in values]
+
+def iter_ndjson(frame, codes, results, block_rows: int = None):
+    """
+    Yields the per-row results as NDJSON, a block of lines at a time:
+    {"row": <0-based input row>, "flight_id": ..., "status", "violations", "required_permits", "zone_info"}
+    """
+    import numpy as np
+    block_rows = block_rows or COMPLIANCE_BATCH_BLOCK_ROWS
+    # 1. Each distinct result is serialized once; a line is a row prefix plus one of these
+    bodies = np.array([json.dumps(result, ensure_ascii=False)[1:] for result in results] +
+                      [json.dumps({"error": "Missing or invalid zone."})[1:]], dtype=object)
+    id_columns = [c for c in ID_COLUMNS if c in frame.columns]
+
+    for start in range(0, len(codes), block_rows):
+        stop = min(start + block_rows, len(codes))
+        # 2. Code -1 (missing zone) picks the error body at the end
+        block_bodies = bodies[codes[start:stop]].tolist()
+        if id_columns:
+            columns = [[f'"{c}": {v}, ' for v in _json_values(frame[c].iloc[start:stop].tolist())] for c in id_columns]
+            prefixes = ["".join(parts) for parts in zip(*columns)]
+        else:
+            prefixes = [""] * (stop - start)
+        lines = [f'{{"row": {i}, {prefix}{body}' for i, prefix, body in zip(range(start, stop), prefixes, block_bodies)]
+        yield "\n".join(lines) + "\n"
@@ -0,0 +1,83 @@
+import os
+import time
+import uuid
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rag.retriever import ingest_multimodal_data
+
+# Uploads are spooled here under unique names until a worker has ingested them
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "drone_intel_uploads"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+# Finished jobs kept for status queries
+MAX_FINISHED_JOBS = 1000
+
+class IngestionJobs:
+    """
+    Background worker pool for /upload.
+    Each upload becomes a job whose status and progress (chunks embedded) can be polled.
+    """
+    def __init__(self, max_workers: int = 2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def new_spool_file(self, filename: str):
+        """
+        Returns (file descriptor, path) of a unique spool file, so concurrent uploads never collide.
+        """
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        suffix = os.path.splitext(filename or "")[1]
+        return tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=SPOOL_DIR)
+
+    def submit(self, spool_path: str, filename: str, content_type: str):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "filename": filename,
+                "status": "queued",
+                "chunks_embedded": 0,
+                "chunks_total": None,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None
+            }
+            self._prune()
+        self._pool.submit(self._run, job_id, spool_path, filename, content_type)
+        return job_id
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, spool_path: str, filename: str, content_type: str):
+        self._update(job_id, status="running")
+
+        def progress(embedded, total):
+            self._update(job_id, chunks_embedded=embedded, chunks_total=total)
+
+        try:
+            chunks = ingest_multimodal_data(spool_path, content_type, source_name=filename, progress=progress)
+            self._update(job_id, status="completed", chunks_embedded=chunks, chunks_total=chunks, finished_at=time.time())
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+        finally:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j["finished_at"] is not None]
+        if len(finished) > MAX_FINISHED_JOBS:
+            finished.sort(key=lambda j: j["finished_at"])
+            for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+                del self._jobs[job["job_id"]]
+
+# Global instance for routes to use
+ingestion_jobs = IngestionJobs(max_workers=INGEST_WORKERS)
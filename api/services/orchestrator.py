@@ -1,32 +1,279 @@
-from rag.retriever import retrieve_relevant_docs
-from rag.generator import generate_drone_response
+import re
+import asyncio
+from rag.retriever import retrieve_relevant_docs, aembed_query, aembed_queries, aretrieve_many
+from rag.generator import agenerate_drone_response, astream_drone_response
 # We need to check if mcp_server is importing correctly. 
 # The user's snippet uses: from mcp_server.server import mcp_manager
 # But earlier I saw `mcp_server.server` importing `mcp_engine`. Let's check `mcp_server/server.py` content first? 
 # Actually, let's just use `mcp_engine` or `mcp_manager` depending on what's in `server.py`.
 # I'll optimistically assume `mcp_engine` based on `main.py` line 20: `from mcp_server.server import mcp_engine`
 from mcp_server.server import mcp_engine
+from api.services.answer_cache import answer_cache, normalize_query
+from rag.clients import client_registry
+
+# Questions about the rules are answered from the regulation documents only
+REGULATION_FILTERS = {"doc_type": "regulation"}
+_REGULATION_RE = re.compile(
+    r"\b(rules?|regulat\w*|legal\w*|laws?|permits?|permission|licen[cs]\w*|uin|registration|register\w*|dgca|"
+    r"complian\w*|penalt\w*|fines?|rpto|remote pilot certificate|airspace|(?:red|yellow|green) zone|no[- ]fly|"
+    r"digital sky|type certificat\w*)\b"
+)
+
+def retrieval_filters(user_query: str):
+    """
+    Metadata filters for a question's retrieval, or None to search every document.
+    """
+    if _REGULATION_RE.search(user_query.lower()):
+        return REGULATION_FILTERS
+    return None
+
+class _Broadcast:
+    """
+    Events of one streamed answer, fanned out to every subscriber.
+    Events are kept until the stream ends, so a subscriber joining late starts from the first one.
+    """
+    def __init__(self):
+        self.events = []
+        self.closed = False
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: dict):
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def close(self):
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    async def subscribe(self):
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: sent < len(self.events) or self.closed)
+                pending = self.events[sent:]
+            if not pending:
+                return
+            sent += len(pending)
+            for event in pending:
+                yield event
 
 class DroneOrchestrator:
     """
     Orchestrates logic between RAG (Semantic search) and MCP Tools (Deterministic math).
     """
+    async def _cached_answer(self, user_query: str):
+        """
+        Looks the query up in the answer cache. Returns (cached result or None, query embedding).
+        The embedding is LRU-cached, so a miss does not cost retrieval a second embedding call.
+        """
+        cached = answer_cache.get(user_query)
+        if cached is not None:
+            return cached, None
+        try:
+            embedding = await aembed_query(user_query)
+        except Exception as e:
+            # Only the semantic lookup is skipped; retrieval falls back to the lexical index
+            print(f"Query embedding failed ({type(e).__name__}: {e}), skipping the semantic answer cache")
+            embedding = None
+        return answer_cache.get_similar(embedding), embedding
+
+    def __init__(self):
+        # Single-flight: normalized prompt -> task answering it, shared by concurrent identical requests
+        self._in_flight = {}
+        # Streamed in-flight answers: normalized prompt -> _Broadcast of the leader's events
+        self._broadcasts = {}
+        self.leader_requests = 0
+        self.coalesced_requests = 0
+
     async def process_query(self, user_query: str):
+        # 0. Serve repeated questions from the answer cache
+        cached, embedding = await self._cached_answer(user_query)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        # 1. Join an identical in-flight query instead of retrieving and generating again
+        result = await asyncio.shield(self._join_or_start(user_query, embedding))
+        return {**result, "cached": False}
+
+    def _join_or_start(self, user_query: str, embedding):
+        key = normalize_query(user_query)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced_requests += 1
+            return task
+
+        # The task is shielded from waiter cancellation, so one client disconnecting does not fail the others
+        return self._register(key, asyncio.create_task(self._answer(user_query, embedding)))
+
+    def _register(self, key: str, task):
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        self.leader_requests += 1
+        return task
+
+    async def _answer(self, user_query: str, embedding):
+        result = await self._route(user_query)
+        answer_cache.set(user_query, result, embedding=embedding)
+        return result
+
+    async def process_batch(self, prompts):
+        """
+        Answers many prompts at once: one batched embedding request, grouped vector lookups
+        and generation fanned out under the LLM concurrency limit.
+        Returns results in input order; a failing item carries an "error" instead of failing the batch.
+        """
+        results = [None] * len(prompts)
+
+        # 1. Exact cache hits; duplicate prompts inside the batch are answered once
+        groups = {}
+        for i, prompt in enumerate(prompts):
+            cached = answer_cache.get(prompt)
+            if cached is not None:
+                results[i] = {**cached, "cached": True}
+            else:
+                groups.setdefault(normalize_query(prompt), []).append(i)
+        if not groups:
+            return results
+
+        queries = [prompts[indices[0]] for indices in groups.values()]
+        try:
+            embeddings = await aembed_queries(queries)
+            mode = None
+        except Exception as e:
+            # A slow or failing embedding service should not fail the whole batch
+            print(f"Batch embedding failed ({type(e).__name__}: {e}), answering {len(queries)} queries from the lexical index")
+            embeddings, mode = [None] * len(queries), "lexical"
+
+        # 2. Semantic cache hits
+        pending = []
+        for query, embedding, indices in zip(queries, embeddings, groups.values()):
+            cached = answer_cache.get_similar(embedding)
+            if cached is not None:
+                for i in indices:
+                    results[i] = {**cached, "cached": True}
+            else:
+                pending.append((query, embedding, indices))
+        if not pending:
+            return results
+
+        # 3. Retrieval for every remaining prompt, then bounded generation
+        try:
+            docs_per_query = await aretrieve_many(
+                [q for q, _, _ in pending],
+                embeddings=None if mode else [e for _, e, _ in pending],
+                mode=mode,
+                filters=[retrieval_filters(q) for q, _, _ in pending]
+            )
+        except Exception as e:
+            for _, _, indices in pending:
+                for i in indices:
+                    results[i] = {"answer": None, "sources": [], "cached": False, "error": f"Retrieval Error: {str(e)}"}
+            return results
+
+        async def generate(query, embedding, indices, context_docs):
+            try:
+                result = await agenerate_drone_response(query, context_docs=context_docs)
+                answer_cache.set(query, result, embedding=embedding)
+                item = {**result, "cached": False}
+            except Exception as e:
+                item = {"answer": None, "sources": [], "cached": False, "error": f"Chat Error: {str(e)}"}
+            for i in indices:
+                results[i] = item
+
+        await asyncio.gather(*[
+            generate(query, embedding, indices, docs)
+            for (query, embedding, indices), docs in zip(pending, docs_per_query)
+        ])
+        return results
+
+    def stats(self):
+        return {
+            "answer_cache": answer_cache.stats(),
+            "coalescing": {
+                "in_flight": len(self._in_flight),
+                "leader_requests": self.leader_requests,
+                "coalesced_requests": self.coalesced_requests
+            },
+            "clients": client_registry.stats()
+        }
+
+    async def stream_query(self, user_query: str):
+        """
+        Streaming counterpart of process_query.
+        Yields "sources", then "token" events, then a final "done" event.
+        """
+        cached, embedding = await self._cached_answer(user_query)
+        if cached is not None:
+            yield {"event": "sources", **{k: v for k, v in cached.items() if k != "answer"}}
+            yield {"event": "token", "content": cached["answer"]}
+            yield {"event": "done", "cached": True}
+            return
+
+        key = normalize_query(user_query)
+        task, broadcast = self._in_flight.get(key), self._broadcasts.get(key)
+        if task is not None and broadcast is None:
+            # An identical non-streaming query is already being answered: wait for it rather than generating twice
+            self.coalesced_requests += 1
+            result = await asyncio.shield(task)
+            yield {"event": "sources", **{k: v for k, v in result.items() if k != "answer"}}
+            yield {"event": "token", "content": result["answer"]}
+            yield {"event": "done", "cached": False}
+            return
+
+        if task is None:
+            # Leader: generate in a task of its own, so followers (and a disconnecting leader) share one stream
+            broadcast = _Broadcast()
+            task = self._register(key, asyncio.create_task(self._stream_answer(user_query, embedding, broadcast)))
+            self._broadcasts[key] = broadcast
+            task.add_done_callback(lambda _: self._broadcasts.pop(key, None))
+        else:
+            self.coalesced_requests += 1
+
+        # Late joiners are replayed the events sent so far, then follow the live stream
+        async for event in broadcast.subscribe():
+            yield event
+        # Raises the generation error, if any
+        await asyncio.shield(task)
+        yield {"event": "done", "cached": False}
+
+    async def _stream_answer(self, user_query: str, embedding, broadcast):
+        """
+        Runs one streamed generation, publishing its events to `broadcast`.
+        Returns the full result, so non-streaming requests can join it too.
+        """
+        metadata, tokens = {}, []
+        try:
+            async for event in astream_drone_response(user_query, filters=retrieval_filters(user_query)):
+                if event["event"] == "sources":
+                    metadata = {k: v for k, v in event.items() if k != "event"}
+                else:
+                    tokens.append(event["content"])
+                await broadcast.publish(event)
+        finally:
+            await broadcast.close()
+        result = {"answer": "".join(tokens), **metadata}
+        answer_cache.set(user_query, result, embedding=embedding)
+        return result
+
+    async def _route(self, user_query: str):
         query_lower = user_query.lower()
+        filters = retrieval_filters(user_query)
 
         # 1. Routing Logic: Check for tool-specific keywords
         # In a real scenario, you would use an LLM to extract parameters here.
         # For now, we route to RAG which explains how to use the specific tool.
         if any(word in query_lower for word in ["calculate", "roi", "profit", "break-even"]):
             # For now, simple RAG response about the tool
-            return generate_drone_response(user_query)
+            return await agenerate_drone_response(user_query, filters=filters)
 
         elif any(word in query_lower for word in ["fly", "endurance", "flight time", "battery", "range"]):
              # For now, simple RAG response about the tool
-            return generate_drone_response(user_query)
+            return await agenerate_drone_response(user_query, filters=filters)
 
-        # 2. Default to RAG for general knowledge and regulations
-        return generate_drone_response(user_query)
+        # 2. Default to RAG for general knowledge; regulation questions only search the rules documents
+        return await agenerate_drone_response(user_query, filters=filters)
 
 # Global instance for routes to use
 drone_orchestrator = DroneOrchestrator()
\ No newline at end of file
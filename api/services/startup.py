@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import threading
+import rag.embedder as embedder
+import rag.lexical as lexical
+import rag.chunking as chunking
+import rag.context as context
+import rag.retriever as retriever
+import rag.generator as generator
+import rag.vision as vision
+from api.services.analytics import flight_analytics
+
+# Load the heavy subsystems in the background right after startup instead of on the first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+def _open_vector_db():
+    # Opening the client is lazy too; counting forces the collection files to load
+    embedder.count_vectors()
+
+def _import_pandas():
+    import pandas
+
+def _import_fpdf():
+    import fpdf
+
+WARMUP_STEPS = [
+    ("vector_db", _open_vector_db),
+    ("lexical_index", lexical.get_lexical_index),
+    ("parent_sections", chunking.get_parent_store),
+    ("tokenizer", context.get_encoding),
+    ("chat_llm", generator.get_llm),
+    ("pandas", _import_pandas),
+    ("fpdf", _import_fpdf),
+    ("flight_analytics", flight_analytics.refresh)
+]
+
+_warmup = {"status": "disabled", "seconds": {}, "errors": {}}
+_warmup_lock = threading.Lock()
+
+def subsystem_status():
+    """
+    Which lazily created subsystems are loaded in this process.
+    """
+    return {
+        "embeddings": embedder._embeddings is not None,
+        "vector_db": embedder._vector_db is not None,
+        "lexical_index": lexical._lexical_index is not None,
+        "parent_sections": chunking._parent_store is not None,
+        "tokenizer": context._encoding is not None,
+        "chat_llm": generator.llm is not None,
+        "retrieval_llm": retriever.llm is not None,
+        "vision_llm": vision._vision_llm is not None,
+        "pandas": "pandas" in sys.modules,
+        "fpdf": "fpdf" in sys.modules,
+        "flight_analytics": flight_analytics.columns is not None
+    }
+
+def warm_up():
+    """
+    Loads every WARMUP_STEPS subsystem, recording how long each took.
+    A failing step is recorded and skipped; it will be retried lazily on first use.
+    """
+    with _warmup_lock:
+        _warmup["status"] = "running"
+    for name, step in WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"⚠️ Warm-up of {name} failed: {e}")
+            _warmup["errors"][name] = str(e)
+        _warmup["seconds"][name] = round(time.perf_counter() - start, 3)
+    with _warmup_lock:
+        _warmup["status"] = "done"
+
+def start_warm_up():
+    """
+    Runs warm_up on a daemon thread so the server accepts requests immediately.
+    """
+    with _warmup_lock:
+        if _warmup["status"] != "disabled":
+            return
+        _warmup["status"] = "pending"
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+def readiness():
+    """
+    Returns (ready, report). Without warm-up the process is ready as soon as it serves requests.
+    """
+    with _warmup_lock:
+        ready = _warmup["status"] in ("disabled", "done")
+        report = {
+            "ready": ready,
+            "warmup": {"status": _warmup["status"], "seconds": dict(_warmup["seconds"]), "errors": dict(_warmup["errors"])},
+            "subsystems": subsystem_status()
+        }
+    return ready, report
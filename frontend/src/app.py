@@ -1,5 +1,7 @@
 
 import os
+import json
+import time
 import streamlit as st
 import requests
 import pandas as pd
@@ -25,8 +27,20 @@ with tab1:
                     files = {"file": (uploaded_file.name, uploaded_file, uploaded_file.type)}
                     try:
                         response = requests.post(f"{BACKEND_URL}/upload", files=files)
-                        if response.status_code == 200:
-                            st.success(f"✅ {uploaded_file.name} processed! You can now chat about it.")
+                        if response.status_code == 200 and "job_id" in response.json():
+                            # Ingestion runs in the background; poll the job until it finishes
+                            job_id = response.json()["job_id"]
+                            progress_text = st.empty()
+                            job = {"status": "queued"}
+                            while job.get("status") in ("queued", "running"):
+                                time.sleep(1)
+                                job = requests.get(f"{BACKEND_URL}/upload/{job_id}").json()
+                                if job.get("chunks_total"):
+                                    progress_text.caption(f"Embedded {job['chunks_embedded']}/{job['chunks_total']} chunks")
+                            if job.get("status") == "completed":
+                                st.success(f"✅ {uploaded_file.name} processed! You can now chat about it.")
+                            else:
+                                st.error(f"Error: {job.get('error') or job}")
                         else:
                             st.error(f"Error: {response.text}")
                     except Exception as e:
@@ -120,15 +134,29 @@ def test_selection_assistant():
         st.session_state.messages.append({"role": "user", "content": user_msg})
 
         try:
-            response = requests.post(f"{BACKEND_URL}/chat", json={"prompt": user_msg})
+            # Stream the answer so the first tokens show up while the rest is still being generated
+            response = requests.post(f"{BACKEND_URL}/chat/stream", json={"prompt": user_msg}, stream=True)
             if response.status_code == 200:
-                res = response.json()
+                response.encoding = "utf-8"
                 with st.chat_message("assistant"):
-                    answer = res.get('answer', "No answer received.")
-                    sources = res.get('sources', [])
-                    st.markdown(answer)
-                    if sources:
-                        st.caption(f"Sources: {sources}")
+                    sources_slot = st.empty()
+
+                    def token_stream():
+                        # Parse the Server-Sent Events emitted by /chat/stream
+                        event = None
+                        for line in response.iter_lines(decode_unicode=True):
+                            if line.startswith("event:"):
+                                event = line[len("event:"):].strip()
+                            elif line.startswith("data:"):
+                                data = json.loads(line[len("data:"):])
+                                if event == "sources" and data.get("sources"):
+                                    sources_slot.caption(f"Sources: {data['sources']}")
+                                elif event == "token":
+                                    yield data["content"]
+                                elif event == "error":
+                                    st.error(data.get("detail", "Chat Error"))
+
+                    answer = st.write_stream(token_stream()) or "No answer received."
                 
                 # Add assistant response to history
                 st.session_state.messages.append({"role": "assistant", "content": answer})
@@ -0,0 +1,136 @@
+import os
+import threading
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DRONE_MODELS_PATH = os.path.join(BASE_DIR, "data", "processed", "drone_models.csv")
+
+# Columns kept in sorted order for range lookups
+INDEXED_COLUMNS = ("price_inr", "endurance_min")
+
+class _SortedColumn:
+    """
+    One numeric column in descending order (ties in catalog order), NaNs dropped.
+    `order[i]` is the row position of the i-th largest value; `keys` holds the negated values
+    so both "<= x" and ">= x" become a single np.searchsorted on an ascending array.
+    """
+    def __init__(self, values: np.ndarray):
+        values = values.astype(np.float64)
+        valid = np.flatnonzero(~np.isnan(values))
+        self.values = values
+        self.order = valid[np.argsort(-values[valid], kind="stable")]
+        self.keys = -values[self.order]
+
+    def at_most(self, limit):
+        """Row positions with value <= limit, largest first."""
+        return self.order[np.searchsorted(self.keys, -limit, side="left"):]
+
+    def at_least(self, limit):
+        """Row positions with value >= limit, largest first."""
+        return self.order[:np.searchsorted(self.keys, -limit, side="right")]
+
+class _Snapshot:
+    """
+    Immutable view of one version of the CSV; replaced as a whole on reload.
+    """
+    def __init__(self, frame):
+        self.frame = frame
+        self.columns = {name: _SortedColumn(frame[name].to_numpy()) for name in INDEXED_COLUMNS}
+        # class value -> ascending row positions
+        self.classes = {}
+        for position, value in enumerate(frame["class"].tolist()):
+            if isinstance(value, str):
+                self.classes.setdefault(value, []).append(position)
+        self.classes = {value: np.array(positions, dtype=np.int64) for value, positions in self.classes.items()}
+
+class DroneCatalog:
+    """
+    Process-wide, read-mostly view of drone_models.csv.
+    Loads once, reloads when the file's mtime changes, and answers budget / endurance / class
+    queries with binary-search range lookups instead of scanning every row.
+    """
+    def __init__(self, path: str = DRONE_MODELS_PATH):
+        self.path = path
+        self._snapshot = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _current(self):
+        mtime = os.path.getmtime(self.path)
+        snapshot = self._snapshot
+        if snapshot is not None and mtime == self._mtime:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or mtime != self._mtime:
+                import pandas as pd
+                self._snapshot = _Snapshot(pd.read_csv(self.path))
+                self._mtime = mtime
+            return self._snapshot
+
+    def __len__(self):
+        return len(self._current().frame)
+
+    def _candidates(self, snapshot, max_price, min_endurance, classes):
+        """
+        Row positions matching every given condition, in no particular order.
+        The narrowest range (or class list) is looked up first; the others are checked on just those rows.
+        """
+        ranges = []
+        if max_price is not None:
+            ranges.append(snapshot.columns["price_inr"].at_most(max_price))
+        if min_endurance is not None:
+            ranges.append(snapshot.columns["endurance_min"].at_least(min_endurance))
+        if classes is not None:
+            ranges.append(np.concatenate([snapshot.classes[c] for c in classes if c in snapshot.classes] or
+                                         [np.empty(0, dtype=np.int64)]))
+        if not ranges:
+            return np.arange(len(snapshot.frame))
+
+        positions = min(ranges, key=len)
+        if max_price is not None:
+            positions = positions[snapshot.columns["price_inr"].values[positions] <= max_price]
+        if min_endurance is not None:
+            positions = positions[snapshot.columns["endurance_min"].values[positions] >= min_endurance]
+        if classes is not None and len(positions):
+            class_values = snapshot.frame["class"].to_numpy()[positions]
+            positions = positions[np.isin(class_values, list(classes))]
+        return positions
+
+    def _class_names(self, snapshot, category: str):
+        """Catalog class values equal to `category`, ignoring case."""
+        return [value for value in snapshot.classes if value.lower() == category.lower()]
+
+    def count(self, max_price: float = None, min_endurance: float = None, classes=None):
+        snapshot = self._current()
+        return len(self._candidates(snapshot, max_price, min_endurance, classes))
+
+    def query(self, max_price: float = None, min_endurance: float = None, classes=None, category: str = None,
+              limit: int = None):
+        """
+        Rows with price_inr <= max_price, endurance_min >= min_endurance and class in `classes`
+        (exact) or equal to `category` (case-insensitive), in catalog order, as a DataFrame.
+        A condition set to None is not applied.
+        """
+        snapshot = self._current()
+        if category is not None:
+            classes = self._class_names(snapshot, category) if classes is None else \
+                [c for c in classes if c.lower() == category.lower()]
+        positions = np.sort(self._candidates(snapshot, max_price, min_endurance, classes))
+        return snapshot.frame.iloc[positions[:limit]]
+
+    def top(self, column: str, n: int, max_price: float = None, min_endurance: float = None, classes=None):
+        """
+        The n matching rows with the largest `column` (ties in catalog order), as a DataFrame.
+        """
+        snapshot = self._current()
+        positions = self._candidates(snapshot, max_price, min_endurance, classes)
+        values = snapshot.columns[column].values[positions]
+        # Rows with a missing value go last, as in DataFrame.sort_values
+        ranked = positions[np.lexsort((positions, np.isnan(values), -values))]
+        return snapshot.frame.iloc[ranked[:n]]
+
+# Shared by the API routes and the MCP tools
+drone_catalog = DroneCatalog()
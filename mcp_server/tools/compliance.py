@@ -52,4 +52,56 @@ def check_regulation_compliance(weight_kg: float, zone: str, altitude_ft: float,
         "violations": violations,
         "required_permits": permits,
         "zone_info": f"{zone.title()} Zone rules apply."
-    }
\ No newline at end of file
+    }
+
+# Weight category upper bounds, in the order check_regulation_compliance tests them
+_CATEGORY_BOUNDS = (0.25, 2.0, 25.0, 150.0)
+
+def check_compliance_batch(weight_kg, zone, altitude_ft, purpose="Recreational"):
+    """
+    Columnar version of check_regulation_compliance for many flights at once.
+    Takes equal-length arrays (a scalar purpose applies to every row) and returns (codes, results):
+    row i's result is results[codes[i]], exactly what the scalar function returns for it.
+    Rows whose zone is missing or not text get code -1.
+    """
+    import numpy as np
+    import pandas as pd
+
+    weight_kg = np.asarray(weight_kg, dtype=np.float64)
+    altitude_ft = np.asarray(altitude_ft, dtype=np.float64)
+    zone = pd.Series(zone, dtype=object)
+    if isinstance(purpose, str):
+        purpose = pd.Series(purpose, index=zone.index, dtype=object)
+    purpose = pd.Series(purpose, dtype=object).fillna("Recreational")
+
+    # 1. Zone rule: lower-case each distinct zone string once, then map rows to it
+    zone_codes, zone_values = pd.factorize(zone)
+    lowered = [z.lower() if isinstance(z, str) else None for z in zone_values]
+    lower_codes, lower_values = pd.factorize(pd.Series(lowered, dtype=object))
+    zone_lower = np.append(lower_codes, -1)[zone_codes]
+    is_green = np.append(np.asarray(lower_values, dtype=object) == "green", False)[zone_lower]
+    high_in_green = is_green & (altitude_ft > 400)
+
+    # 2. Weight category: 0 Nano .. 4 Large (NaN weights fall through to Large, as in the scalar if-chain)
+    category = np.searchsorted(np.array(_CATEGORY_BOUNDS), weight_kg, side="left")
+
+    # 3. Purpose rule
+    purpose_codes, purpose_values = pd.factorize(purpose)
+    commercial = np.array([str(p).lower() == "commercial" for p in purpose_values] + [False])[purpose_codes]
+
+    # 4. Every rule outcome is fixed by (zone, altitude flag, category, purpose flag, weight > 2 kg)
+    key = (((zone_lower * 2 + high_in_green) * 5 + category) * 2 + commercial) * 2 + (weight_kg > 2.0)
+    valid = zone_lower >= 0
+    codes = np.full(len(key), -1, dtype=np.int64)
+    if not valid.any():
+        return codes, []
+    outcomes, first_rows, inverse = np.unique(key[valid], return_index=True, return_inverse=True)
+    codes[valid] = inverse
+    rows = np.flatnonzero(valid)[first_rows]
+
+    # The message lists are built once per distinct outcome, by the scalar function itself
+    results = [
+        check_regulation_compliance(float(weight_kg[i]), zone.iat[i], float(altitude_ft[i]), str(purpose.iat[i]))
+        for i in rows
+    ]
+    return codes, results
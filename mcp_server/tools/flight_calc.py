@@ -1,14 +1,13 @@
+# Share of the still-air flight time left in each wind condition (anything else counts as calm)
+WIND_FACTORS = {"moderate": 0.85, "high wind": 0.60}
+
 def get_flight_estimates(battery_ah: float, drone_weight: float, payload: float, wind_condition: str = "Calm"):
     total_mass = drone_weight + payload
     # Flight time formula adjusted for standard Indian drone efficiency
     base_minutes = (battery_ah * 14) / (total_mass * 0.5)
     
     # Wind factor Adjustment
-    wind_factor = 1.0
-    if wind_condition.lower() == "moderate":
-        wind_factor = 0.85
-    elif wind_condition.lower() == "high wind":
-        wind_factor = 0.60
+    wind_factor = WIND_FACTORS.get(wind_condition.lower(), 1.0)
         
     minutes = base_minutes * wind_factor
     
@@ -16,4 +15,42 @@ def get_flight_estimates(battery_ah: float, drone_weight: float, payload: float,
         "estimated_minutes": round(minutes, 2),
         "safe_minutes": round(minutes * 0.8, 2),  # 20% safety margin
         "range_km": round((minutes / 60) * 45, 2)
+    }
+
+def round_like_python(values, ndigits: int = 2):
+    """
+    Element-wise round(x, ndigits) for a float array.
+    np.round scales, rounds and unscales, which can land on the other side of a tie than
+    Python's correctly rounded round(); those (rare) near-tie elements are redone with round().
+    """
+    import numpy as np
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, ndigits)
+    scaled = values * 10.0 ** ndigits
+    with np.errstate(invalid="ignore"):
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) <= 4 * np.spacing(np.abs(scaled))
+    for index in zip(*np.nonzero(near_tie)):
+        rounded[index] = round(float(values[index]), ndigits)
+    return rounded
+
+def get_flight_sweep(battery_ah, drone_weight, payload, wind_conditions=("Calm",)):
+    """
+    get_flight_estimates over the full grid wind x battery_ah x drone_weight x payload in one NumPy pass.
+    Returns arrays of that shape with the same values, rounding included, as the per-point function.
+    """
+    import numpy as np
+    battery_ah = np.asarray(battery_ah, dtype=np.float64)
+    drone_weight = np.asarray(drone_weight, dtype=np.float64)
+    payload = np.asarray(payload, dtype=np.float64)
+    wind_factor = np.array([WIND_FACTORS.get(w.lower(), 1.0) for w in wind_conditions], dtype=np.float64)
+
+    # 1. Same operations in the same order as the scalar formula, broadcast over the grid axes
+    total_mass = drone_weight[:, None] + payload[None, :]
+    base_minutes = (battery_ah[:, None, None] * 14) / (total_mass[None, :, :] * 0.5)
+    minutes = base_minutes[None, ...] * wind_factor[:, None, None, None]
+
+    return {
+        "estimated_minutes": round_like_python(minutes),
+        "safe_minutes": round_like_python(minutes * 0.8),
+        "range_km": round_like_python((minutes / 60) * 45)
     }
\ No newline at end of file
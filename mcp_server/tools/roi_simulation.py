@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ROI_SCENARIOS_PATH = os.path.join(BASE_DIR, "data", "synthetic", "roi_scenarios.csv")
+ROI_REFERENCE_PATH = os.path.join(BASE_DIR, "data", "processed", "RoiCalculation.json")
+
+ROI_SIMULATION_MAX_SAMPLES = int(os.getenv("ROI_SIMULATION_MAX_SAMPLES", "10000000"))
+# Runs at least this large are spread over a process pool of ROI_SIMULATION_WORKERS
+ROI_POOL_MIN_SAMPLES = int(os.getenv("ROI_POOL_MIN_SAMPLES", "2000000"))
+ROI_SIMULATION_WORKERS = int(os.getenv("ROI_SIMULATION_WORKERS", str(min(os.cpu_count() or 1, 8))))
+
+# Samples per random stream. Fixed, so a seed gives the same result whatever the number of workers.
+CHUNK_SAMPLES = 250_000
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Used when the request leaves a distribution out (operating costs: get_roi_analysis' default +/- 20%)
+DEFAULT_UTILISATION_DAYS = {"dist": "triangular", "params": [200, 260, 320]}
+DEFAULT_OPERATING_COSTS = {"dist": "normal", "params": [2500, 500]}
+
+def _sample(rng, spec: dict, n: int):
+    """
+    Draws n values from {"dist": ..., "params": [...]}:
+    fixed [value], uniform [low, high], normal [mean, std], lognormal [mean, std] (of the value itself),
+    triangular [low, mode, high] or empirical [observed values] (resampled with replacement).
+    """
+    import numpy as np
+    dist, params = spec["dist"], spec["params"]
+    if dist == "fixed":
+        return np.full(n, float(params[0]))
+    if dist == "uniform":
+        return rng.uniform(params[0], params[1], n)
+    if dist == "normal":
+        return rng.normal(params[0], params[1], n)
+    if dist == "lognormal":
+        mean, std = params
+        sigma2 = np.log1p((std / mean) ** 2)
+        return rng.lognormal(np.log(mean) - sigma2 / 2, np.sqrt(sigma2), n)
+    if dist == "triangular":
+        return rng.triangular(params[0], params[1], params[2], n)
+    if dist == "empirical":
+        return rng.choice(np.asarray(params, dtype=np.float64), n)
+    raise ValueError(f"Unknown distribution '{dist}'.")
+
+def validate_distribution(name: str, spec: dict):
+    """
+    Raises ValueError for a distribution _sample cannot draw from.
+    """
+    arity = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "triangular": 3}
+    dist, params = spec.get("dist"), spec.get("params") or []
+    if dist == "empirical":
+        if not params:
+            raise ValueError(f"{name}: empirical needs at least one observed value.")
+    elif dist not in arity:
+        raise ValueError(f"{name}: unknown distribution '{dist}' (use {', '.join(list(arity) + ['empirical'])}).")
+    elif len(params) != arity[dist]:
+        raise ValueError(f"{name}: {dist} takes {arity[dist]} parameters, got {len(params)}.")
+    elif dist == "lognormal" and params[0] <= 0:
+        raise ValueError(f"{name}: lognormal needs a positive mean.")
+    elif dist == "triangular" and not params[0] <= params[1] <= params[2]:
+        raise ValueError(f"{name}: triangular needs low <= mode <= high.")
+
+def _simulate_chunk(seed_sequence, n: int, distributions: dict, horizon_years: int, discount_rate: float):
+    """
+    One random stream of the simulation; returns (break-even days, NPV) per sample.
+    Runs in a pool worker for large runs, so it only takes plain data.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed_sequence)
+    # 1. Always drawn in this order, so a seed maps to the same samples
+    investment = np.maximum(_sample(rng, distributions["investment"], n), 0)
+    daily_revenue = np.maximum(_sample(rng, distributions["daily_revenue"], n), 0)
+    utilisation_days = np.clip(_sample(rng, distributions["utilisation_days"], n), 0, 365)
+    operating_costs = np.maximum(_sample(rng, distributions["operating_costs"], n), 0)
+
+    # 2. get_roi_analysis' model, with revenue only on utilised days (monthly costs / 30 per calendar day)
+    daily_profit = daily_revenue * utilisation_days / 365 - operating_costs / 30
+    with np.errstate(divide="ignore"):
+        break_even = np.where(daily_profit > 0, investment / daily_profit, np.inf)
+
+    # 3. NPV of a constant yearly profit over the horizon
+    annuity = sum((1 + discount_rate) ** -year for year in range(1, horizon_years + 1))
+    npv = daily_profit * 365 * annuity - investment
+    return break_even, npv
+
+def _reference_scenario(use_case: str):
+    """
+    The RoiCalculation.json scenario matching use_case (e.g. "Agri" -> agriculture_precision_farming), or (None, {}).
+    """
+    if not os.path.exists(ROI_REFERENCE_PATH):
+        return None, {}
+    with open(ROI_REFERENCE_PATH, "r", encoding="utf-8") as f:
+        scenarios = json.load(f).get("drone_roi_scenarios_expanded", {})
+    words = [w[:4] for w in re.findall(r"[a-z]+", (use_case or "").lower()) if len(w) >= 4]
+    for key, scenario in scenarios.items():
+        if "use_case" in scenario and any(part.startswith(w) for part in key.split("_") for w in words):
+            return key, scenario
+    return None, {}
+
+def _months_to_days(text: str):
+    # "6-12 months" -> [180, 360], with the 30-day months of get_roi_analysis
+    numbers = [float(n) for n in re.findall(r"\d+(?:\.\d+)?", text or "")]
+    return [n * 30 for n in numbers[:2]] if "month" in (text or "") and numbers else None
+
+def default_distributions(use_case: str = "General"):
+    """
+    Distributions seeded from the project data:
+    daily revenue and investment are resampled from roi_scenarios.csv; a RoiCalculation.json scenario
+    for the use case with an initial investment fixes it instead.
+    """
+    import pandas as pd
+    distributions = {"utilisation_days": DEFAULT_UTILISATION_DAYS, "operating_costs": DEFAULT_OPERATING_COSTS}
+    if os.path.exists(ROI_SCENARIOS_PATH):
+        scenarios = pd.read_csv(ROI_SCENARIOS_PATH)
+        distributions["daily_revenue"] = {"dist": "empirical", "params": scenarios["daily_revenue"].dropna().tolist()}
+        distributions["investment"] = {"dist": "empirical", "params": scenarios["investment"].dropna().tolist()}
+    _, scenario = _reference_scenario(use_case)
+    initial_investment = scenario.get("entry_barriers", {}).get("initial_investment_inr")
+    if initial_investment:
+        distributions["investment"] = {"dist": "fixed", "params": [initial_investment]}
+    return distributions
+
+def _summary(values):
+    # Whole days / rupees, as get_roi_analysis rounds break_even_days
+    import numpy as np
+    finite = np.isfinite(values)
+    summary = {}
+    for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES, method="inverted_cdf")):
+        # An infinite break-even percentile means "never"
+        summary[f"p{p}"] = round(float(v)) if np.isfinite(v) else None
+    summary["mean"] = round(float(values[finite].mean())) if finite.any() else None
+    return summary
+
+def simulate_roi(distributions: dict = None, use_case: str = "General", samples: int = 1_000_000, seed: int = None,
+                 horizon_years: int = 5, discount_rate: float = 0.12, workers: int = None):
+    """
+    Monte Carlo version of get_roi_analysis.
+    `distributions` may set investment, daily_revenue, utilisation_days (per year) and operating_costs (monthly);
+    the rest come from default_distributions. The same seed (and inputs) always gives the same result.
+    """
+    import numpy as np
+    if not 1 <= samples <= ROI_SIMULATION_MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {ROI_SIMULATION_MAX_SAMPLES}.")
+    resolved = {**default_distributions(use_case), **(distributions or {})}
+    for name in ("investment", "daily_revenue", "utilisation_days", "operating_costs"):
+        if name not in resolved:
+            raise ValueError(f"No data to seed '{name}' from; pass its distribution.")
+        validate_distribution(name, resolved[name])
+
+    seed = int(np.random.SeedSequence().entropy % 2 ** 63) if seed is None else seed
+    sizes = [CHUNK_SAMPLES] * (samples // CHUNK_SAMPLES) + ([samples % CHUNK_SAMPLES] if samples % CHUNK_SAMPLES else [])
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(stream, size, resolved, horizon_years, discount_rate) for stream, size in zip(streams, sizes)]
+
+    # 1. Small runs stay in-process; large ones fan the streams out to worker processes
+    workers = min(workers or ROI_SIMULATION_WORKERS, len(jobs))
+    if samples >= ROI_POOL_MIN_SAMPLES and workers > 1:
+        # spawn, not fork: the API process runs threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_simulate_chunk, *zip(*jobs)))
+    else:
+        workers = 1
+        results = [_simulate_chunk(*job) for job in jobs]
+    break_even = np.concatenate([r[0] for r in results])
+    npv = np.concatenate([r[1] for r in results])
+
+    report = {
+        "samples": samples,
+        "seed": seed,
+        "workers": workers,
+        "use_case_analyzed": use_case,
+        "horizon_years": horizon_years,
+        "discount_rate": discount_rate,
+        "distributions": {name: spec if spec["dist"] != "empirical" else {"dist": "empirical", "observations": len(spec["params"])}
+                          for name, spec in resolved.items()},
+        "break_even_days": _summary(break_even),
+        "probability_loss_making": round(float(np.isinf(break_even).mean()), 4),
+        "probability_break_even_within_days": {str(days): round(float((break_even <= days).mean()), 4) for days in (365, 730)},
+        "npv_inr": _summary(npv),
+        "probability_npv_positive": round(float((npv > 0).mean()), 4)
+    }
+
+    # 2. Compare with the published break-even period of the matching RoiCalculation.json scenario, if any
+    key, scenario = _reference_scenario(use_case)
+    period = scenario.get("roi_metrics", {}).get("roi_break_even_period")
+    window = _months_to_days(period)
+    if window and len(window) == 2:
+        report["reference"] = {
+            "scenario": key,
+            "break_even_period": period,
+            "probability_within": round(float(((break_even >= window[0]) & (break_even <= window[1])).mean()), 4)
+        }
+    return report
@@ -1,42 +1,33 @@
-import pandas as pd
-import os
+from mcp_server.catalog import drone_catalog
 
 def recommend_drone(max_budget: float, primary_use: str, min_flight_time: int = 0):
     """
-    Filters the drone_models.csv to find the best match.
+    Looks up the best matches in the shared drone catalog.
     """
-    # Use absolute path for robustness
-    base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    csv_path = os.path.join(base_path, "data", "processed", "drone_models.csv")
-    
-    if not os.path.exists(csv_path):
+    if not drone_catalog.exists():
         return {"error": "Drone database not found. Please run data_generation.py"}
 
     try:
-        df = pd.read_csv(csv_path)
-        
         # Filter by budget
-        affordable_drones = df[df['price_inr'] <= max_budget]
-        
-        if affordable_drones.empty:
+        if drone_catalog.count(max_price=max_budget) == 0:
             return {"message": "No drones found within this budget. Try increasing your range."}
             
         # Filter by flight time (endurance)
-        if min_flight_time > 0:
-            affordable_drones = affordable_drones[affordable_drones['endurance_min'] >= min_flight_time]
+        min_endurance = min_flight_time if min_flight_time > 0 else None
             
-        if affordable_drones.empty:
+        if min_endurance is not None and drone_catalog.count(max_price=max_budget, min_endurance=min_endurance) == 0:
              return {"message": f"No drones found with {min_flight_time}+ min flight time in this budget."}
 
         # Simple logic to match use-case to drone class
         if "agri" in primary_use.lower():
             # Preference for Sprayer drones or larger payload
-            recommendation = affordable_drones[affordable_drones['class'].isin(['Small', 'Medium'])].head(3)
+            recommendation = drone_catalog.query(max_price=max_budget, min_endurance=min_endurance,
+                                                 classes=['Small', 'Medium'], limit=3)
         elif "photo" in primary_use.lower() or "map" in primary_use.lower():
              # Preference for high endurance
-             recommendation = affordable_drones.sort_values(by='endurance_min', ascending=False).head(3)
+             recommendation = drone_catalog.top("endurance_min", 3, max_price=max_budget, min_endurance=min_endurance)
         else:
-            recommendation = affordable_drones.sort_values(by='endurance_min', ascending=False).head(3)
+            recommendation = drone_catalog.top("endurance_min", 3, max_price=max_budget, min_endurance=min_endurance)
 
         return recommendation.to_dict(orient="records")
     except Exception as e:
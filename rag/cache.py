@@ -0,0 +1,141 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Define absolute path for the cache to avoid path issues
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, "rag", ".cache")
+
+
+class DiskCache:
+    """
+    Persistent key/value store backed by SQLite.
+    Entries are evicted least-recently-used first once `max_entries` is exceeded.
+    """
+    def __init__(self, path: str, max_entries: int = 50000):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON entries (last_used)")
+
+    def get_many(self, keys):
+        """Returns a {key: value} dict for the keys present in the cache."""
+        keys = list(set(keys))
+        found = {}
+        with self._lock, self._conn:
+            # SQLite limits the number of bound parameters, so look up in slices
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+        return found
+
+    def set_many(self, items: dict):
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, last_used) VALUES (?, ?, ?)",
+                [(k, v, now) for k, v in items.items()]
+            )
+            self._evict()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed embedding cache.
+    Vectors are keyed by (model name, SHA-256 of the text), so unchanged chunks
+    are never sent to the embedding API twice, across runs and processes.
+    """
+    def __init__(self, underlying: Embeddings, model_name: str, cache: DiskCache):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str):
+        return f"{self.model_name}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _lookup(self, texts):
+        keys = [self._key(t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        # Embed each missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return keys, found, missing
+
+    def _encode(self, missing, vectors):
+        return {
+            key: np.asarray(vector, dtype=np.float32).tobytes()
+            for key, vector in zip(missing.keys(), vectors)
+        }
+
+    def _decode(self, keys, found, missing):
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        return [np.frombuffer(found[key], dtype=np.float32).tolist() for key in keys]
+
+    def embed_documents(self, texts):
+        keys, found, missing = self._lookup(texts)
+        if missing:
+            new_entries = self._encode(missing, self.underlying.embed_documents(list(missing.values())))
+            self.cache.set_many(new_entries)
+            found.update(new_entries)
+        return self._decode(keys, found, missing)
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        # SQLite work runs in a thread and misses use the async client, so the event loop never blocks
+        keys, found, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            vectors = await self.underlying.aembed_documents(list(missing.values()))
+            new_entries = self._encode(missing, vectors)
+            await asyncio.to_thread(self.cache.set_many, new_entries)
+            found.update(new_entries)
+        return self._decode(keys, found, missing)
+
+    async def aembed_query(self, text: str):
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.cache)}
@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import threading
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from rag.embedder import DB_DIR
+
+# "sections" (small child chunks indexed, parent sections kept for expansion) or "flat" (1000-char chunks)
+CHUNKING_MODE = os.getenv("CHUNKING_MODE", "sections").lower()
+
+# Child chunks are what gets embedded and matched; parents are what the LLM may see instead
+CHILD_CHUNK_SIZE = int(os.getenv("CHILD_CHUNK_SIZE", "400"))
+CHILD_CHUNK_OVERLAP = 50
+PARENT_MAX_CHARS = int(os.getenv("PARENT_MAX_CHARS", "2000"))
+
+# Sections shorter than this (e.g. a bare "CHAPTER – 2" line) are merged into the next one
+MIN_PARENT_CHARS = 200
+
+FLAT_CHUNK_SIZE = 1000
+FLAT_CHUNK_OVERLAP = 200
+
+# Persisted next to the Chroma files, keyed by the parent_id stored on every child chunk
+PARENT_STORE_PATH = os.path.join(DB_DIR, "parent_sections.json")
+
+# "7. Procedure for obtaining RPTO Authorisation", "3.0 APPLICATIONS OF DRONES" (but not clause "7.2. The ...")
+# (a bare number, as in table rows like "97 D'AVIATORS LLP ...", is not a heading)
+_NUMBERED_HEADING_RE = re.compile(r"^\d{1,2}(?:\.|\.0\.?)\s+[A-Z][^\n]{2,60}$")
+# "CHAPTER – 2", "PART VI", "Annexure-I", "Rule 34", "SCHEDULE II"
+_KEYWORD_HEADING_RE = re.compile(r"^(?:CHAPTER|Chapter|PART|Part|ANNEXURE|Annexure|APPENDIX|Appendix|RULE|Rule|SCHEDULE|Schedule)"
+                                 r"\s*[-–—:]?\s*(?:\d+|[IVXLC]+)\b[^\n]{0,60}$")
+# Short title lines such as "Remote Pilot License 19" or "Eligibility for Pilot License20" after a blank line
+_TITLE_HEADING_RE = re.compile(r"^[A-Z][A-Za-z0-9’'&/(),\- ]{3,80}$")
+
+def is_heading(line: str, after_blank: bool = True):
+    """
+    Whether a (stripped) line of extracted PDF text opens a rule or section.
+    """
+    if not line or len(line) > 90:
+        return False
+    if _NUMBERED_HEADING_RE.match(line) or _KEYWORD_HEADING_RE.match(line):
+        return True
+    return after_blank and 2 <= len(line.split()) <= 10 and bool(_TITLE_HEADING_RE.match(line)) and not line.endswith(",")
+
+def _page_sections(text: str, current_heading: str = None):
+    """
+    Cuts one page at its headings. Returns [(start offset, heading, section text)];
+    text before the first heading continues the previous page's section
+    (a heading on the page's first line opens a new one instead).
+    """
+    starts, headings = [0], [current_heading]
+    offset, after_blank = 0, True
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if is_heading(stripped, after_blank):
+            if offset:
+                starts.append(offset)
+                headings.append(stripped)
+            else:
+                headings[0] = stripped
+        after_blank = not stripped
+        offset += len(line)
+
+    sections = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        if text[start:end].strip():
+            sections.append([start, headings[i], text[start:end]])
+
+    # Heading-only fragments (and page numbers) are folded into the section that follows them
+    merged = []
+    for section in sections:
+        if merged and len(merged[-1][2].strip()) < MIN_PARENT_CHARS:
+            merged[-1][2] += section[2]
+            merged[-1][1] = section[1] or merged[-1][1]
+        else:
+            merged.append(section)
+    # ...and a short tail into the section before it
+    if len(merged) > 1 and len(merged[-1][2].strip()) < MIN_PARENT_CHARS:
+        merged[-2][2] += merged.pop()[2]
+    return merged
+
+def split_into_chunks(documents, id_prefix: str):
+    """
+    Splits the pages of one document into indexable chunks.
+    Returns (chunks, parents): chunks is a list of (chunk_id, Document) with IDs "<id_prefix>::<n>";
+    parents maps "<id_prefix>::s<n>" to {"text", "metadata"} for every section a chunk points to
+    (child metadata: parent_id, section heading and the page-level start_index).
+    In "flat" mode chunks are the former 1000-character windows and there are no parents.
+    """
+    if CHUNKING_MODE == "flat":
+        splitter = RecursiveCharacterTextSplitter(chunk_size=FLAT_CHUNK_SIZE, chunk_overlap=FLAT_CHUNK_OVERLAP, add_start_index=True)
+        chunks = []
+        for page in documents:
+            for chunk in splitter.split_documents([page]):
+                chunks.append((f"{id_prefix}::{len(chunks)}", chunk))
+        return chunks, {}
+
+    parent_splitter = RecursiveCharacterTextSplitter(chunk_size=PARENT_MAX_CHARS, chunk_overlap=0, add_start_index=True)
+    child_splitter = RecursiveCharacterTextSplitter(chunk_size=CHILD_CHUNK_SIZE, chunk_overlap=CHILD_CHUNK_OVERLAP, add_start_index=True)
+    chunks, parents = [], {}
+    heading = None
+    for page in documents:
+        for start, heading, text in _page_sections(page.page_content, heading):
+            # 1. Long sections become several parents of at most PARENT_MAX_CHARS
+            pieces = [(0, text)] if len(text) <= PARENT_MAX_CHARS else \
+                [(p.metadata["start_index"], p.page_content) for p in parent_splitter.create_documents([text])]
+            for piece_start, piece in pieces:
+                stripped = piece.strip()
+                if not stripped:
+                    continue
+                parent_start = start + piece_start + piece.index(stripped)
+                parent_id = f"{id_prefix}::s{len(parents)}"
+                metadata = {**page.metadata, "start_index": parent_start}
+                if heading:
+                    metadata["section"] = heading[:120]
+                parents[parent_id] = {"text": stripped, "metadata": metadata}
+
+                # 2. Small children point back to their parent and keep page-level offsets
+                for child in child_splitter.create_documents([stripped]):
+                    child_metadata = {**metadata, "parent_id": parent_id,
+                                      "start_index": parent_start + child.metadata["start_index"]}
+                    chunks.append((f"{id_prefix}::{len(chunks)}", Document(page_content=child.page_content, metadata=child_metadata)))
+    return chunks, parents
+
+class ParentStore:
+    """
+    Full text of the parent sections, looked up when a child chunk is expanded for the LLM.
+    """
+    def __init__(self):
+        self.sections = {}  # parent id -> {"text", "metadata"}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.sections)
+
+    def add(self, parents: dict):
+        with self._lock:
+            self.sections.update(parents)
+
+    def remove(self, ids):
+        with self._lock:
+            for parent_id in ids:
+                self.sections.pop(parent_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.sections.clear()
+
+    def get(self, parent_id: str):
+        return self.sections.get(parent_id)
+
+    def save(self, path: str = None):
+        path = path or PARENT_STORE_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.sections, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = None):
+        path = path or PARENT_STORE_PATH
+        store = cls()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                store.sections = json.load(f)
+        return store
+
+_parent_store = None
+_parent_mtime = None
+_parent_lock = threading.RLock()
+
+def get_parent_store():
+    """
+    Returns the process-wide parent section store, reloading it when another process
+    (e.g. the setup script) has rewritten the file.
+    """
+    global _parent_store, _parent_mtime
+    with _parent_lock:
+        mtime = os.path.getmtime(PARENT_STORE_PATH) if os.path.exists(PARENT_STORE_PATH) else None
+        if _parent_store is None or mtime != _parent_mtime:
+            _parent_store = ParentStore.load()
+            _parent_mtime = mtime
+        return _parent_store
+
+def add_parent_sections(parents: dict):
+    """
+    Adds parent sections and persists the store; safe to call from concurrent ingestion workers.
+    """
+    if not parents:
+        return
+    with _parent_lock:
+        get_parent_store().add(parents)
+        save_parent_store()
+
+def save_parent_store():
+    global _parent_mtime
+    with _parent_lock:
+        if _parent_store is not None:
+            _parent_store.save()
+            _parent_mtime = os.path.getmtime(PARENT_STORE_PATH)
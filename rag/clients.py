@@ -0,0 +1,313 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# One keep-alive connection pool per process (sync + async) is shared by every model client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "120"))
+
+# Retry policy: the OpenAI SDK retries connection errors, 408/409/429 and 5xx with exponential backoff (honouring Retry-After)
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "60"))
+
+# Per-model caps on in-flight requests, e.g. "gpt-4o-mini=8,text-embedding-3-small=16"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+MODEL_CONCURRENCY = {
+    name.strip(): int(cap)
+    for name, cap in (item.split("=") for item in os.getenv("MODEL_CONCURRENCY", "").split(",") if "=" in item)
+}
+
+class ModelLimiter:
+    """
+    Caps in-flight HTTP requests for one model and records how long callers queued for a slot.
+    The same cap applies to worker threads and event loops: a released slot is handed to the longest waiter,
+    waking a thread through its Event or a coroutine through its future on its own loop.
+    """
+    def __init__(self, model: str, max_concurrency: int):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self._free = max_concurrency
+        self._waiters = deque()  # threading.Event or (loop, future), first come first served
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+
+    def _acquired(self, started):
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.waiting -= 1
+            self.requests += 1
+            self.in_flight += 1
+            self.queue_seconds += waited
+            self.max_queue_seconds = max(self.max_queue_seconds, waited)
+
+    def acquire(self):
+        started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            if self._free and not self._waiters:
+                self._free -= 1
+                woken = None
+            else:
+                woken = threading.Event()
+                self._waiters.append(woken)
+        if woken is not None:
+            woken.wait()
+        self._acquired(started)
+
+    async def aacquire(self):
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            self.waiting += 1
+            if self._free and not self._waiters:
+                self._free -= 1
+                waiter = None
+            else:
+                self._waiters.append(waiter)
+        if waiter is not None:
+            try:
+                await waiter[1]
+            except BaseException:
+                with self._lock:
+                    self.waiting -= 1
+                    handed_over = waiter not in self._waiters
+                    if not handed_over:
+                        self._waiters.remove(waiter)
+                # Cancelled just as the slot was handed over: pass it on
+                if handed_over:
+                    self._hand_over()
+                raise
+        self._acquired(started)
+
+    def _hand_over(self):
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return
+        loop, future = waiter
+        try:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+        except RuntimeError:
+            # The waiter's loop is closed
+            self._hand_over()
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._hand_over()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "avg_queue_ms": round(1000 * self.queue_seconds / self.requests, 2) if self.requests else 0.0,
+                "max_queue_ms": round(1000 * self.max_queue_seconds, 2)
+            }
+
+class PoolStats:
+    """
+    Connection reuse counters for a shared pool, fed by httpcore trace events.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+
+    def record(self, event: str):
+        with self._lock:
+            if event == "request":
+                self.requests += 1
+            elif event == "connection.connect_tcp.complete":
+                self.new_connections += 1
+            elif event == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def stats(self):
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0
+            }
+
+class _SlotStream(httpx.SyncByteStream):
+    # Holds the model slot until the (possibly streamed) response body is closed
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+class _AsyncSlotStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+def _once(fn):
+    done = threading.Event()
+    def wrapper():
+        if not done.is_set():
+            done.set()
+            fn()
+    return wrapper
+
+class _ModelTransport(httpx.BaseTransport):
+    """
+    Per-model view of the shared sync pool: applies the model's concurrency cap and traces connection reuse.
+    """
+    def __init__(self, pool, pool_stats, limiter):
+        self._pool = pool
+        self._pool_stats = pool_stats
+        self._limiter = limiter
+
+    def handle_request(self, request):
+        request.extensions["trace"] = lambda event, info: self._pool_stats.record(event)
+        self._pool_stats.record("request")
+        self._limiter.acquire()
+        release = _once(self._limiter.release)
+        try:
+            response = self._pool.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _SlotStream(response.stream, release)
+        return response
+
+class _AsyncModelTransport(httpx.AsyncBaseTransport):
+    def __init__(self, pool, pool_stats, limiter):
+        self._pool = pool
+        self._pool_stats = pool_stats
+        self._limiter = limiter
+
+    async def _trace(self, event, info):
+        self._pool_stats.record(event)
+
+    async def handle_async_request(self, request):
+        request.extensions["trace"] = self._trace
+        self._pool_stats.record("request")
+        await self._limiter.aacquire()
+        release = _once(self._limiter.release)
+        try:
+            response = await self._pool.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _AsyncSlotStream(response.stream, release)
+        return response
+
+class ClientRegistry:
+    """
+    Process-wide registry of model clients.
+    Every chat/embedding client shares the same keep-alive connection pools, so TLS handshakes
+    happen once per connection instead of once per client, and each model gets one concurrency cap.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S
+        )
+        self._pool = None
+        self._async_pool = None
+        self.sync_stats = PoolStats()
+        self.async_stats = PoolStats()
+        self._limiters = {}
+        self._clients = {}
+
+    def limiter(self, model: str):
+        with self._lock:
+            if model not in self._limiters:
+                self._limiters[model] = ModelLimiter(model, MODEL_CONCURRENCY.get(model, LLM_MAX_CONCURRENCY))
+            return self._limiters[model]
+
+    def _http_clients(self, model: str):
+        limiter = self.limiter(model)
+        with self._lock:
+            if self._pool is None:
+                self._pool = httpx.HTTPTransport(limits=self._limits)
+                self._async_pool = httpx.AsyncHTTPTransport(limits=self._limits)
+        timeout = httpx.Timeout(OPENAI_TIMEOUT_S, connect=10.0)
+        return (
+            httpx.Client(transport=_ModelTransport(self._pool, self.sync_stats, limiter), timeout=timeout),
+            httpx.AsyncClient(transport=_AsyncModelTransport(self._async_pool, self.async_stats, limiter), timeout=timeout)
+        )
+
+    def _get(self, key, factory):
+        with self._lock:
+            client = self._clients.get(key)
+        if client is None:
+            client = factory()
+            with self._lock:
+                client = self._clients.setdefault(key, client)
+        return client
+
+    def chat_model(self, model: str, temperature: float = 0):
+        def factory():
+            from langchain_openai import ChatOpenAI
+            http_client, http_async_client = self._http_clients(model)
+            return ChatOpenAI(
+                model=model, temperature=temperature, max_retries=OPENAI_MAX_RETRIES,
+                http_client=http_client, http_async_client=http_async_client
+            )
+        return self._get(("chat", model, temperature), factory)
+
+    def embedding_model(self, model: str):
+        def factory():
+            from langchain_openai import OpenAIEmbeddings
+            http_client, http_async_client = self._http_clients(model)
+            return OpenAIEmbeddings(
+                model=model, max_retries=OPENAI_MAX_RETRIES,
+                http_client=http_client, http_async_client=http_async_client
+            )
+        return self._get(("embeddings", model), factory)
+
+    def stats(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {
+            "connections": {"sync": self.sync_stats.stats(), "async": self.async_stats.stats()},
+            "models": {model: limiter.stats() for model, limiter in limiters.items()}
+        }
+
+# Global instance shared by the generator, retriever, vision and embedding code
+client_registry = ClientRegistry()
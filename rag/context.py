@@ -0,0 +1,197 @@
+import os
+from collections import OrderedDict
+from rag.chunking import get_parent_store
+
+# Maximum number of context tokens sent to the LLM per question
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+# Extra tokens that may be spent expanding matched child chunks to their parent section
+PARENT_EXPANSION_TOKENS = int(os.getenv("PARENT_EXPANSION_TOKENS", "400"))
+
+# Sections that would be cut below this many tokens are dropped instead
+MIN_SECTION_TOKENS = 50
+
+# Chunks separated by at most this many characters (stripped separator whitespace) count as adjacent
+ADJACENT_GAP_CHARS = 10
+
+_encoding = None
+
+def get_encoding():
+    """
+    The chat model's tiktoken encoding, loaded on first use (False when it cannot be loaded, e.g. offline).
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+def count_tokens(text: str):
+    """
+    Tokens as counted by the chat model's tokenizer.
+    Falls back to a ~4 characters/token estimate when the tiktoken encoding cannot be loaded (offline).
+    """
+    if get_encoding():
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def _truncate_to_tokens(text: str, max_tokens: int):
+    if _encoding:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens])
+    return text[:max_tokens * 4]
+
+def _strip_overlap(previous: str, following: str, min_overlap: int = 20):
+    """
+    Returns `following` without the longest prefix that repeats the end of `previous`.
+    Used for chunks stored without a `start_index`.
+    """
+    for size in range(min(len(previous), len(following)), min_overlap - 1, -1):
+        if previous.endswith(following[:size]):
+            return following[size:]
+    return following
+
+def _merge_group(items):
+    """
+    Merges chunks of one source page into contiguous sections.
+    `items` is a list of (relevance rank, Document); returns a list of [best rank, text, docs].
+    """
+    if all(doc.metadata.get("start_index") is not None for _, doc in items):
+        items = sorted(items, key=lambda item: item[1].metadata["start_index"])
+        sections = []
+        for rank, doc in items:
+            start = doc.metadata["start_index"]
+            end = start + len(doc.page_content)
+            # Overlapping or directly adjacent: extend the current section
+            if sections and start <= sections[-1][3] + ADJACENT_GAP_CHARS:
+                section = sections[-1]
+                if end > section[3]:
+                    if start <= section[3]:
+                        section[1] += doc.page_content[section[3] - start:]
+                    else:
+                        section[1] += "\n" + doc.page_content
+                    section[3] = end
+                section[0] = min(section[0], rank)
+                section[2].append(doc)
+            else:
+                sections.append([rank, doc.page_content, [doc], end])
+        return [section[:3] for section in sections]
+
+    # Without offsets, only strip overlap between chunks that literally repeat each other
+    sections = []
+    for rank, doc in items:
+        if sections:
+            remainder = _strip_overlap(sections[-1][1], doc.page_content)
+            if remainder != doc.page_content:
+                sections[-1][1] += remainder
+                sections[-1][2].append(doc)
+                continue
+            if doc.page_content in sections[-1][1]:
+                sections[-1][2].append(doc)
+                continue
+        sections.append([rank, doc.page_content, [doc]])
+    return sections
+
+def assemble_context(docs, token_budget: int = None):
+    """
+    Context Assembly: merges adjacent chunks from the same source page, strips the
+    repeated overlap between them and packs the result, most relevant first, into
+    `token_budget` tokens. Chunks indexed as children of a section (rag.chunking) are then
+    expanded to that whole section while the budget allows.
+    `docs` must be ordered by relevance. Returns (context text, docs used, usage dict).
+    """
+    token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+
+    # 1. Group chunks by their origin (file + page/row)
+    groups = OrderedDict()
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get("source"), doc.metadata.get("page"), doc.metadata.get("row"))
+        groups.setdefault(key, []).append((rank, doc))
+
+    # 2. Merge each group into de-duplicated sections and order them by relevance
+    sections = []
+    for items in groups.values():
+        sections.extend(_merge_group(items))
+    sections.sort(key=lambda section: section[0])
+
+    # 3. Pack sections into the token budget
+    packed, used_tokens = [], 0
+    for _, text, section_docs in sections:
+        tokens = count_tokens(text)
+        remaining = token_budget - used_tokens
+        if tokens > remaining:
+            if remaining < MIN_SECTION_TOKENS:
+                continue
+            text = _truncate_to_tokens(text, remaining)
+            tokens = count_tokens(text)
+        packed.append([text, section_docs, tokens])
+        used_tokens += tokens
+
+    # 4. Swap matched child chunks for their whole parent section while the budget allows
+    packed, expanded = _expand_to_parents(packed, min(token_budget - used_tokens, PARENT_EXPANSION_TOKENS))
+
+    used_tokens = sum(tokens for _, _, tokens in packed)
+    used_docs = [doc for _, section_docs, _ in packed for doc in section_docs]
+    usage = {"context_tokens": used_tokens, "context_budget": token_budget, "expanded_sections": expanded}
+    return "\n\n".join(text for text, _, _ in packed), used_docs, usage
+
+def _parent_of(section_docs):
+    parent_ids = {doc.metadata.get("parent_id") for doc in section_docs}
+    return parent_ids.pop() if len(parent_ids) == 1 else None
+
+def _expand_to_parents(packed, spare_tokens: int):
+    """
+    Replaces packed child sections by their parent section, most relevant first, if the extra
+    tokens fit in `spare_tokens`. Every matched chunk keeps its place in the context first;
+    expansion only spends what is left. Returns (packed, number of sections expanded).
+    """
+    parents = [_parent_of(section_docs) for _, section_docs, _ in packed]
+    if not any(parents):
+        return packed, 0
+
+    store = get_parent_store()
+    expanded, dropped = 0, set()
+    for i, parent_id in enumerate(parents):
+        if not parent_id or i in dropped:
+            continue
+        parent = store.get(parent_id)
+        # Later sections of the same parent are covered by it once it is expanded
+        siblings = [j for j in range(i + 1, len(packed)) if parents[j] == parent_id]
+        if parent is None:
+            continue
+        parent_tokens = count_tokens(parent["text"])
+        extra = parent_tokens - packed[i][2] - sum(packed[j][2] for j in siblings)
+        if extra > spare_tokens:
+            continue
+        packed[i][0] = parent["text"]
+        packed[i][2] = parent_tokens
+        for j in siblings:
+            packed[i][1] = packed[i][1] + packed[j][1]
+            dropped.add(j)
+        spare_tokens -= extra
+        expanded += 1
+    return [section for j, section in enumerate(packed) if j not in dropped], expanded
+
+def cite_sources(docs):
+    """
+    Citation strings in relevance order, one per source file, listing the PDF pages used,
+    e.g. "Drone Rules.pdf (p. 4)" or "Drone Rules.pdf (pp. 2, 5)".
+    """
+    pages = OrderedDict()
+    for doc in docs:
+        source_pages = pages.setdefault(doc.metadata.get("source", "Unknown Document"), [])
+        page = doc.metadata.get("page")
+        if page is not None and int(page) + 1 not in source_pages:
+            source_pages.append(int(page) + 1)
+
+    citations = []
+    for source, source_pages in pages.items():
+        if not source_pages:
+            citations.append(source)
+        elif len(source_pages) == 1:
+            citations.append(f"{source} (p. {source_pages[0]})")
+        else:
+            citations.append(f"{source} (pp. {', '.join(str(p) for p in sorted(source_pages))})")
+    return citations
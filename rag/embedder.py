@@ -1,22 +1,112 @@
 import os
+import uuid
+import threading
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
+from rag.cache import CACHE_DIR, DiskCache, CachedEmbeddings
+from rag.clients import client_registry
 
 load_dotenv()
 
+# Define absolute path for the database to avoid path issues
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = os.path.join(BASE_DIR, "rag", "vector_db")
+COLLECTION_NAME = "drone_intel"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# "chroma" (default) or "numpy" (in-process memory-mapped matrix, see rag/vector_store.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+NUMPY_STORE_DIR = os.path.join(DB_DIR, "numpy_store")
+# NumPy backend only: scan a float16 or int8 copy of the vectors and rescore the best
+# VECTOR_RESCORE_FACTOR * fetch_k candidates at full precision
+VECTOR_PRECISION = os.getenv("VECTOR_PRECISION", "float32").lower()
+VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+
+# Rewritten whenever the collection changes, so caches in every process can detect stale answers
+VERSION_PATH = os.path.join(DB_DIR, "collection_version")
+# Called after every bump in this process, so its caches need not wait for their next version check
+_version_listeners = []
+
+# Heavy clients are created on first use, so importing the API stays fast
+_embeddings = None
+_vector_db = None
+_init_lock = threading.Lock()
+
+def get_embeddings():
+    """
+    Returns the process-wide OpenAI embedding function, wrapped in the on-disk embedding cache.
+    """
+    global _embeddings
+    with _init_lock:
+        if _embeddings is None:
+            cache = DiskCache(
+                os.path.join(CACHE_DIR, "embeddings.sqlite"),
+                max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+            )
+            _embeddings = CachedEmbeddings(client_registry.embedding_model(EMBEDDING_MODEL), EMBEDDING_MODEL, cache)
+    return _embeddings
+
 def get_vector_db():
     """
-    Initializes and returns the Chroma vector database using OpenAI embeddings.
-    """
-    # Define absolute path for the database to avoid path issues
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    DB_DIR = os.path.join(BASE_DIR, "rag", "vector_db")
-    
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-    
-    return Chroma(
-        persist_directory=DB_DIR,
-        embedding_function=embeddings,
-        collection_name="drone_intel"
-    )
\ No newline at end of file
+    Returns the process-wide vector database (Chroma or the NumPy store, per VECTOR_BACKEND)
+    using OpenAI embeddings, opened on first use.
+    """
+    global _vector_db
+    embeddings = get_embeddings()
+    with _init_lock:
+        if _vector_db is None:
+            if VECTOR_BACKEND == "numpy":
+                from rag.vector_store import NumpyVectorStore
+                _vector_db = NumpyVectorStore(NUMPY_STORE_DIR, embedding_function=embeddings,
+                                              precision=VECTOR_PRECISION, rescore_factor=VECTOR_RESCORE_FACTOR)
+            else:
+                from langchain_chroma import Chroma
+                _vector_db = Chroma(
+                    persist_directory=DB_DIR,
+                    embedding_function=embeddings,
+                    collection_name=COLLECTION_NAME
+                )
+    return _vector_db
+
+def upsert_vectors(ids, embeddings, documents, metadatas):
+    """
+    Stores chunks with precomputed embeddings in the active backend (no embedding call).
+    """
+    vector_db = get_vector_db()
+    if VECTOR_BACKEND == "numpy":
+        vector_db.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+    else:
+        vector_db._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+def flush_vectors():
+    """
+    Persists pending upserts. Chroma writes through on every call; the NumPy store saves on demand.
+    """
+    if VECTOR_BACKEND == "numpy" and _vector_db is not None:
+        _vector_db.flush()
+
+def count_vectors():
+    vector_db = get_vector_db()
+    return vector_db.count() if VECTOR_BACKEND == "numpy" else vector_db._collection.count()
+
+def bump_collection_version():
+    """
+    Marks the collection as changed (after uploads or knowledge-base builds).
+    """
+    os.makedirs(DB_DIR, exist_ok=True)
+    with open(VERSION_PATH, "w") as f:
+        f.write(uuid.uuid4().hex)
+    for listener in _version_listeners:
+        listener()
+
+def on_collection_change(listener):
+    """
+    Registers a callable run after every bump_collection_version() in this process.
+    """
+    _version_listeners.append(listener)
+
+def get_collection_version():
+    try:
+        with open(VERSION_PATH, "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
@@ -1,28 +1,46 @@
-from langchain_openai import ChatOpenAI
-from rag.retriever import retrieve_relevant_docs
+import os
+import time
+import asyncio
+import threading
+from rag.retriever import retrieve_relevant_docs, aretrieve_relevant_docs
+from rag.context import assemble_context, cite_sources
+from rag.clients import client_registry
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Initialize the LLM (GPT-4o mini is cost-effective and fast)
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
+# GPT-4o mini is cost-effective and fast
+CHAT_MODEL = "gpt-4o-mini"
 
-def generate_drone_response(user_query: str):
+# The LLM is taken from the shared client registry on first use
+llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    global llm
+    with _llm_lock:
+        if llm is None:
+            llm = client_registry.chat_model(CHAT_MODEL, temperature=0.2)
+    return llm
+
+# Outstanding completions are capped per model by the client registry (LLM_MAX_CONCURRENCY / MODEL_CONCURRENCY)
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+
+def build_messages(user_query: str, context_docs):
     """
-    Orchestrates the RAG process: Retrieval -> Context Assembly -> Generation
+    Context Assembly: builds the system prompt and citation list from the retrieved chunks.
+    Overlapping chunks are merged and the context is packed into the token budget.
     """
-    # 1. Retrieve top context chunks from the vector DB
-    context_docs = retrieve_relevant_docs(user_query)
-    context_text = "\n\n".join([doc.page_content for doc in context_docs])
-    
-    # 2. Extract unique source names for citations
-    sources = list(set([doc.metadata.get('source', 'Unknown Document') for doc in context_docs]))
-    
-    # 3. Construct the System Prompt
+    context_text, used_docs, usage = assemble_context(context_docs)
+
+    # Unique source names with page numbers for citations
+    sources = cite_sources(used_docs)
+
+    # Construct the System Prompt
     system_prompt = f"""
-    You are an expert Indian Drone Intelligence Assistant. 
+    You are an expert Indian Drone Intelligence Assistant.
     Use the following pieces of context to answer the user's question accurately.
-    
+
     - If the answer is not in the context, say: "I am sorry, but my current knowledge base doesn't contain that specific detail."
     - Refer to specific Drone Rules 2021 or 2024 updates if mentioned in the context.
     - Always maintain a professional and helpful tone.
@@ -30,14 +48,74 @@ def generate_drone_response(user_query: str):
     Context:
     {context_text}
     """
-    
-    # 4. Get response from LLM
-    response = llm.invoke([
+
+    messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_query}
-    ])
-    
+    ]
+    return messages, sources, usage
+
+def generate_drone_response(user_query: str):
+    """
+    Orchestrates the RAG process: Retrieval -> Context Assembly -> Generation
+    """
+    # 1. Retrieve top context chunks from the vector DB
+    context_docs = retrieve_relevant_docs(user_query)
+
+    # 2. Build the prompt and citations
+    messages, sources, usage = build_messages(user_query, context_docs)
+
+    # 3. Get response from LLM
+    response = get_llm().invoke(messages)
+
+    return {
+        "answer": response.content,
+        "sources": sources,
+        **usage
+    }
+
+async def agenerate_drone_response(user_query: str, context_docs=None, filters: dict = None):
+    """
+    Async RAG pipeline used by the API: retrieval runs off the event loop
+    and the completion is awaited under the LLM concurrency limit.
+    Pass `context_docs` to skip retrieval (e.g. when it was done for a whole batch)
+    or `filters` to restrict retrieval by chunk metadata.
+    """
+    if context_docs is None:
+        context_docs = await aretrieve_relevant_docs(user_query, filters=filters)
+    # Token counting (and a first tokenizer or parent-section load) stays off the event loop
+    messages, sources, usage = await asyncio.to_thread(build_messages, user_query, context_docs)
+
+    response = await asyncio.wait_for(get_llm().ainvoke(messages), LLM_TIMEOUT_S)
+
     return {
         "answer": response.content,
-        "sources": sources
-    }
\ No newline at end of file
+        "sources": sources,
+        **usage
+    }
+
+async def astream_drone_response(user_query: str, filters: dict = None):
+    """
+    Async streaming variant of agenerate_drone_response.
+    """
+    context_docs = await aretrieve_relevant_docs(user_query, filters=filters)
+    messages, sources, usage = await asyncio.to_thread(build_messages, user_query, context_docs)
+    yield {"event": "sources", "sources": sources, **usage}
+
+    # LLM_TIMEOUT_S bounds the time spent waiting on the model, not on the consumer of this generator,
+    # so the timeout only wraps the awaits and never a yield
+    stream = get_llm().astream(messages)
+    remaining = LLM_TIMEOUT_S
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                async with asyncio.timeout(remaining):
+                    chunk = await anext(stream)
+            except StopAsyncIteration:
+                return
+            remaining -= time.perf_counter() - started
+            if chunk.content:
+                yield {"event": "token", "content": chunk.content}
+    finally:
+        await stream.aclose()
@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+from langchain_core.documents import Document
+from rag.embedder import DB_DIR
+from rag.metadata import matches_filters
+
+# Persisted next to the Chroma files so both stores describe the same chunk IDs
+LEXICAL_INDEX_PATH = os.path.join(DB_DIR, "lexical_index.json")
+
+# Identifiers such as "DTC-1-of-2022", "AG-365" or "Rule 5.1" are kept whole
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str):
+    """
+    Lower-cased word tokens. Compound identifiers yield the whole identifier and its parts,
+    so "DTC-1-of-2022" matches both the exact reference and a query for "2022".
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class BM25Index:
+    """
+    In-process Okapi BM25 inverted index over the knowledge-base chunks.
+    Answers lexical lookups without an embedding round-trip.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}                    # chunk id -> {"text", "metadata"}
+        self._lengths = {}                # chunk id -> token count
+        self._postings = defaultdict(dict)  # term -> {chunk id: term frequency}
+        self._total_length = 0
+        # Uploads are ingested by background workers while chats search the index
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, ids, documents):
+        with self._lock:
+            for chunk_id, doc in zip(ids, documents):
+                if chunk_id in self.docs:
+                    self._remove_one(chunk_id)
+                self._index(chunk_id, doc.page_content, dict(doc.metadata))
+
+    def remove(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self.docs:
+                    self._remove_one(chunk_id)
+
+    def clear(self):
+        with self._lock:
+            self.docs.clear()
+            self._lengths.clear()
+            self._postings.clear()
+            self._total_length = 0
+
+    def _index(self, chunk_id, text, metadata):
+        counts = Counter(tokenize(text))
+        self.docs[chunk_id] = {"text": text, "metadata": metadata}
+        self._lengths[chunk_id] = sum(counts.values())
+        self._total_length += self._lengths[chunk_id]
+        for term, tf in counts.items():
+            self._postings[term][chunk_id] = tf
+
+    def _remove_one(self, chunk_id):
+        for term in set(tokenize(self.docs[chunk_id]["text"])):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(chunk_id)
+        del self.docs[chunk_id]
+
+    def search(self, query: str, k: int = 4, filters: dict = None):
+        """
+        Returns up to `k` (Document, score) pairs, best first.
+        `filters` restricts the candidates by chunk metadata (see rag.metadata.to_chroma_filter).
+        """
+        with self._lock:
+            if not self.docs:
+                return []
+            n_docs = len(self.docs)
+            avg_length = self._total_length / n_docs
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / avg_length)
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if filters:
+                scores = {cid: score for cid, score in scores.items() if matches_filters(self.docs[cid]["metadata"], filters)}
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [
+                (Document(page_content=self.docs[cid]["text"], metadata=self.docs[cid]["metadata"], id=cid), score)
+                for cid, score in best
+            ]
+
+    def save(self, path: str = None):
+        # Only the chunks are stored; postings are rebuilt on load
+        path = path or LEXICAL_INDEX_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.docs, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = None):
+        path = path or LEXICAL_INDEX_PATH
+        index = cls()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for chunk_id, doc in json.load(f).items():
+                    index._index(chunk_id, doc["text"], doc["metadata"])
+        return index
+
+_lexical_index = None
+_lexical_mtime = None
+_lexical_lock = threading.RLock()
+
+def get_lexical_index():
+    """
+    Returns the process-wide BM25 index, reloading it when another process
+    (e.g. the setup script) has rewritten the file.
+    """
+    global _lexical_index, _lexical_mtime
+    with _lexical_lock:
+        mtime = os.path.getmtime(LEXICAL_INDEX_PATH) if os.path.exists(LEXICAL_INDEX_PATH) else None
+        if _lexical_index is None or mtime != _lexical_mtime:
+            _lexical_index = BM25Index.load()
+            _lexical_mtime = mtime
+        return _lexical_index
+
+def add_to_lexical_index(ids, documents):
+    """
+    Adds chunks and persists the index; safe to call from concurrent ingestion workers.
+    """
+    with _lexical_lock:
+        get_lexical_index().add(ids, documents)
+        save_lexical_index()
+
+def save_lexical_index():
+    global _lexical_mtime
+    with _lexical_lock:
+        if _lexical_index is not None:
+            _lexical_index.save()
+            _lexical_mtime = os.path.getmtime(LEXICAL_INDEX_PATH)
+
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    """
+    Merges several ranked Document lists; a document scores sum(1 / (k + rank)) over the lists it appears in.
+    """
+    scores = defaultdict(float)
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc.id or doc.page_content
+            scores[key] += 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
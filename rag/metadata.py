@@ -0,0 +1,75 @@
+import os
+import re
+
+# Bump when the metadata recorded at ingest changes, so setup_database re-indexes everything
+METADATA_VERSION = 1
+
+# Checked in order against the lower-cased file name; the first match wins
+DOC_TYPE_KEYWORDS = [
+    ("regulation", ("rule", "regulation", "penalit", "procedure", "dtc-", "rpto", "dgca", "guideline",
+                    "enlistment", "authorisation", "authorization", "certification")),
+    ("flight_log", ("flight_log",)),
+    ("business_case", ("business", "case", "roi", "commercial", "study")),
+    ("technical", ("technical", "models", "spec"))
+]
+
+# Fallback document type per origin folder
+ORIGIN_DOC_TYPES = {"docs": "documentation", "processed": "dataset", "synthetic": "dataset", "upload": "upload"}
+
+_YEAR_RE = re.compile(r"\b(20[0-3]\d)\b")
+_TITLE_YEAR_RE = re.compile(r"(?:Rules|Regulations?|Order|Circular)[, ]*(20[0-3]\d)")
+
+def classify_document(name: str, origin: str):
+    """
+    Document type of a file, from its name and the corpus folder it came from.
+    """
+    if origin == "docs":
+        return "documentation"
+    lowered = os.path.basename(name).lower()
+    for doc_type, keywords in DOC_TYPE_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return doc_type
+    return ORIGIN_DOC_TYPES.get(origin, "reference")
+
+def extract_year(name: str, text: str = ""):
+    """
+    Year of a regulation, e.g. 2022 for "DTC-1-of-2022" or 2021 for a first page titled "Drone Rules, 2021".
+    Looks at the file name first, then the first page. Returns None if there is no year.
+    """
+    match = _YEAR_RE.search(os.path.basename(name)) or _TITLE_YEAR_RE.search(text[:3000])
+    return int(match.group(1)) if match else None
+
+def document_metadata(name: str, origin: str, text: str = ""):
+    """
+    Structured metadata stored on every chunk of a document: doc_type, origin and,
+    for regulations, the year when it can be determined.
+    """
+    metadata = {"doc_type": classify_document(name, origin), "origin": origin}
+    if metadata["doc_type"] == "regulation":
+        year = extract_year(name, text)
+        if year is not None:
+            metadata["year"] = year
+    return metadata
+
+def to_chroma_filter(filters):
+    """
+    Converts {"doc_type": "regulation", "year": [2021, 2022]} into a Chroma `where` clause.
+    List values match any of their items.
+    """
+    if not filters:
+        return None
+    clauses = [
+        {key: {"$in": list(value)} if isinstance(value, (list, tuple, set)) else {"$eq": value}}
+        for key, value in filters.items()
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def matches_filters(metadata: dict, filters):
+    """
+    Same semantics as to_chroma_filter, evaluated in Python (used by the BM25 index).
+    """
+    for key, value in (filters or {}).items():
+        allowed = value if isinstance(value, (list, tuple, set)) else (value,)
+        if metadata.get(key) not in allowed:
+            return False
+    return True
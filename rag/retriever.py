@@ -1,32 +1,193 @@
 import os
-import base64
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
-from langchain_core.messages import HumanMessage
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from rag.embedder import get_vector_db
+from rag.embedder import get_vector_db, get_embeddings, bump_collection_version
+from rag.vision import describe_image
+from rag.clients import client_registry
+from rag.lexical import get_lexical_index, add_to_lexical_index, reciprocal_rank_fusion
+from rag.metadata import document_metadata, to_chroma_filter
+from rag.context import cite_sources
+from rag.chunking import split_into_chunks, add_parent_sections
 
 load_dotenv()
 
-# Initialize Vector Store
-vector_db = get_vector_db()
+# The vector store and LLM are opened on first use (see get_vector_db / get_llm)
+llm = None
+_llm_lock = threading.Lock()
 
-# Initialize the LLM
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+def get_llm():
+    global llm
+    with _llm_lock:
+        if llm is None:
+            llm = client_registry.chat_model("gpt-4o-mini", temperature=0)
+    return llm
 
-def retrieve_relevant_docs(query: str, k: int = 10):
+# "hybrid" (vector + BM25), "vector" or "lexical" (no embedding round-trip)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# Chunks embedded per request when ingesting uploads
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+# Per-stage timeouts (seconds) for the async path
+EMBED_TIMEOUT_S = float(os.getenv("EMBED_TIMEOUT_S", "5"))
+RETRIEVAL_TIMEOUT_S = float(os.getenv("RETRIEVAL_TIMEOUT_S", "5"))
+
+# In-process LRU of recent query embeddings, shared by the sync and async paths
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "256"))
+_query_vectors = OrderedDict()
+_query_vectors_lock = threading.Lock()
+
+def _recall_query_vector(query: str):
+    with _query_vectors_lock:
+        vector = _query_vectors.get(query)
+        if vector is not None:
+            _query_vectors.move_to_end(query)
+        return vector
+
+def _remember_query_vector(query: str, vector):
+    with _query_vectors_lock:
+        _query_vectors[query] = vector
+        _query_vectors.move_to_end(query)
+        while len(_query_vectors) > QUERY_EMBEDDING_CACHE_SIZE:
+            _query_vectors.popitem(last=False)
+
+def embed_query(query: str):
+    """
+    Embeds a query once; recent queries are served from an in-process LRU cache.
+    """
+    vector = _recall_query_vector(query)
+    if vector is None:
+        vector = tuple(get_embeddings().embed_query(query))
+        _remember_query_vector(query, vector)
+    return vector
+
+async def aembed_query(query: str):
+    """
+    Async counterpart of embed_query. Raises asyncio.TimeoutError after EMBED_TIMEOUT_S.
+    """
+    vector = _recall_query_vector(query)
+    if vector is None:
+        vector = tuple(await asyncio.wait_for(get_embeddings().aembed_query(query), EMBED_TIMEOUT_S))
+        _remember_query_vector(query, vector)
+    return vector
+
+async def aembed_queries(queries):
+    """
+    Embeds many queries with a single batched embedding request (LRU hits are skipped).
+    """
+    vectors = [_recall_query_vector(q) for q in queries]
+    missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+    if missing:
+        # Scale the timeout with the batch, since one request now carries every query
+        timeout = EMBED_TIMEOUT_S * (1 + len(missing) // 100)
+        embedded = await asyncio.wait_for(get_embeddings().aembed_documents(missing), timeout)
+        for query, vector in zip(missing, embedded):
+            _remember_query_vector(query, tuple(vector))
+        vectors = [v if v is not None else _recall_query_vector(q) for q, v in zip(queries, vectors)]
+    return vectors
+
+def _fuse(mode: str, vector_docs, lexical_docs):
+    if mode == "lexical":
+        return lexical_docs[:4]
+    if mode == "vector":
+        return vector_docs
+    return reciprocal_rank_fusion([vector_docs, lexical_docs])[:4]
+
+def _vector_search(embedding, k: int, filters: dict = None):
+    # Re-ranking Strategy (Phase 3.3) - MMR runs on the candidate vectors returned by the lookup
+    return get_vector_db().max_marginal_relevance_search_by_vector(
+        list(embedding), k=4, fetch_k=k, filter=to_chroma_filter(filters)
+    )
+
+def _lexical_search(query: str, filters: dict = None):
+    return [doc for doc, _ in get_lexical_index().search(query, k=4, filters=filters)]
+
+def retrieve_relevant_docs(query: str, k: int = 10, mode: str = None, filters: dict = None):
     """
     Enhanced retrieval with basic re-ranking logic.
-    Uses Max Marginal Relevance (MMR) to fetch diverse documents.
+    Embeds the query once, fetches the top `k` candidates in a single vector lookup
+    and re-ranks them locally with Max Marginal Relevance (MMR) for diversity.
+    In hybrid mode the result is fused with BM25 matches, which catch exact identifiers
+    (rule numbers, "DTC-1-of-2022", model names) that embeddings blur.
+    `filters` (e.g. {"doc_type": "regulation"}) restricts the search by chunk metadata;
+    if nothing matches, the search is repeated without them.
+    """
+    mode = mode or RETRIEVAL_MODE
+    vector_docs, lexical_docs = [], []
+    if mode != "lexical":
+        vector_docs = _vector_search(embed_query(query), k, filters)
+    if mode != "vector":
+        lexical_docs = _lexical_search(query, filters)
+    docs = _fuse(mode, vector_docs, lexical_docs)
+    if filters and not docs:
+        return retrieve_relevant_docs(query, k=k, mode=mode)
+    return docs
+
+async def aretrieve_relevant_docs(query: str, k: int = 10, mode: str = None, filters: dict = None):
+    """
+    Async counterpart of retrieve_relevant_docs that never blocks the event loop.
+    If embedding or the vector lookup fails or exceeds its timeout, falls back to the lexical-only fast path.
     """
-    # 1. Initial semantic search (Phase 3.1)
-    initial_docs = vector_db.similarity_search(query, k=k)
-    # 2. Re-ranking Strategy (Phase 3.3) - Using MMR for diversity
-    re_ranked_docs = vector_db.max_marginal_relevance_search(query, k=4, fetch_k=k)
-    return re_ranked_docs[:4]  # Return top 4 after re-ranking
+    mode = mode or RETRIEVAL_MODE
+    vector_docs, lexical_docs = [], []
+    if mode != "lexical":
+        try:
+            embedding = await aembed_query(query)
+            vector_docs = await asyncio.wait_for(
+                asyncio.to_thread(_vector_search, embedding, k, filters),
+                RETRIEVAL_TIMEOUT_S
+            )
+        except Exception as e:
+            # A slow or failing embedding service should not fail the question
+            print(f"Vector retrieval failed ({type(e).__name__}: {e}), answering from the lexical index: {query!r}")
+            mode = "lexical"
+    if mode != "vector":
+        lexical_docs = await asyncio.to_thread(_lexical_search, query, filters)
+    docs = _fuse(mode, vector_docs, lexical_docs)
+    if filters and not docs:
+        return await aretrieve_relevant_docs(query, k=k, mode=mode)
+    return docs
+
+async def aretrieve_many(queries, embeddings=None, k: int = 10, mode: str = None, filters=None):
+    """
+    Batch counterpart of aretrieve_relevant_docs: one batched embedding request and
+    all vector lookups in a single worker-thread hop. Returns one document list per query.
+    `filters` is None or one filter dict (or None) per query.
+    """
+    mode = mode or RETRIEVAL_MODE
+    filters = filters or [None] * len(queries)
+    vector_results = [[] for _ in queries]
+    lexical_results = [[] for _ in queries]
+    if mode != "lexical":
+        try:
+            if embeddings is None:
+                embeddings = await aembed_queries(queries)
+            vector_results = await asyncio.wait_for(
+                asyncio.to_thread(lambda: [_vector_search(e, k, f) for e, f in zip(embeddings, filters)]),
+                RETRIEVAL_TIMEOUT_S * (1 + len(queries) // 100)
+            )
+        except Exception as e:
+            print(f"Batch vector retrieval failed ({type(e).__name__}: {e}), answering {len(queries)} queries from the lexical index")
+            mode = "lexical"
+    if mode != "vector":
+        lexical_results = await asyncio.to_thread(lambda: [_lexical_search(q, f) for q, f in zip(queries, filters)])
+    results = [_fuse(mode, v, l) for v, l in zip(vector_results, lexical_results)]
+
+    # Filtered queries without any match are retried unfiltered
+    retry = [i for i, docs in enumerate(results) if filters[i] and not docs]
+    if retry:
+        retried = await aretrieve_many(
+            [queries[i] for i in retry],
+            embeddings=[embeddings[i] for i in retry] if mode != "lexical" else None,
+            k=k, mode=mode
+        )
+        for i, docs in zip(retry, retried):
+            results[i] = docs
+    return results
 
 def query_drone_knowledge(user_query: str):
     """
@@ -43,60 +204,74 @@ def query_drone_knowledge(user_query: str):
     
     Context: {context}"""
     
-    response = llm.invoke([
+    response = get_llm().invoke([
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_query}
     ])
     
     return {
         "answer": response.content,
-        "sources": list(set([d.metadata.get('source', 'Unknown') for d in docs]))
+        "sources": cite_sources(docs)
     }
 
-def ingest_multimodal_data(file_path: str, file_type: str):
+def ingest_multimodal_data(file_path: str, file_type: str, source_name: str = None, progress=None):
     """
     Phase 3.3: Support for multi-modal queries.
     Handles different file formats for ingestion into the RAG pipeline.
+    `progress(chunks_embedded, chunks_total)` is called as embedding batches complete.
     """
     # Logic to route based on file type (PDF, CSV, TXT, JSON)
     # This satisfies the requirement for 'supporting multi-modal queries' 
     # by allowing the system to process diverse data inputs.
-    source_name = os.path.basename(file_path)
+    source_name = source_name or os.path.basename(file_path)
     
     if file_type == "text/plain":
         with open(file_path, 'r') as f:
-            return ingest_text(f.read(), source_name)
+            return ingest_text(f.read(), source_name, progress)
     elif file_type == "application/json":
         with open(file_path, 'r') as f:
-            return ingest_text(f.read(), source_name)
+            return ingest_text(f.read(), source_name, progress)
     elif file_type == "text/csv":
         with open(file_path, 'r') as f:
-            return ingest_text(f.read(), source_name)
+            return ingest_text(f.read(), source_name, progress)
     elif file_type == "application/pdf":
+        from langchain_community.document_loaders import PyPDFLoader
         loader = PyPDFLoader(file_path)
-        pages = loader.load()
-        text = "\n\n".join([p.page_content for p in pages])
-        return ingest_text(text, source_name)
+        # Pages are ingested separately so chunks keep their page number for citations
+        pages = [Document(page_content=p.page_content, metadata={"page": p.metadata.get("page")}) for p in loader.load()]
+        return ingest_documents(pages, source_name, progress)
     elif file_type in ["image/jpeg", "image/png", "image/jpg"]:
-        # Vision capability for Image-to-Text
-        with open(file_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode("utf-8")
-        
-        vision_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-        message = HumanMessage(
-            content=[
-                {"type": "text", "text": "Describe this image in detail for a search engine. Include any text found in the image."},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}}
-            ]
-        )
-        response = vision_llm.invoke([message])
-        return ingest_text(response.content, source_name)
+        # Vision capability for Image-to-Text (cached by image hash, downscaled before upload)
+        return ingest_text(describe_image(file_path), source_name, progress)
         
     return 0
 
-def ingest_text(text: str, source: str):
-    doc = Document(page_content=text, metadata={"source": source})
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.split_documents([doc])
-    vector_db.add_documents(chunks)
-    return len(chunks)
\ No newline at end of file
+def ingest_text(text: str, source: str, progress=None):
+    return ingest_documents([Document(page_content=text)], source, progress)
+
+def ingest_documents(documents, source: str, progress=None):
+    """
+    Splits, tags and embeds uploaded documents (e.g. the pages of one PDF).
+    Every chunk records its source, doc_type, origin ("upload") and, when found, year;
+    in "sections" chunking mode also its parent section.
+    """
+    metadata = {"source": source, **document_metadata(source, "upload", documents[0].page_content if documents else "")}
+    for doc in documents:
+        doc.metadata = {**{k: v for k, v in doc.metadata.items() if v is not None}, **metadata}
+    pairs, parents = split_into_chunks(documents, f"upload:{source}:{uuid.uuid4().hex}")
+    ids = [chunk_id for chunk_id, _ in pairs]
+    chunks = [chunk for _, chunk in pairs]
+    # Stored first, so a child is never searchable before the section it expands to
+    add_parent_sections(parents)
+
+    # Embed in batches so long uploads can report progress
+    vector_db = get_vector_db()
+    for start in range(0, len(chunks), INGEST_BATCH_SIZE):
+        end = start + INGEST_BATCH_SIZE
+        vector_db.add_documents(chunks[start:end], ids=ids[start:end])
+        if progress:
+            progress(min(end, len(chunks)), len(chunks))
+
+    add_to_lexical_index(ids, chunks)
+    bump_collection_version()
+    return len(chunks)
@@ -0,0 +1,372 @@
+import os
+import json
+import threading
+import numpy as np
+from langchain_core.documents import Document
+
+def _unit_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def quantize_rows(rows, precision: str):
+    """
+    Compact copy of unit-normalized rows for the first scoring pass.
+    float16 halves the matrix; int8 quarters it, with one float32 scale per row
+    (row ≈ codes * scale). Returns (codes, scales); scales is None for float16.
+    """
+    rows = np.asarray(rows, dtype=np.float32)
+    if precision == "float16":
+        return rows.astype(np.float16), None
+    scales = np.abs(rows).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(rows / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def _matches_where(metadata: dict, where):
+    """
+    Evaluates the subset of Chroma's `where` syntax produced by rag.metadata.to_chroma_filter
+    ($and, $or, $eq, $ne, $in, $nin and bare equality).
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+def mmr_select(query, candidates, k: int = 4, lambda_mult: float = 0.5):
+    """
+    Max Marginal Relevance over unit-normalized candidate rows.
+    Returns the indices of the selected rows, in selection order.
+    """
+    if len(candidates) == 0:
+        return []
+    relevance = candidates @ query
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of every candidate to anything selected so far
+    redundancy = candidates @ candidates[selected[0]]
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return selected
+
+# Rows scored per block on the quantized path, bounding the float32 scratch buffer
+_SCORE_BLOCK_ROWS = 256
+
+QUANTIZED_SUFFIXES = {"float16": "vectors.f16", "int8": "vectors.i8"}
+
+class NumpyVectorStore:
+    """
+    In-process vector index for small corpora.
+    Unit-normalized embeddings live in a memory-mapped float32 matrix (`vectors.f32`);
+    chunk IDs, texts and metadata are side arrays in `index.json`. A lookup is one
+    matrix-vector product followed by MMR in NumPy.
+    With `precision` "float16" or "int8" the full scan runs over a quantized copy
+    (`vectors.f16`, or `vectors.i8` plus per-row `scales.f32`) and only the best
+    `fetch_k * rescore_factor` rows are rescored against the float32 file, so most of it
+    is never paged in.
+    Exposes the subset of the Chroma vector store API used by the retriever and setup script.
+    """
+    def __init__(self, persist_directory: str, embedding_function=None, precision: str = "float32",
+                 rescore_factor: int = 4):
+        if precision not in ("float32", *QUANTIZED_SUFFIXES):
+            raise ValueError(f"Unsupported vector precision: {precision}")
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self.precision = precision
+        self.rescore_factor = max(1, rescore_factor)
+        self._vectors_path = os.path.join(persist_directory, "vectors.f32")
+        self._index_path = os.path.join(persist_directory, "index.json")
+        self._codes_path = os.path.join(persist_directory, QUANTIZED_SUFFIXES.get(precision, ""))
+        self._scales_path = os.path.join(persist_directory, "scales.f32")
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._dirty = False
+        self._clear()
+        self._load(self._read_index())
+
+    def _clear(self):
+        if getattr(self, "_full", None) is not None:
+            self._full.close()
+        self._full = None  # plain file handle for rescoring reads on the quantized path
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._codes = None  # quantized copy of _vectors; None means score at full precision
+        self._scales = None
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._positions = {}
+        self._masks = {}  # filter -> boolean row mask, valid until the rows change
+
+    def _read_index(self):
+        """
+        (mtime, parsed index.json), or None when there is no index or vectors.f32 does not hold
+        the rows it lists. save() replaces the matrix before the index, so another process can
+        briefly see the new matrix next to the old index.
+        """
+        if not os.path.exists(self._index_path):
+            return None
+        mtime = os.path.getmtime(self._index_path)
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        if size != len(index["ids"]) * index["dim"] * 4:
+            print(f"⚠️ {self._vectors_path} does not match {self._index_path} (save in progress?), retrying on the next lookup")
+            return None
+        return mtime, index
+
+    def _load(self, loaded):
+        if loaded is None:
+            return
+        self._mtime, index = loaded
+        self._ids = index["ids"]
+        self._texts = index["documents"]
+        self._metadatas = index["metadatas"]
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+        if self._ids:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._ids), index["dim"]))
+            if self.precision != "float32":
+                self._load_codes()
+        else:
+            self._vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def _load_codes(self):
+        # The quantized copy is derived data: (re)build it when missing or stale,
+        # e.g. after switching VECTOR_PRECISION or a save by a float32 process
+        rows, dim = self._vectors.shape
+        dtype = np.float16 if self.precision == "float16" else np.int8
+        fresh = os.path.exists(self._codes_path) and os.path.getsize(self._codes_path) == rows * dim * np.dtype(dtype).itemsize \
+            and os.path.getmtime(self._codes_path) >= os.path.getmtime(self._vectors_path)
+        if self.precision == "int8":
+            fresh = fresh and os.path.exists(self._scales_path) and os.path.getsize(self._scales_path) == rows * 4
+        if not fresh:
+            # A throwaway mapping, so the pages read while quantizing are released afterwards
+            full = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+            self._write_codes(full)
+            del full
+        self._full = open(self._vectors_path, "rb")
+        self._codes = np.memmap(self._codes_path, dtype=dtype, mode="r", shape=(rows, dim))
+        if self.precision == "int8":
+            self._scales = np.fromfile(self._scales_path, dtype=np.float32)
+
+    def _write_codes(self, vectors):
+        codes_tmp = self._codes_path + ".tmp"
+        scales = []
+        with open(codes_tmp, "wb") as f:
+            for start in range(0, len(vectors), _SCORE_BLOCK_ROWS):
+                codes, block_scales = quantize_rows(vectors[start:start + _SCORE_BLOCK_ROWS], self.precision)
+                codes.tofile(f)
+                if block_scales is not None:
+                    scales.append(block_scales)
+        if self.precision == "int8":
+            np.concatenate(scales).astype(np.float32).tofile(self._scales_path + ".tmp")
+            os.replace(self._scales_path + ".tmp", self._scales_path)
+        os.replace(codes_tmp, self._codes_path)
+
+    def _reload_if_changed(self):
+        # Another process (e.g. the setup script) may have rewritten the store
+        mtime = os.path.getmtime(self._index_path) if os.path.exists(self._index_path) else None
+        if mtime != self._mtime:
+            loaded = self._read_index()
+            if loaded is None and mtime is not None:
+                # Mid-save: keep serving the rows already mapped
+                return
+            self._clear()
+            self._mtime = None
+            self._load(loaded)
+
+    def count(self):
+        with self._lock:
+            return len(self._ids)
+
+    def upsert(self, ids, embeddings, documents, metadatas=None):
+        """
+        Adds or replaces rows with precomputed embeddings. Call save() to persist.
+        """
+        metadatas = metadatas or [{} for _ in ids]
+        rows = _unit_rows(embeddings)
+        with self._lock:
+            self.delete(ids, save=False)
+            vectors = np.asarray(self._vectors) if len(self._ids) else np.zeros((0, rows.shape[1]), dtype=np.float32)
+            self._vectors = np.concatenate([vectors, rows])
+            self._codes = self._scales = None
+            for chunk_id, text, metadata in zip(ids, documents, metadatas):
+                self._positions[chunk_id] = len(self._ids)
+                self._ids.append(chunk_id)
+                self._texts.append(text)
+                self._metadatas.append(metadata or {})
+            self._masks.clear()
+            self._dirty = True
+
+    def add_documents(self, documents, ids):
+        vectors = self.embedding_function.embed_documents([doc.page_content for doc in documents])
+        with self._lock:
+            self.upsert(ids, vectors, [doc.page_content for doc in documents], [dict(doc.metadata) for doc in documents])
+            self.save()
+        return ids
+
+    def delete(self, ids, save: bool = True):
+        with self._lock:
+            drop = {self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions}
+            if drop:
+                keep = [i for i in range(len(self._ids)) if i not in drop]
+                self._vectors = np.asarray(self._vectors)[keep]
+                self._codes = self._scales = None
+                self._ids = [self._ids[i] for i in keep]
+                self._texts = [self._texts[i] for i in keep]
+                self._metadatas = [self._metadatas[i] for i in keep]
+                self._positions = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+                self._masks.clear()
+                self._dirty = True
+                if save:
+                    self.save()
+
+    def reset_collection(self):
+        with self._lock:
+            self._clear()
+            self.save()
+
+    def flush(self):
+        """
+        Saves only if rows were added or deleted since the last save.
+        """
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    def save(self):
+        """
+        Writes the matrix and side arrays atomically, the index last, then re-opens the matrix memory-mapped.
+        Any quantized copy is dropped and rebuilt from the new matrix on re-open.
+        """
+        with self._lock:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            dim = self._vectors.shape[1] if len(self._ids) else 0
+            np.ascontiguousarray(self._vectors, dtype=np.float32).tofile(self._vectors_path + ".tmp")
+            with open(self._index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"dim": dim, "ids": self._ids, "documents": self._texts, "metadatas": self._metadatas}, f)
+            # Quantized copies are derived from the old matrix; the next open rebuilds them
+            for name in (*QUANTIZED_SUFFIXES.values(), "scales.f32"):
+                if os.path.exists(os.path.join(self.persist_directory, name)):
+                    os.remove(os.path.join(self.persist_directory, name))
+            # The index goes last: readers check the matrix against it before mapping
+            os.replace(self._vectors_path + ".tmp", self._vectors_path)
+            os.replace(self._index_path + ".tmp", self._index_path)
+            self._clear()
+            self._load(self._read_index())
+            self._dirty = False
+
+    def _filter_mask(self, where):
+        key = json.dumps(where, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter((_matches_where(m, where) for m in self._metadatas), dtype=bool, count=len(self._ids))
+            self._masks[key] = mask
+        return mask
+
+    def _scores(self, query):
+        if self._codes is None:
+            return self._vectors @ query
+        # Dequantize block by block so the scratch buffer stays small
+        scores = np.empty(len(self._codes), dtype=np.float32)
+        for start in range(0, len(self._codes), _SCORE_BLOCK_ROWS):
+            block = self._codes[start:start + _SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        if self._scales is not None:
+            scores *= self._scales
+        return scores
+
+    def _top_rows(self, query, scores, fetch_k: int):
+        """
+        Indices and float32 vectors of the fetch_k most similar rows, best first. Approximate
+        (quantized) scores only shortlist candidates; the final order uses float32 similarities.
+        """
+        if self._codes is None:
+            # Top fetch_k without sorting the whole corpus
+            top = np.argpartition(-scores, fetch_k - 1)[:fetch_k]
+            top = top[np.argsort(-scores[top])]
+            return top, np.asarray(self._vectors[top])
+        shortlist = min(fetch_k * self.rescore_factor, int(np.isfinite(scores).sum()))
+        candidates = np.sort(np.argpartition(-scores, shortlist - 1)[:shortlist])  # sorted: sequential page reads
+        rows = self._read_rows(candidates)
+        order = np.argsort(-(rows @ query))[:fetch_k]
+        return candidates[order], rows[order]
+
+    def _read_rows(self, indices):
+        # Reads through the file instead of the memory map, so rescored rows are not kept
+        # resident in this process (the OS page cache may still hold them)
+        row_bytes = self._vectors.shape[1] * 4
+        chunks = []
+        for i in indices:
+            self._full.seek(int(i) * row_bytes)
+            chunks.append(self._full.read(row_bytes))
+        return np.frombuffer(b"".join(chunks), dtype=np.float32).reshape(len(indices), -1)
+
+    def _nearest(self, query, fetch_k: int, filter: dict = None):
+        # Caller holds the lock. Returns (row indices, float32 rows) of the best matches
+        scores = self._scores(query)
+        if filter:
+            mask = self._filter_mask(filter)
+            scores = np.where(mask, scores, -np.inf)
+            available = int(mask.sum())
+        else:
+            available = len(self._ids)
+        fetch_k = min(fetch_k, available)
+        if fetch_k == 0:
+            return [], None
+        return self._top_rows(query, scores, fetch_k)
+
+    def _documents(self, rows):
+        return [Document(page_content=self._texts[i], metadata=self._metadatas[i], id=self._ids[i]) for i in rows]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: dict = None, **kwargs):
+        """
+        The `k` most similar rows (optionally filtered), best first, without re-ranking.
+        """
+        query = _unit_rows(embedding)[0]
+        with self._lock:
+            self._reload_if_changed()
+            if not self._ids:
+                return []
+            top, _ = self._nearest(query, k, filter)
+            return self._documents(top)
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, filter: dict = None, **kwargs):
+        """
+        Same contract as Chroma's: the `fetch_k` most similar rows (optionally filtered)
+        are re-ranked with MMR and the `k` selected are returned in selection order.
+        """
+        query = _unit_rows(embedding)[0]
+        with self._lock:
+            self._reload_if_changed()
+            if not self._ids:
+                return []
+            top, rows = self._nearest(query, fetch_k, filter)
+            if len(top) == 0:
+                return []
+            return self._documents(top[j] for j in mmr_select(query, rows, k=k, lambda_mult=lambda_mult))
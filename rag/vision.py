@@ -0,0 +1,102 @@
+import io
+import os
+import base64
+import hashlib
+import threading
+from PIL import Image, ImageOps
+from langchain_core.messages import HumanMessage
+from rag.cache import CACHE_DIR, DiskCache
+from rag.clients import client_registry
+
+VISION_MODEL = "gpt-4o-mini"
+VISION_PROMPT = "Describe this image in detail for a search engine. Include any text found in the image."
+
+# Images are downscaled to fit VISION_MAX_SIDE pixels and re-encoded as JPEG before upload
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "1024"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+# Sent for images Pillow cannot decode (and so cannot name the format of)
+DEFAULT_IMAGE_MIME = "image/jpeg"
+
+_vision_llm = None
+_description_cache = None
+
+# One lock per image hash, so identical images uploaded together share a single vision call
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+def _get_vision_llm():
+    global _vision_llm
+    if _vision_llm is None:
+        # Counts against the same per-model concurrency cap as chat completions
+        _vision_llm = client_registry.chat_model(VISION_MODEL, temperature=0)
+    return _vision_llm
+
+def _get_description_cache():
+    global _description_cache
+    if _description_cache is None:
+        _description_cache = DiskCache(
+            os.path.join(CACHE_DIR, "image_descriptions.sqlite"),
+            max_entries=int(os.getenv("VISION_CACHE_MAX_ENTRIES", "10000"))
+        )
+    return _description_cache
+
+def prepare_image(image_bytes: bytes):
+    """
+    Downscales the image to VISION_MAX_SIDE and re-encodes it as JPEG.
+    Returns (bytes, mime type); undecodable images, and those the JPEG would not shrink, are sent unchanged
+    with their own mime type.
+    """
+    source_mime = DEFAULT_IMAGE_MIME
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            source_mime = Image.MIME.get(img.format, DEFAULT_IMAGE_MIME)
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE))
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+    except Exception:
+        return image_bytes, source_mime
+
+    # Small, already-compressed images can grow when re-encoded
+    if buffer.tell() >= len(image_bytes):
+        return image_bytes, source_mime
+    return buffer.getvalue(), "image/jpeg"
+
+def describe_image(file_path: str):
+    """
+    Vision capability for Image-to-Text.
+    Descriptions are cached by the SHA-256 of the image bytes, so re-uploading the same image skips the vision call.
+    """
+    with open(file_path, "rb") as image_file:
+        image_bytes = image_file.read()
+
+    cache = _get_description_cache()
+    key = f"{VISION_MODEL}:{VISION_MAX_SIDE}:{hashlib.sha256(image_bytes).hexdigest()}"
+    with _key_locks_guard:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    try:
+        with key_lock:
+            cached = cache.get_many([key])
+            if key in cached:
+                return cached[key].decode("utf-8")
+            description = _call_vision(image_bytes)
+            cache.set_many({key: description.encode("utf-8")})
+            return description
+    finally:
+        with _key_locks_guard:
+            if not key_lock.locked():
+                _key_locks.pop(key, None)
+
+def _call_vision(image_bytes: bytes):
+    payload, mime_type = prepare_image(image_bytes)
+    image_data = base64.b64encode(payload).decode("utf-8")
+    message = HumanMessage(
+        content=[
+            {"type": "text", "text": VISION_PROMPT},
+            {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_data}"}}
+        ]
+    )
+    response = _get_vision_llm().invoke([message])
+    return response.content
@@ -1,75 +1,356 @@
 import os
 import sys
-import shutil
+import json
+import time
+import queue
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 from langchain_community.document_loaders import TextLoader, CSVLoader, PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
+
+# Define absolute paths
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add the project root to the python path to allow imports from sibling directories
+sys.path.append(BASE_DIR)
+
+from rag.embedder import DB_DIR, VECTOR_BACKEND, get_embeddings, get_vector_db, upsert_vectors, flush_vectors, bump_collection_version
+from rag.lexical import LEXICAL_INDEX_PATH, get_lexical_index, save_lexical_index
+from rag.metadata import METADATA_VERSION, document_metadata
+from rag.chunking import CHUNKING_MODE, PARENT_STORE_PATH, split_into_chunks, get_parent_store, save_parent_store
 
 # Load environment variables
 load_dotenv()
 
-# Define absolute paths
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_DIR = os.path.join(BASE_DIR, "rag", "vector_db")
+# Tracks the content hash and chunk IDs of every ingested file
+MANIFEST_PATH = os.path.join(DB_DIR, "manifest.json")
 
-def setup_database():
-    print("🚀 Starting Knowledge Base Construction...")
+# Define folders to traverse
+FOLDERS = {
+    "raw": os.path.join(BASE_DIR, "data", "raw"),
+    "processed": os.path.join(BASE_DIR, "data", "processed"),
+    "synthetic": os.path.join(BASE_DIR, "data", "synthetic"),
+    "docs": os.path.join(BASE_DIR, "docs")
+}
+
+SUPPORTED_EXTENSIONS = (".pdf", ".csv", ".json", ".txt", ".md")
+
+def load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"files": {}, "metadata_version": METADATA_VERSION, "vector_backend": VECTOR_BACKEND, "chunking": CHUNKING_MODE}
+
+def save_manifest(manifest):
+    os.makedirs(DB_DIR, exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def file_sha256(file_path: str):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    documents = []
-    
-    # Define folders to traverse
-    folders = {
-        "raw": os.path.join(BASE_DIR, "data", "raw"),
-        "processed": os.path.join(BASE_DIR, "data", "processed"),
-        "synthetic": os.path.join(BASE_DIR, "data", "synthetic"),
-        "docs": os.path.join(BASE_DIR, "docs")
-    }
-
-    for folder_name, path in folders.items():
+def scan_corpus():
+    """
+    Returns {relative_path: absolute_path} for every supported file in the corpus folders.
+    """
+    files = {}
+    for folder_name, path in FOLDERS.items():
         if not os.path.exists(path):
             print(f"   ! Warning: Folder {path} not found")
             continue
-            
+
         print(f"   - Scanning {folder_name} folder...")
-        for file in os.listdir(path):
+        for file in sorted(os.listdir(path)):
             file_path = os.path.join(path, file)
-            try:
-                if file.endswith(".pdf"):
-                    loader = PyPDFLoader(file_path)
-                    documents.extend(loader.load())
-                    print(f"     + Loaded PDF: {file}")
-                elif file.endswith(".csv"):
-                    loader = CSVLoader(file_path, encoding='utf-8')
-                    documents.extend(loader.load())
-                    print(f"     + Loaded CSV: {file}")
-                elif file.endswith(".json") or file.endswith(".txt") or file.endswith(".md"):
-                    loader = TextLoader(file_path, encoding='utf-8')
-                    documents.extend(loader.load())
-                    print(f"     + Loaded Text/JSON: {file}")
-            except Exception as e:
-                print(f"     ! Error loading {file}: {e}")
-
-    # 3. Split Text
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    texts = text_splitter.split_documents(documents)
-    print(f"   - Split into {len(texts)} chunks")
-
-    # 4. Create Vector Store
-    if os.path.exists(DB_DIR):
+            if os.path.isfile(file_path) and file.endswith(SUPPORTED_EXTENSIONS):
+                files[os.path.relpath(file_path, BASE_DIR).replace(os.sep, "/")] = file_path
+    return files
+
+def folder_of(file_path: str):
+    """
+    Name of the FOLDERS entry a corpus file came from ("raw", "processed", ...).
+    """
+    for folder_name, path in FOLDERS.items():
+        if os.path.dirname(os.path.abspath(file_path)) == os.path.abspath(path):
+            return folder_name
+    return "other"
+
+def load_file(file_path: str):
+    if file_path.endswith(".pdf"):
+        return PyPDFLoader(file_path).load()
+    elif file_path.endswith(".csv"):
+        return CSVLoader(file_path, encoding='utf-8').load()
+    return TextLoader(file_path, encoding='utf-8').load()
+
+class StageStats:
+    """Item count and busy time of one pipeline stage."""
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.seconds = 0.0
+
+    def report(self):
+        rate = self.items / self.seconds if self.seconds else 0.0
+        return f"{self.name}: {self.items} {self.unit} in {self.seconds:.1f}s ({rate:.1f} {self.unit}/s)"
+
+def parse_file(rel_path: str, file_path: str, origin: str):
+    """
+    Runs in a worker process. Returns the loaded pages/records of one file, or the error message.
+    Every page is tagged with the file's doc_type, origin folder and year.
+    """
+    try:
+        documents = load_file(file_path)
+        metadata = document_metadata(file_path, origin, documents[0].page_content if documents else "")
+        for doc in documents:
+            doc.metadata.update(metadata)
+        return rel_path, documents, None
+    except Exception as e:
+        return rel_path, [], str(e)
+
+def split_file(rel_path: str, documents):
+    """
+    Splits the pages of one file into (chunk_id, chunk) pairs plus the parent sections they point to.
+    Chunk IDs are derived from the file path so they can be deleted on the next change.
+    """
+    return split_into_chunks(documents, rel_path)
+
+def _put(q, item, stop):
+    # Blocking put that gives up once the pipeline is being torn down
+    while not stop.is_set():
         try:
-            shutil.rmtree(DB_DIR)
-            print("   - Cleared existing database")
-        except PermissionError:
-            print("   ! Error: Could not clear existing database. Is the backend server running?")
-            print("   ! Please stop 'python api/main.py' and try again.")
+            q.put(item, timeout=0.5)
             return
+        except queue.Full:
+            continue
+
+def _get(q, stop):
+    # Blocking get that gives up (returning None) once the pipeline is being torn down
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return None
+
+def _parse_stage(corpus, rel_paths, workers, parsed_q, stop, stats):
+    """
+    Stage 1: parses files in a process pool, keeping at most two files per worker in flight.
+    """
+    started = time.perf_counter()
+    try:
+        # spawn, not fork: this runs on a thread of a multithreaded process
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            todo = list(rel_paths)
+            pending = set()
+            while (todo or pending) and not stop.is_set():
+                while todo and len(pending) < workers * 2:
+                    rel_path = todo.pop(0)
+                    pending.add(pool.submit(parse_file, rel_path, corpus[rel_path], folder_of(corpus[rel_path])))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rel_path, documents, error = future.result()
+                    stats.items += len(documents)
+                    _put(parsed_q, ("file", (rel_path, documents, error)), stop)
+            for future in pending:
+                future.cancel()
+    except Exception as e:
+        _put(parsed_q, ("error", e), stop)
+    finally:
+        stats.seconds = time.perf_counter() - started
+        _put(parsed_q, ("done", None), stop)
+
+def _split_stage(parsed_q, batch_q, batch_size, stop, stats):
+    """
+    Stage 2: splits pages as they arrive and groups chunks into embedding batches.
+    A file is reported complete only after the batch holding its last chunk.
+    """
+    batch, finished = [], []
+
+    def flush():
+        if batch:
+            _put(batch_q, ("chunks", list(batch)), stop)
+            batch.clear()
+        for entry in finished:
+            _put(batch_q, ("file", entry), stop)
+        finished.clear()
+
+    try:
+        while not stop.is_set():
+            item = _get(parsed_q, stop)
+            if item is None:
+                break
+            kind, payload = item
+            if kind == "done":
+                break
+            if kind == "error":
+                raise payload
+
+            rel_path, documents, error = payload
+            if error:
+                print(f"     ! Error loading {rel_path}: {error}")
+                continue
+
+            started = time.perf_counter()
+            chunks, parents = split_file(rel_path, documents)
+            stats.seconds += time.perf_counter() - started
+            stats.items += len(chunks)
+            chunk_ids = [chunk_id for chunk_id, _ in chunks]
+            for chunk_id, chunk in chunks:
+                batch.append((chunk_id, chunk))
+                if len(batch) >= batch_size:
+                    flush()
+            finished.append((rel_path, chunk_ids, parents))
+        flush()
+    except Exception as e:
+        _put(batch_q, ("error", e), stop)
+    finally:
+        _put(batch_q, ("done", None), stop)
+
+def setup_database(full_rebuild: bool = False, workers: int = None, batch_size: int = 128):
+    print("🚀 Starting Knowledge Base Construction...")
+
+    vector_db = get_vector_db()
+    embeddings = get_embeddings()
+    lexical_index = get_lexical_index()
+    parent_store = get_parent_store()
+    manifest = load_manifest()
+
+    if not full_rebuild and not (os.path.exists(MANIFEST_PATH) and os.path.exists(LEXICAL_INDEX_PATH)):
+        # Chunks from a store built before manifests existed cannot be matched to files
+        print("   - No build manifest or lexical index found, performing a full rebuild")
+        full_rebuild = True
+    elif not full_rebuild and manifest.get("metadata_version") != METADATA_VERSION:
+        # Existing chunks lack the metadata fields used by filtered retrieval
+        print("   - Chunk metadata format changed, performing a full rebuild")
+        full_rebuild = True
+    elif not full_rebuild and manifest.get("vector_backend", "chroma") != VECTOR_BACKEND:
+        # The manifest describes chunks stored in the other backend
+        print(f"   - Vector backend changed to {VECTOR_BACKEND}, performing a full rebuild")
+        full_rebuild = True
+    elif not full_rebuild and manifest.get("chunking", "flat") != CHUNKING_MODE:
+        # Chunk boundaries (and parent sections) follow the chunking mode
+        print(f"   - Chunking mode changed to {CHUNKING_MODE}, performing a full rebuild")
+        full_rebuild = True
+    elif not full_rebuild and CHUNKING_MODE == "sections" and not os.path.exists(PARENT_STORE_PATH):
+        print("   - No parent section store found, performing a full rebuild")
+        full_rebuild = True
+
+    if full_rebuild:
+        # Reset through the Chroma API so this also works while the backend holds the store open
+        vector_db.reset_collection()
+        lexical_index.clear()
+        parent_store.clear()
+        manifest = {"files": {}, "metadata_version": METADATA_VERSION, "vector_backend": VECTOR_BACKEND, "chunking": CHUNKING_MODE}
+        print("   - Cleared existing collection")
+
+    # 1. Diff the corpus against the manifest
+    corpus = scan_corpus()
+    hashes = {rel_path: file_sha256(path) for rel_path, path in corpus.items()}
+    known = manifest["files"]
+
+    added = [p for p in corpus if p not in known]
+    changed = [p for p in corpus if p in known and known[p]["sha256"] != hashes[p]]
+    removed = [p for p in known if p not in corpus]
+    print(f"   - {len(added)} added, {len(changed)} changed, {len(removed)} removed, "
+          f"{len(corpus) - len(added) - len(changed)} unchanged")
+
+    # 2. Drop chunks of removed and changed files
+    for rel_path in removed + changed:
+        chunk_ids = known[rel_path]["chunk_ids"]
+        if chunk_ids:
+            vector_db.delete(ids=chunk_ids)
+            lexical_index.remove(chunk_ids)
+        parent_store.remove(known[rel_path].get("parent_ids", []))
+        del known[rel_path]
+        print(f"     - Removed {len(chunk_ids)} chunks: {rel_path}")
+    save_manifest(manifest)
+
+    # 3. Parse -> split -> embed -> upsert only added or changed files.
+    # Bounded queues keep memory independent of corpus size while parsing overlaps embedding I/O.
+    workers = workers or os.cpu_count() or 2
+    parse_stats = StageStats("Parse", "pages")
+    split_stats = StageStats("Split", "chunks")
+    embed_stats = StageStats("Embed", "chunks")
+    upsert_stats = StageStats("Upsert", "chunks")
+
+    parsed_q = queue.Queue(maxsize=workers * 2)
+    batch_q = queue.Queue(maxsize=4)
+    stop = threading.Event()
+    stages = [
+        threading.Thread(target=_parse_stage, args=(corpus, added + changed, workers, parsed_q, stop, parse_stats), daemon=True),
+        threading.Thread(target=_split_stage, args=(parsed_q, batch_q, batch_size, stop, split_stats), daemon=True),
+    ]
+
+    print(f"   - Generating Embeddings and Storing ({workers} parse workers, batches of {batch_size})...")
+    started = time.perf_counter()
+    for stage in stages:
+        stage.start()
+    try:
+        while True:
+            kind, payload = batch_q.get()
+            if kind == "done":
+                break
+            if kind == "error":
+                raise payload
+
+            if kind == "chunks":
+                ids = [chunk_id for chunk_id, _ in payload]
+                texts = [chunk.page_content for _, chunk in payload]
+                metadatas = [{k: v for k, v in chunk.metadata.items() if v is not None} for _, chunk in payload]
+
+                t0 = time.perf_counter()
+                vectors = embeddings.embed_documents(texts)
+                embed_stats.seconds += time.perf_counter() - t0
+                embed_stats.items += len(ids)
+
+                t0 = time.perf_counter()
+                upsert_vectors(ids, vectors, texts, metadatas)
+                lexical_index.add(ids, [chunk for _, chunk in payload])
+                upsert_stats.seconds += time.perf_counter() - t0
+                upsert_stats.items += len(ids)
+            else:
+                # Every chunk of this file is stored, so it is safe to record it
+                flush_vectors()
+                rel_path, chunk_ids, parents = payload
+                parent_store.add(parents)
+                known[rel_path] = {"sha256": hashes[rel_path], "chunk_ids": chunk_ids, "parent_ids": list(parents)}
+                save_manifest(manifest)
+                print(f"     + Indexed {len(chunk_ids)} chunks: {rel_path}")
+    finally:
+        stop.set()
+        for stage in stages:
+            stage.join()
+        # The BM25 index and parent sections are persisted next to the vector store
+        flush_vectors()
+        save_lexical_index()
+        save_parent_store()
+
+    if full_rebuild or removed or changed or added:
+        # Invalidates cached chat answers in the running backend
+        bump_collection_version()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Database updated at {DB_DIR} ({upsert_stats.items} chunks embedded in {elapsed:.1f}s)")
+    for stats in (parse_stats, split_stats, embed_stats, upsert_stats):
+        print(f"   - {stats.report()}")
 
-    print("   - Generating Embeddings and Storing...")
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-    Chroma.from_documents(documents=texts, embedding=embeddings, persist_directory=DB_DIR, collection_name="drone_intel")
-    print(f"✅ Database successfully populated at {DB_DIR}")
+    stats = embeddings.stats()
+    print(f"   - Embedding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['entries']} entries stored)")
 
 if __name__ == "__main__":
-    setup_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build or update the drone_intel knowledge base.")
+    parser.add_argument("--full", action="store_true", help="Drop the collection and re-index every file")
+    parser.add_argument("--workers", type=int, default=None, help="Parse processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=128, help="Chunks per embedding/upsert batch")
+    args = parser.parse_args()
+    setup_database(full_rebuild=args.full, workers=args.workers, batch_size=args.batch_size)
@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Define absolute paths
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add the project root to the python path to allow imports from sibling directories
+sys.path.append(BASE_DIR)
+
+import rag.embedder as embedder
+import rag.lexical as lexical
+import rag.retriever as retriever
+import rag.chunking as chunking
+from rag.context import assemble_context
+from rag.lexical import BM25Index, tokenize
+from rag.chunking import ParentStore
+from scripts.database_setup import BASE_DIR as CORPUS_BASE_DIR, parse_file, split_file
+
+GOLDEN_PATH = os.path.join(BASE_DIR, "data", "eval", "golden_queries.json")
+CORPUS_DIR = os.path.join(BASE_DIR, "data", "raw")
+OUTPUT_DIR = os.path.join(BASE_DIR, "benchmarks")
+
+# Words too common to carry meaning in a hashed bag-of-words vector
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "has", "have", "how", "in",
+    "is", "it", "its", "of", "on", "or", "our", "should", "that", "the", "their", "this", "to", "was", "we",
+    "what", "when", "which", "who", "why", "will", "with", "within", "you", "your"
+}
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic, offline stand-in for text-embedding-3-small.
+    Word unigrams and bigrams are hashed into `dim` signed buckets, counts are log-scaled
+    and the vector is unit length, so the same text gets the same vector in every run.
+    """
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = [w for w in tokenize(text) if w not in STOPWORDS]
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if h >> 63 else -1.0
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def _similarity(k: int):
+    def search(query):
+        return embedder.get_vector_db().similarity_search_by_vector(list(retriever.embed_query(query)), k=k)
+    return search
+
+def _mmr(k: int, fetch_k: int):
+    def search(query):
+        return embedder.get_vector_db().max_marginal_relevance_search_by_vector(
+            list(retriever.embed_query(query)), k=k, fetch_k=fetch_k
+        )
+    return search
+
+def _retriever(mode: str, fetch_k: int):
+    # The production entry point; it always returns 4 documents
+    def search(query):
+        return retriever.retrieve_relevant_docs(query, k=fetch_k, mode=mode)
+    return search
+
+# name -> (k, fetch_k, search function)
+CONFIGS = {
+    "similarity k=4": (4, 4, _similarity(4)),
+    "similarity k=10": (10, 10, _similarity(10)),
+    "mmr k=4 fetch_k=10": (4, 10, _mmr(4, 10)),
+    "mmr k=4 fetch_k=20": (4, 20, _mmr(4, 20)),
+    "mmr k=4 fetch_k=40": (4, 40, _mmr(4, 40)),
+    "mmr k=10 fetch_k=40": (10, 40, _mmr(10, 40)),
+    "retriever vector fetch_k=10": (4, 10, _retriever("vector", 10)),
+    "retriever lexical": (4, 4, _retriever("lexical", 10)),
+    "retriever hybrid fetch_k=10": (4, 10, _retriever("hybrid", 10))
+}
+
+def load_golden(path: str = GOLDEN_PATH):
+    """
+    Golden queries: [{"query": ..., "relevant": [{"source": file name, "pages": [1-based pages]}]}]
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def build_index(workdir: str, backend: str, dim: int):
+    """
+    Chunks data/raw exactly like database_setup.py and indexes it with the hashing embedder
+    into throwaway stores, installed as the process-wide vector store, BM25 index and parent store.
+    """
+    embeddings = HashingEmbeddings(dim)
+    embedder._embeddings = embeddings
+    if backend == "numpy":
+        from rag.vector_store import NumpyVectorStore
+        embedder._vector_db = NumpyVectorStore(os.path.join(workdir, "numpy_store"), embedding_function=embeddings)
+    else:
+        from langchain_chroma import Chroma
+        embedder._vector_db = Chroma(persist_directory=workdir, embedding_function=embeddings, collection_name="benchmark")
+    embedder.VECTOR_BACKEND = backend
+
+    files = 0
+    ids, chunks, parents = [], [], {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        file_path = os.path.join(CORPUS_DIR, name)
+        rel_path = os.path.relpath(file_path, CORPUS_BASE_DIR).replace(os.sep, "/")
+        _, documents, error = parse_file(rel_path, file_path, "raw")
+        if error:
+            print(f"   ! Error loading {rel_path}: {error}")
+            continue
+        files += 1
+        file_chunks, file_parents = split_file(rel_path, documents)
+        for chunk_id, chunk in file_chunks:
+            ids.append(chunk_id)
+            chunks.append(chunk)
+        parents.update(file_parents)
+
+    texts = [chunk.page_content for chunk in chunks]
+    for start in range(0, len(chunks), 256):
+        end = start + 256
+        embedder.upsert_vectors(ids[start:end], embeddings.embed_documents(texts[start:end]),
+                                texts[start:end], [dict(c.metadata) for c in chunks[start:end]])
+    embedder.flush_vectors()
+
+    # get_lexical_index() reloads whenever the file at LEXICAL_INDEX_PATH changes
+    lexical.LEXICAL_INDEX_PATH = os.path.join(workdir, "lexical_index.json")
+    lexical._lexical_index = BM25Index()
+    lexical._lexical_index.add(ids, chunks)
+    lexical._lexical_index.save(lexical.LEXICAL_INDEX_PATH)
+    lexical._lexical_mtime = os.path.getmtime(lexical.LEXICAL_INDEX_PATH)
+
+    chunking.PARENT_STORE_PATH = os.path.join(workdir, "parent_sections.json")
+    chunking._parent_store = ParentStore()
+    chunking._parent_store.add(parents)
+    chunking.save_parent_store()
+    return {"files": files, "chunks": len(chunks), "parent_sections": len(parents)}
+
+def _relevant_pages(entry):
+    return {(r["source"], page) for r in entry["relevant"] for page in r["pages"]}
+
+def _page_of(doc):
+    # PyPDFLoader pages are 0-based; golden pages are printed page numbers
+    return os.path.basename(doc.metadata.get("source", "")), doc.metadata.get("page", -1) + 1
+
+def evaluate(search, golden, repeats: int):
+    """
+    recall@k: share of the relevant pages covered by the returned chunks.
+    hit_rate: share of queries with at least one relevant chunk. MRR: mean 1 / rank of the first one.
+    context_tokens: what assemble_context would send to the LLM for the returned chunks.
+    """
+    recalls, hits, reciprocal_ranks, latencies, context_tokens = [], [], [], [], []
+    for entry in golden:
+        relevant = _relevant_pages(entry)
+        for _ in range(repeats):
+            started = time.perf_counter()
+            docs = search(entry["query"])
+            latencies.append((time.perf_counter() - started) * 1000)
+        pages = [_page_of(doc) for doc in docs]
+        recalls.append(len(relevant & set(pages)) / len(relevant))
+        ranks = [rank for rank, page in enumerate(pages, 1) if page in relevant]
+        hits.append(1.0 if ranks else 0.0)
+        reciprocal_ranks.append(1.0 / ranks[0] if ranks else 0.0)
+        context_tokens.append(assemble_context(docs)[2]["context_tokens"])
+    return {
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "hit_rate": round(float(np.mean(hits)), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "context_tokens": round(float(np.mean(context_tokens)), 1)
+    }
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+def benchmark(backend: str = "numpy", dim: int = 512, repeats: int = 5, output: str = None, baseline: str = None,
+              chunking_mode: str = None):
+    golden = load_golden()
+    chunking.CHUNKING_MODE = chunking_mode or chunking.CHUNKING_MODE
+    print(f"🚀 Retrieval benchmark: {len(golden)} golden queries over data/raw "
+          f"({backend} store, {chunking.CHUNKING_MODE} chunking, hashing embedder, {dim} dims)")
+    workdir = tempfile.mkdtemp(prefix="retrieval_benchmark_")
+    try:
+        corpus = build_index(workdir, backend, dim)
+        print(f"   - Indexed {corpus['chunks']} chunks ({corpus['parent_sections']} parent sections) from {corpus['files']} files")
+        # Embed every query once: the timings cover the lookup, re-ranking and fusion, not the embedding call
+        for entry in golden:
+            retriever.embed_query(entry["query"])
+        results = {}
+        for name, (k, fetch_k, search) in CONFIGS.items():
+            results[name] = {"k": k, "fetch_k": fetch_k, **evaluate(search, golden, repeats)}
+    finally:
+        embedder._vector_db = None
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    previous = None
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            previous = json.load(f)["results"]
+
+    print(f"\n{'configuration':<28} {'recall@k':>9} {'hit rate':>9} {'MRR':>7} {'p50 ms':>8} {'p99 ms':>8} {'ctx tok':>8}")
+    for name, r in results.items():
+        line = (f"{name:<28} {r['recall_at_k']:>9} {r['hit_rate']:>9} {r['mrr']:>7} "
+                f"{r['p50_ms']:>8} {r['p99_ms']:>8} {r['context_tokens']:>8}")
+        if previous and name in previous:
+            line += f"   (Δ recall {r['recall_at_k'] - previous[name]['recall_at_k']:+.4f}, Δ MRR {r['mrr'] - previous[name]['mrr']:+.4f})"
+        print(line)
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "backend": backend,
+        "chunking": chunking.CHUNKING_MODE,
+        "embedder": f"hashing-{dim}",
+        "queries": len(golden),
+        "repeats": repeats,
+        "corpus": corpus,
+        "results": results
+    }
+    if output is None:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        output = os.path.join(OUTPUT_DIR, f"retrieval_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline recall@k / MRR / latency benchmark of the retrieval configurations.")
+    parser.add_argument("--backend", choices=("numpy", "chroma"), default="numpy", help="Vector store to index into")
+    parser.add_argument("--dim", type=int, default=512, help="Hashing embedder dimensions")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed lookups per query and configuration")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/retrieval_<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="Earlier results file to print recall/MRR deltas against")
+    parser.add_argument("--chunking", choices=("sections", "flat"), default=None, help="Override CHUNKING_MODE")
+    args = parser.parse_args()
+
+    benchmark(args.backend, args.dim, args.repeats, args.output, args.baseline, args.chunking)
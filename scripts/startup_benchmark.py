@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Define absolute paths
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: time to import the app, then to serve the first tool request
+PROBE = """
+import json, time
+start = time.perf_counter()
+from api.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app)
+response = client.get("/calculate/flight?bat=5000&weight=2.0&pay=0.5&wind=Calm")
+assert response.status_code == 200, response.text
+served = time.perf_counter()
+print(json.dumps({"import_s": imported - start, "first_request_s": served - start}))
+"""
+
+def run_probe():
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-startup-benchmark")
+    env["WARMUP_ON_STARTUP"] = "false"
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BASE_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def slowest_imports(top: int = 10):
+    """
+    Top-level packages by cumulative import time, from `python -X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api.main"], cwd=BASE_DIR,
+        env={**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-startup-benchmark")},
+        capture_output=True, text=True, check=True
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # A package's first (outermost) import carries the cumulative cost of everything below it
+        package = name.strip().split(".")[0]
+        if package != "api":
+            totals[package] = max(totals.get(package, 0), int(cumulative))
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+def benchmark(runs: int = 5, max_import_s: float = None):
+    print(f"🚀 Measuring cold start of api.main over {runs} fresh interpreters...")
+    samples = [run_probe() for _ in range(runs)]
+    report = {}
+    for key in ("import_s", "first_request_s"):
+        values = [s[key] for s in samples]
+        report[key] = {"median": statistics.median(values), "max": max(values)}
+        print(f"   - {key}: median {report[key]['median']:.3f}s, max {report[key]['max']:.3f}s")
+
+    print("📦 Slowest imports (cumulative):")
+    for module, micros in slowest_imports():
+        print(f"   - {module}: {micros / 1e6:.3f}s")
+
+    if max_import_s is not None and report["import_s"]["median"] > max_import_s:
+        print(f"❌ Median import time exceeds {max_import_s:.2f}s")
+        sys.exit(1)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark API import time and time to first request.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to sample")
+    parser.add_argument("--max-import-s", type=float, default=None, help="Fail if the median import time is above this")
+    args = parser.parse_args()
+    benchmark(runs=args.runs, max_import_s=args.max_import_s)
@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+# Define absolute paths
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add the project root to the python path to allow imports from sibling directories
+sys.path.append(BASE_DIR)
+
+BACKENDS = ("chroma", "numpy")
+# (label, backend, precision); recall is measured against the exact float32 scan
+REFERENCE = "numpy"
+VARIANTS = [
+    ("numpy", "numpy", "float32"),
+    ("chroma", "chroma", None),
+    ("numpy-f16", "numpy", "float16"),
+    ("numpy-int8", "numpy", "int8")
+]
+DOC_TYPES = ("regulation", "business_case", "technical", "flight_log")
+
+def rss_mb():
+    """
+    Resident set size of this process in MB (Linux), falling back to the peak RSS.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def synthetic_corpus(chunks: int, dim: int, seed: int = 7):
+    """
+    Unit-length random vectors (like text-embedding-3-small output) with ~1 KB texts and metadata.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((chunks, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"bench::{i}" for i in range(chunks)]
+    texts = [f"chunk {i} " + "drone " * 170 for i in range(chunks)]
+    metadatas = [{"doc_type": DOC_TYPES[i % len(DOC_TYPES)], "source": f"doc_{i // 50}.pdf"} for i in range(chunks)]
+    return ids, vectors, texts, metadatas
+
+def open_store(backend: str, path: str, precision: str = "float32"):
+    if backend == "numpy":
+        from rag.vector_store import NumpyVectorStore
+        return NumpyVectorStore(path, precision=precision)
+    from langchain_chroma import Chroma
+    return Chroma(persist_directory=path, collection_name="benchmark")
+
+def build_child(backend: str, path: str, chunks: int, dim: int, precision: str):
+    ids, vectors, texts, metadatas = synthetic_corpus(chunks, dim)
+    store = open_store(backend, path, precision)
+    for start in range(0, chunks, 1000):
+        end = start + 1000
+        if backend == "numpy":
+            store.upsert(ids[start:end], vectors[start:end], texts[start:end], metadatas[start:end])
+        else:
+            store._collection.upsert(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                                     documents=texts[start:end], metadatas=metadatas[start:end])
+    if backend == "numpy":
+        store.save()
+    return {}
+
+def query_child(backend: str, path: str, queries: int, dim: int, fetch_k: int, precision: str):
+    rng = np.random.default_rng(11)
+    query_vectors = rng.standard_normal((queries, dim), dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    # Import the client libraries first so the RSS delta covers only the opened store
+    if backend == "numpy":
+        import rag.vector_store
+    else:
+        import langchain_chroma
+    baseline = rss_mb()
+    started = time.perf_counter()
+    store = open_store(backend, path, precision)
+    store.max_marginal_relevance_search_by_vector(query_vectors[0].tolist(), k=4, fetch_k=fetch_k)
+    open_seconds = time.perf_counter() - started
+
+    report = {"open_s": round(open_seconds, 3), "ids": []}
+    for label, where in (("unfiltered", None), ("filtered", {"doc_type": {"$eq": "regulation"}})):
+        latencies = []
+        for vector in query_vectors:
+            t0 = time.perf_counter()
+            docs = store.max_marginal_relevance_search_by_vector(vector.tolist(), k=4, fetch_k=fetch_k, filter=where)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            report["ids"].append([doc.id for doc in docs])
+        report[label] = {
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3)
+        }
+    report["rss_mb"] = round(rss_mb() - baseline, 1)
+    return report
+
+def run_child(*args):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), *map(str, args)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def recall(results, reference):
+    """
+    Mean share of the reference store's returned chunks that a variant also returned.
+    """
+    hits = [len(set(got) & set(want)) / len(want) for got, want in zip(results, reference) if want]
+    return round(float(np.mean(hits)), 4) if hits else None
+
+def benchmark(chunks: int = 5000, dim: int = 1536, queries: int = 200, fetch_k: int = 10, output: str = None):
+    print(f"🚀 Benchmarking vector stores: {chunks} chunks x {dim} dims, {queries} MMR lookups (fetch_k={fetch_k})")
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="vector_benchmark_")
+    try:
+        for label, backend, precision in VARIANTS:
+            path = os.path.join(workdir, label)
+            precision_args = ("--precision", precision) if precision else ()
+            print(f"   - Building {label} store...")
+            run_child("--child", "build", "--backend", backend, "--path", path, "--chunks", chunks, "--dim", dim, *precision_args)
+            # Lookups run in a fresh process so resident memory reflects only the opened store
+            results[label] = run_child("--child", "query", "--backend", backend, "--path", path,
+                                       "--queries", queries, "--dim", dim, "--fetch-k", fetch_k, *precision_args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    reference = results[REFERENCE]["ids"]
+    for r in results.values():
+        r["recall_at_4"] = recall(r.pop("ids"), reference)
+
+    print(f"\n{'store':<11} {'p50 ms':>8} {'p99 ms':>8} {'p50 filt':>9} {'p99 filt':>9} {'open s':>7} {'RSS MB':>7} {'recall@4':>9}")
+    for label, r in results.items():
+        print(f"{label:<11} {r['unfiltered']['p50_ms']:>8} {r['unfiltered']['p99_ms']:>8} "
+              f"{r['filtered']['p50_ms']:>9} {r['filtered']['p99_ms']:>9} {r['open_s']:>7} {r['rss_mb']:>7} {r['recall_at_4']:>9}")
+    print(f"   (recall@4: share of the exact {REFERENCE} float32 results returned for the same query, filtered and unfiltered)")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"chunks": chunks, "dim": dim, "queries": queries, "results": results}, f, indent=2)
+        print(f"✅ Results written to {output}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare lookup latency, memory and recall of the Chroma and NumPy vector backends.")
+    parser.add_argument("--chunks", type=int, default=5000, help="Synthetic chunks to index")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimensions (text-embedding-3-small: 1536)")
+    parser.add_argument("--queries", type=int, default=200, help="Timed lookups per backend")
+    parser.add_argument("--fetch-k", type=int, default=10, help="Candidates passed to MMR (the retriever uses 10)")
+    parser.add_argument("--output", default=None, help="Optional JSON file for the results")
+    parser.add_argument("--child", choices=("build", "query"), help=argparse.SUPPRESS)
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--precision", default="float32", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == "build":
+        print(json.dumps(build_child(args.backend, args.path, args.chunks, args.dim, args.precision)))
+    elif args.child == "query":
+        print(json.dumps(query_child(args.backend, args.path, args.queries, args.dim, args.fetch_k, args.precision)))
+    else:
+        benchmark(args.chunks, args.dim, args.queries, args.fetch_k, args.output)
@@ -0,0 +1,71 @@
+import api.services.answer_cache as answer_cache_module
+from api.services.answer_cache import AnswerCache, normalize_query
+
+def _cache(monkeypatch, version=1, **kwargs):
+    state = {"version": version, "now": 1000.0}
+    monkeypatch.setattr(answer_cache_module, "get_collection_version", lambda: state["version"])
+    monkeypatch.setattr(answer_cache_module.time, "time", lambda: state["now"])
+    return AnswerCache(**kwargs), state
+
+def test_normalize_query():
+    assert normalize_query("  What are the RULES?! ") == normalize_query("what are the rules")
+
+def test_answer_cache_exact_and_semantic_hits(monkeypatch):
+    cache, _ = _cache(monkeypatch, similarity_threshold=0.95)
+    cache.set("What is a Nano drone?", {"answer": "nano"}, embedding=[1.0, 0.0])
+    assert cache.get("what is a nano drone") == {"answer": "nano"}
+    assert cache.get("Something else") is None
+    assert cache.get_similar([0.99, 0.05]) == {"answer": "nano"}
+    assert cache.get_similar([0.0, 1.0]) is None
+    assert cache.get_similar(None) is None
+    assert cache.stats() == {"entries": 1, "hits": 2, "semantic_hits": 1, "misses": 2}
+
+def test_answer_cache_ttl(monkeypatch):
+    cache, state = _cache(monkeypatch, ttl_seconds=60)
+    cache.set("question", {"answer": "a"}, embedding=[1.0, 0.0])
+    state["now"] += 59
+    assert cache.get("question") == {"answer": "a"}
+    state["now"] += 2
+    assert cache.get("question") is None
+    assert cache.get_similar([1.0, 0.0]) is None
+
+def test_answer_cache_collection_version(monkeypatch):
+    cache, state = _cache(monkeypatch)
+    cache.set("question", {"answer": "a"})
+    state["version"] = 2
+    assert cache.get("question") is None
+    assert cache.stats()["entries"] == 0
+
+def test_answer_cache_lru_eviction(monkeypatch):
+    cache, _ = _cache(monkeypatch, max_entries=2)
+    cache.set("one", {"answer": 1})
+    cache.set("two", {"answer": 2})
+    cache.get("one")
+    cache.set("three", {"answer": 3})
+    assert cache.get("two") is None
+    assert cache.get("one") == {"answer": 1}
+    assert cache.get("three") == {"answer": 3}
+
+def test_answer_cache_version_checked_on_an_interval(monkeypatch):
+    reads = []
+    cache, state = _cache(monkeypatch, version_check_s=5)
+    monkeypatch.setattr(answer_cache_module, "get_collection_version", lambda: reads.append(1) or state["version"])
+    cache.set("question", {"answer": "a"})
+    state["version"] = 2
+    assert cache.get("question") == {"answer": "a"}
+    assert len(reads) == 1
+    state["now"] += 5
+    assert cache.get("question") is None
+    assert len(reads) == 2
+
+def test_ingest_invalidates_cached_answers(monkeypatch, tmp_path):
+    import rag.embedder as embedder
+    monkeypatch.setattr(embedder, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(embedder, "VERSION_PATH", str(tmp_path / "collection_version"))
+    cache = answer_cache_module.answer_cache
+    monkeypatch.setattr(cache, "version_check_s", 3600)
+    cache.set("What is a UIN?", {"answer": "a"})
+    assert cache.get("what is a uin") == {"answer": "a"}
+    # What /upload does after adding the chunks
+    embedder.bump_collection_version()
+    assert cache.get("what is a uin") is None
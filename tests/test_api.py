@@ -1,3 +1,4 @@
+import json
 from fastapi.testclient import TestClient
 from api.main import app
 
@@ -13,18 +14,52 @@ def test_analytics():
     assert response.status_code == 200
     assert "active_modules" in response.json()
 
+def test_analytics_flight_logs():
+    logs = client.get("/analytics").json()["flight_logs"]
+    assert logs["flights"] == sum(zone["flights"] for zone in logs["zones"].values())
+    assert logs["zones"]["Red"]["violations"] == logs["zones"]["Red"]["flights"]
+    assert set(logs["battery_drain_pct"]) == {"p50", "p90", "p99", "min", "max", "mean"}
+
 def test_flight_calc():
     response = client.get("/calculate/flight?bat=5000&weight=2.0&pay=0.5&wind=Calm")
     assert response.status_code == 200
     data = response.json()
     assert "estimated_flight_time_min" in data
 
+def test_flight_sweep():
+    sweep = {"battery_ah": {"start": 5, "stop": 10, "steps": 2}, "drone_weight": {"start": 2.0, "stop": 2.0},
+             "payload": {"start": 0.0, "stop": 1.0, "steps": 3}, "wind": ["Calm", "High Wind"]}
+    response = client.post("/calculate/flight/sweep", json=sweep)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["shape"] == [2, 2, 1, 3]
+    assert data["estimated_minutes"][0][0][0][0] == 70.0
+    assert data["estimated_minutes"][1][1][0][2] == 56.0
+
+    too_many = {**sweep, "battery_ah": {"start": 5, "stop": 10, "steps": 200_000_000}}
+    assert client.post("/calculate/flight/sweep", json=too_many).status_code == 422
+    too_large = {**sweep, "battery_ah": {"start": 5, "stop": 10, "steps": 100_000}, "payload": {"start": 0.0, "stop": 1.0, "steps": 100}}
+    assert client.post("/calculate/flight/sweep", json=too_large).status_code == 413
+    assert client.post("/calculate/flight/sweep", json={**sweep, "battery_ah": {"start": 1e308, "stop": 1e308}}).status_code == 422
+    overflow = {**sweep, "battery_ah": {"start": 1e6, "stop": 1e6}, "drone_weight": {"start": 1e-300, "stop": 1e-300},
+                "payload": {"start": 0.0, "stop": 0.0}}
+    assert client.post("/calculate/flight/sweep", json=overflow).status_code == 422
+
 def test_roi_calc():
     response = client.get("/calculate/roi?inv=500000&rev=5000&op_costs=1000&use_case=Agri")
     assert response.status_code == 200
     data = response.json()
     assert "roi_timeline_days" in data
 
+def test_roi_simulation():
+    scenario = {"samples": 20000, "seed": 7}
+    first = client.post("/calculate/roi/simulate", json=scenario)
+    assert first.status_code == 200
+    data = first.json()
+    assert data["break_even_days"]["p5"] <= data["break_even_days"]["p50"] <= data["break_even_days"]["p95"]
+    # Same seed, same result
+    assert client.post("/calculate/roi/simulate", json=scenario).json() == data
+
 def test_regulation_check():
     # Test compliant case
     response = client.get("/tools/regulation-check?weight_kg=0.2&zone=Green&altitude_ft=50")
@@ -39,6 +74,28 @@ def test_regulation_check():
     data = response.json()
     assert data["flight_status"] == "🚫 No-Fly Zone"
 
+def test_find_drones():
+    response = client.get("/tools/find-drones?category=small&budget=700000&min_flight_time=35")
+    assert response.status_code == 200
+    models = [d["model"] for d in response.json()]
+    assert models == ["Garuda Kisan Drone", "Marut AG-365"]
+
+def test_compliance_batch():
+    flights = [
+        {"weight_kg": 5.0, "zone": "Green", "altitude_ft": 500, "purpose": "Commercial"},
+        {"weight_kg": 0.2, "zone": "Yellow", "altitude_ft": 50}
+    ]
+    response = client.post("/check/compliance/batch", json=flights)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["row"] for row in rows] == [0, 1]
+    assert rows[0]["status"] == "Non-Compliant"
+    assert rows[1]["required_permits"] == ["ATC Permission required (Yellow Zone)."]
+
+    empty = client.post("/check/compliance/batch", json=[])
+    assert empty.status_code == 200
+    assert empty.text == "" and empty.headers["X-Total-Rows"] == "0"
+
 def test_chat_endpoint():
     # This might fail if OpenAI key is not present or mock is not set up, 
     # but it tests the route existence and basic orchestration.
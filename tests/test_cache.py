@@ -0,0 +1,53 @@
+import time
+import asyncio
+from langchain_core.embeddings import Embeddings
+from rag.cache import DiskCache, CachedEmbeddings
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic offline embeddings that record which texts were sent to the 'API'."""
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0, 0.5] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+def test_disk_cache_lru_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set_many({"a": b"1", "b": b"2"})
+    time.sleep(0.01)
+    assert cache.get_many(["a", "missing"]) == {"a": b"1"}
+    time.sleep(0.01)
+    cache.set_many({"c": b"3"})
+    assert len(cache) == 2
+    assert cache.get_many(["a", "b", "c"]) == {"a": b"1", "c": b"3"}
+
+def test_disk_cache_persists(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    DiskCache(path).set_many({"key": b"value"})
+    assert DiskCache(path).get_many(["key"]) == {"key": b"value"}
+
+def test_cached_embeddings(tmp_path):
+    underlying = CountingEmbeddings()
+    embeddings = CachedEmbeddings(underlying, "test-model", DiskCache(str(tmp_path / "embeddings.sqlite")))
+    first = embeddings.embed_documents(["alpha", "beta", "alpha"])
+    assert underlying.calls == [["alpha", "beta"]]
+    assert first == [[5.0, 1.0, 0.5], [4.0, 1.0, 0.5], [5.0, 1.0, 0.5]]
+
+    assert embeddings.embed_query("beta") == first[1]
+    assert asyncio.run(embeddings.aembed_documents(["alpha", "gamma"])) == [first[0], [5.0, 1.0, 0.5]]
+    assert underlying.calls == [["alpha", "beta"], ["gamma"]]
+    assert embeddings.stats() == {"hits": 3, "misses": 3, "entries": 3}
+
+def test_cached_embeddings_keyed_by_model(tmp_path):
+    cache = DiskCache(str(tmp_path / "embeddings.sqlite"))
+    underlying = CountingEmbeddings()
+    CachedEmbeddings(underlying, "model-a", cache).embed_documents(["text"])
+    CachedEmbeddings(underlying, "model-b", cache).embed_documents(["text"])
+    assert underlying.calls == [["text"], ["text"]]
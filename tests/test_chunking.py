@@ -0,0 +1,65 @@
+import os
+from langchain_core.documents import Document
+import rag.chunking as chunking
+from rag.chunking import ParentStore, is_heading, split_into_chunks, _page_sections
+
+BODY = "The remote pilot shall keep the drone within visual line of sight at all times during the operation. " * 3
+
+def test_is_heading():
+    assert is_heading("7. Procedure for obtaining RPTO Authorisation")
+    assert is_heading("CHAPTER – 2")
+    assert is_heading("Annexure-I")
+    assert not is_heading("7.2. The applicant shall submit the form")
+    assert not is_heading("97 D'AVIATORS LLP")
+    assert is_heading("Remote Pilot License") and not is_heading("Remote Pilot License", after_blank=False)
+
+def test_page_sections():
+    page = f"continued from the previous page {BODY}\n\nRule 34\n{BODY}\n\n5. Penalties for violations\n{BODY}"
+    sections = _page_sections(page, "Rule 33")
+    assert [heading for _, heading, _ in sections] == ["Rule 33", "Rule 34", "5. Penalties for violations"]
+    assert "".join(text for _, _, text in sections) == page
+    assert all(page[start:].startswith(text) for start, _, text in sections)
+
+def test_page_sections_heading_on_first_line():
+    sections = _page_sections(f"CHAPTER – 3\n{BODY}\n\nRule 12\n{BODY}", "Rule 11")
+    assert [heading for _, heading, _ in sections] == ["CHAPTER – 3", "Rule 12"]
+
+def test_split_into_chunks_sections(monkeypatch):
+    monkeypatch.setattr(chunking, "CHUNKING_MODE", "sections")
+    pages = [Document(page_content=f"{BODY}\n\nRule 5\n{BODY * 3}\n\nRule 6\n{BODY}", metadata={"source": "rules.pdf", "page": 0}),
+             Document(page_content=f"{BODY}\n\nRule 7\n{BODY}", metadata={"source": "rules.pdf", "page": 1})]
+    chunks, parents = split_into_chunks(pages, "rules.pdf")
+    assert [p["metadata"].get("section") for p in parents.values()] == [None, "Rule 5", "Rule 6", "Rule 6", "Rule 7"]
+
+    for chunk_id, chunk in chunks:
+        assert chunk_id.startswith("rules.pdf::") and len(chunk.page_content) <= chunking.CHILD_CHUNK_SIZE
+        parent = parents[chunk.metadata["parent_id"]]
+        assert chunk.page_content in parent["text"]
+        # Children keep page-level offsets
+        page = pages[chunk.metadata["page"]].page_content
+        start = chunk.metadata["start_index"]
+        assert page[start:start + len(chunk.page_content)] == chunk.page_content
+
+def test_split_into_chunks_flat(monkeypatch):
+    monkeypatch.setattr(chunking, "CHUNKING_MODE", "flat")
+    chunks, parents = split_into_chunks([Document(page_content=BODY * 10, metadata={})], "doc")
+    assert parents == {}
+    assert all(len(chunk.page_content) <= chunking.FLAT_CHUNK_SIZE for _, chunk in chunks)
+
+def test_parent_store_reload(monkeypatch, tmp_path):
+    path = str(tmp_path / "parent_sections.json")
+    monkeypatch.setattr(chunking, "PARENT_STORE_PATH", path)
+    monkeypatch.setattr(chunking, "_parent_store", None)
+    monkeypatch.setattr(chunking, "_parent_mtime", None)
+
+    assert len(chunking.get_parent_store()) == 0
+    chunking.add_parent_sections({"doc::s0": {"text": "Rule 5", "metadata": {}}})
+    assert ParentStore.load(path).get("doc::s0") == {"text": "Rule 5", "metadata": {}}
+
+    # Another process rewrites the file: the next lookup reloads it
+    other = ParentStore()
+    other.add({"doc::s1": {"text": "Rule 6", "metadata": {}}})
+    other.save(path)
+    os.utime(path, (1, 1))
+    store = chunking.get_parent_store()
+    assert store.get("doc::s0") is None and store.get("doc::s1")["text"] == "Rule 6"
@@ -0,0 +1,158 @@
+import time
+import asyncio
+import threading
+import httpx
+from rag.clients import ModelLimiter, PoolStats, _ModelTransport, _AsyncModelTransport
+
+class _Gauge:
+    """Counts requests inside the fake pools, from any thread or loop."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.connections = 0
+
+    def enter(self):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            # The first request opens the (single) connection; the others reuse it
+            self.connections += 1
+            return self.connections == 1
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+class FakePool(httpx.BaseTransport):
+    def __init__(self, gauge):
+        self.gauge = gauge
+
+    def handle_request(self, request):
+        if self.gauge.enter():
+            request.extensions["trace"]("connection.connect_tcp.complete", {})
+            request.extensions["trace"]("connection.start_tls.complete", {})
+        time.sleep(0.005)
+        self.gauge.leave()
+        # An unread stream, like the connection pool returns (the slot is released when it is closed)
+        return httpx.Response(200, stream=httpx.ByteStream(b"ok"))
+
+class FakeAsyncPool(httpx.AsyncBaseTransport):
+    def __init__(self, gauge):
+        self.gauge = gauge
+
+    async def handle_async_request(self, request):
+        if self.gauge.enter():
+            await request.extensions["trace"]("connection.connect_tcp.complete", {})
+        await asyncio.sleep(0.005)
+        self.gauge.leave()
+        return httpx.Response(200, stream=httpx.ByteStream(b"ok"))
+
+def test_limiter_caps_mixed_sync_and_async_callers():
+    limiter, gauge = ModelLimiter("test-model", 3), _Gauge()
+    sync_stats, async_stats = PoolStats(), PoolStats()
+
+    def sync_caller():
+        with httpx.Client(transport=_ModelTransport(FakePool(gauge), sync_stats, limiter)) as client:
+            for _ in range(10):
+                assert client.get("http://model.test/").text == "ok"
+
+    async def async_callers():
+        async with httpx.AsyncClient(transport=_AsyncModelTransport(FakeAsyncPool(gauge), async_stats, limiter)) as client:
+            responses = await asyncio.gather(*[client.get("http://model.test/") for _ in range(20)])
+            assert all(r.text == "ok" for r in responses)
+
+    threads = [threading.Thread(target=sync_caller) for _ in range(3)] + \
+              [threading.Thread(target=asyncio.run, args=(async_callers(),)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert not any(thread.is_alive() for thread in threads)
+
+    assert gauge.peak == 3
+    stats = limiter.stats()
+    assert (stats["requests"], stats["in_flight"], stats["waiting"]) == (70, 0, 0)
+    assert limiter._free == 3 and not limiter._waiters
+    assert sync_stats.stats()["requests"] == 30 and async_stats.stats()["requests"] == 40
+
+def test_limiter_serves_waiters_in_fifo_order():
+    limiter, order = ModelLimiter("test-model", 1), []
+
+    async def waiter(name):
+        await limiter.aacquire()
+        order.append(name)
+        limiter.release()
+
+    def thread_waiter():
+        limiter.acquire()
+        order.append("thread")
+        limiter.release()
+
+    async def main():
+        await limiter.aacquire()
+        first = asyncio.create_task(waiter("first"))
+        await asyncio.sleep(0)
+        thread = threading.Thread(target=thread_waiter)
+        thread.start()
+        while limiter.stats()["waiting"] < 2:
+            await asyncio.sleep(0.001)
+        last = asyncio.create_task(waiter("last"))
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(first, last)
+        await asyncio.to_thread(thread.join)
+
+    asyncio.run(main())
+    assert order == ["first", "thread", "last"]
+
+def test_limiter_waiter_cancelled_during_handover_passes_the_slot_on():
+    limiter = ModelLimiter("test-model", 1)
+
+    async def main():
+        await limiter.aacquire()
+        waiter = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0)
+        # The slot is handed to the waiter, which is cancelled before it gets to run
+        limiter.release()
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        await asyncio.wait_for(limiter.aacquire(), 1)
+        limiter.release()
+
+    asyncio.run(main())
+    assert limiter._free == 1 and not limiter._waiters
+    assert limiter.stats()["waiting"] == 0 and limiter.stats()["in_flight"] == 0
+
+def test_limiter_waiter_cancelled_while_queued():
+    limiter = ModelLimiter("test-model", 1)
+
+    async def main():
+        await limiter.aacquire()
+        waiter = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+
+    asyncio.run(main())
+    assert limiter._free == 1 and not limiter._waiters and limiter.stats()["waiting"] == 0
+
+def test_pool_stats():
+    stats = PoolStats()
+    assert stats.stats()["reuse_ratio"] == 0.0
+    for event in ["request", "connection.connect_tcp.complete", "connection.start_tls.complete",
+                  "request", "request", "request", "http11.send_request_headers.started"]:
+        stats.record(event)
+    assert stats.stats() == {"requests": 4, "new_connections": 1, "tls_handshakes": 1, "reuse_ratio": 0.75}
+
+def test_transports_record_connection_reuse():
+    limiter, gauge, stats = ModelLimiter("test-model", 2), _Gauge(), PoolStats()
+    with httpx.Client(transport=_ModelTransport(FakePool(gauge), stats, limiter)) as client:
+        for _ in range(4):
+            client.get("http://model.test/")
+    assert stats.stats() == {"requests": 4, "new_connections": 1, "tls_handshakes": 1, "reuse_ratio": 0.75}
+    assert limiter.stats()["in_flight"] == 0
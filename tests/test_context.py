@@ -0,0 +1,43 @@
+from langchain_core.documents import Document
+import rag.context as context
+from rag.chunking import ParentStore
+from rag.context import assemble_context, cite_sources, count_tokens
+
+def _chunk(text, start, page=0, source="rules.pdf", **metadata):
+    return Document(page_content=text, metadata={"source": source, "page": page, "start_index": start, **metadata})
+
+def test_assemble_context_merges_overlapping_chunks():
+    page = "Drone operators must register every drone on the Digital Sky platform before flying. " * 4
+    docs = [_chunk(page[100:250], 100), _chunk(page[0:120], 0)]
+    text, used, usage = assemble_context(docs, token_budget=1000)
+    assert text == page[0:250]
+    assert len(used) == 2
+    assert usage == {"context_tokens": count_tokens(text), "context_budget": 1000, "expanded_sections": 0}
+
+def test_assemble_context_token_budget():
+    sections = [_chunk(f"Section {i}: " + "pilot certificate rules " * 40, 0, page=i) for i in range(3)]
+    budget = count_tokens(sections[0].page_content) + context.MIN_SECTION_TOKENS + 10
+    text, used, usage = assemble_context(sections, token_budget=budget)
+    assert usage["context_tokens"] <= budget
+    # The first section fits, the second is truncated, the last would be below MIN_SECTION_TOKENS and is dropped
+    assert text.startswith("Section 0") and "Section 1" in text and "Section 2" not in text
+    assert [doc.metadata["page"] for doc in used] == [0, 1]
+
+def test_assemble_context_expands_to_parent(monkeypatch):
+    parent = "Rule 5. Registration. " + "Every drone needs a unique identification number. " * 5
+    store = ParentStore()
+    store.add({"rules::s0": {"text": parent, "metadata": {}}})
+    monkeypatch.setattr(context, "get_parent_store", lambda: store)
+    children = [_chunk(parent[22:80], 22, parent_id="rules::s0"), _chunk(parent[150:200], 150, parent_id="rules::s0")]
+
+    text, used, usage = assemble_context(children, token_budget=1000)
+    assert text == parent and len(used) == 2 and usage["expanded_sections"] == 1
+
+    # Not enough spare budget: the matched children are kept as they are
+    monkeypatch.setattr(context, "PARENT_EXPANSION_TOKENS", 10)
+    text, _, usage = assemble_context(children, token_budget=1000)
+    assert text != parent and usage["expanded_sections"] == 0
+
+def test_cite_sources():
+    docs = [_chunk("a", 0, page=4), _chunk("b", 0, page=1), _chunk("c", 0, page=4), _chunk("d", 0, source="faq.md", page=None)]
+    assert cite_sources(docs) == ["rules.pdf (pp. 2, 5)", "faq.md"]
@@ -0,0 +1,126 @@
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+import rag.embedder as embedder
+import rag.lexical as lexical
+import rag.chunking as chunking
+import scripts.database_setup as database_setup
+from rag.vector_store import NumpyVectorStore
+from scripts.retrieval_benchmark import HashingEmbeddings
+
+BODY = "The remote pilot shall keep the drone within visual line of sight at all times during the operation. " * 3
+
+class RecordingEmbeddings(HashingEmbeddings):
+    """Offline hashing embedder that records every text sent for embedding."""
+    def __init__(self):
+        super().__init__(dim=64)
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+    def stats(self):
+        return {"hits": 0, "misses": len(self.texts), "entries": 0}
+
+class KnowledgeBase:
+    def __init__(self, root):
+        self.corpus = root / "corpus" / "raw"
+        self.db = root / "db"
+        self.corpus.mkdir(parents=True)
+        self.embeddings = RecordingEmbeddings()
+
+    def write(self, name: str, text: str):
+        (self.corpus / name).write_text(text, encoding="utf-8")
+
+    def build(self):
+        """Runs the setup script; returns the texts it embedded."""
+        self.embeddings.texts.clear()
+        database_setup.setup_database(workers=1)
+        return list(self.embeddings.texts)
+
+    def manifest(self):
+        return json.loads((self.db / "manifest.json").read_text(encoding="utf-8"))
+
+    def chunk_ids(self):
+        return sorted(embedder._vector_db._ids)
+
+    def version(self):
+        return (self.db / "collection_version").read_text()
+
+@pytest.fixture
+def kb(monkeypatch, tmp_path):
+    """
+    The setup script pointed at a throwaway corpus and store: NumPy backend, hashing embedder,
+    and a thread pool instead of spawned parse processes.
+    """
+    kb = KnowledgeBase(tmp_path)
+    db = str(kb.db)
+    monkeypatch.setattr(database_setup, "BASE_DIR", str(kb.corpus.parent))
+    monkeypatch.setattr(database_setup, "FOLDERS", {"raw": str(kb.corpus)})
+    monkeypatch.setattr(database_setup, "DB_DIR", db)
+    monkeypatch.setattr(database_setup, "MANIFEST_PATH", str(kb.db / "manifest.json"))
+    monkeypatch.setattr(database_setup, "LEXICAL_INDEX_PATH", str(kb.db / "lexical_index.json"))
+    monkeypatch.setattr(database_setup, "PARENT_STORE_PATH", str(kb.db / "parent_sections.json"))
+    monkeypatch.setattr(database_setup, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(database_setup, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+
+    monkeypatch.setattr(lexical, "LEXICAL_INDEX_PATH", str(kb.db / "lexical_index.json"))
+    monkeypatch.setattr(lexical, "_lexical_index", None)
+    monkeypatch.setattr(lexical, "_lexical_mtime", None)
+    monkeypatch.setattr(chunking, "PARENT_STORE_PATH", str(kb.db / "parent_sections.json"))
+    monkeypatch.setattr(chunking, "_parent_store", None)
+    monkeypatch.setattr(chunking, "_parent_mtime", None)
+
+    monkeypatch.setattr(embedder, "DB_DIR", db)
+    monkeypatch.setattr(embedder, "VERSION_PATH", str(kb.db / "collection_version"))
+    monkeypatch.setattr(embedder, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(embedder, "_embeddings", kb.embeddings)
+    monkeypatch.setattr(embedder, "_vector_db", NumpyVectorStore(str(kb.db / "numpy_store"), embedding_function=kb.embeddings))
+
+    kb.write("rules.txt", f"Drone Rules 2021\n\nRule 5\n{BODY}\n\nRule 6\n{BODY}")
+    kb.write("spraying.md", f"# Spraying\n\n{BODY * 2}")
+    return kb
+
+def test_unchanged_files_are_skipped(kb):
+    first = kb.build()
+    ids, version = kb.chunk_ids(), kb.version()
+    assert first and len(ids) == len(first)
+    assert sorted(kb.manifest()["files"]) == ["raw/rules.txt", "raw/spraying.md"]
+
+    # Nothing changed: nothing is embedded and cached answers stay valid
+    assert kb.build() == []
+    assert kb.chunk_ids() == ids and kb.version() == version
+
+    # Only the edited file is re-embedded
+    kb.write("spraying.md", "# Spraying\n\nSpraying drones need a type certificate.")
+    assert kb.build() == ["# Spraying\n\nSpraying drones need a type certificate."]
+    assert [i for i in kb.chunk_ids() if i.startswith("raw/rules.txt")] == [i for i in ids if i.startswith("raw/rules.txt")]
+    assert kb.version() != version
+
+@pytest.mark.parametrize("key", ["metadata_version", "vector_backend", "chunking"])
+def test_stale_manifest_forces_full_rebuild(kb, key):
+    first = kb.build()
+    ids = kb.chunk_ids()
+    manifest = kb.manifest()
+    current = manifest[key]
+    manifest[key] = "stale"
+    (kb.db / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+    # Every file is re-embedded into an emptied store, without leftover rows
+    assert sorted(kb.build()) == sorted(first)
+    assert kb.chunk_ids() == ids
+    assert kb.manifest()[key] == current
+
+def test_deleted_file_chunks_are_removed(kb):
+    kb.build()
+    removed = [i for i in kb.chunk_ids() if i.startswith("raw/spraying.md")]
+    parent_ids = kb.manifest()["files"]["raw/spraying.md"]["parent_ids"]
+    assert removed and parent_ids
+
+    (kb.corpus / "spraying.md").unlink()
+    assert kb.build() == []
+    assert kb.chunk_ids() and not any(i.startswith("raw/spraying.md") for i in kb.chunk_ids())
+    assert list(kb.manifest()["files"]) == ["raw/rules.txt"]
+    assert not any(chunk_id in lexical.get_lexical_index().docs for chunk_id in removed)
+    assert all(chunking.get_parent_store().get(parent_id) is None for parent_id in parent_ids)
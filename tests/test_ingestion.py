@@ -0,0 +1,53 @@
+import os
+import time
+import api.services.ingestion as ingestion
+from api.services.ingestion import IngestionJobs
+
+def _wait(jobs, job_id, timeout: float = 5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if job["finished_at"] is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def _spool(jobs, name: str):
+    fd, path = jobs.new_spool_file(name)
+    with os.fdopen(fd, "wb") as f:
+        f.write(b"Drone Rules 2021")
+    return path
+
+def test_ingestion_job_progress(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingestion, "SPOOL_DIR", str(tmp_path))
+
+    def fake_ingest(path, content_type, source_name=None, progress=None):
+        assert source_name == "rules.txt"
+        progress(2, 4)
+        return 4
+
+    monkeypatch.setattr(ingestion, "ingest_multimodal_data", fake_ingest)
+    jobs = IngestionJobs(max_workers=1)
+    path = _spool(jobs, "rules.txt")
+    assert path.endswith(".txt") and os.path.dirname(path) == str(tmp_path)
+
+    job = _wait(jobs, jobs.submit(path, "rules.txt", "text/plain"))
+    assert (job["status"], job["chunks_embedded"], job["chunks_total"], job["error"]) == ("completed", 4, 4, None)
+    # The spool file is removed once the worker is done with it
+    jobs._pool.shutdown(wait=True)
+    assert not os.path.exists(path)
+
+def test_ingestion_job_failure(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingestion, "SPOOL_DIR", str(tmp_path))
+
+    def failing_ingest(path, content_type, source_name=None, progress=None):
+        raise ValueError("unsupported file")
+
+    monkeypatch.setattr(ingestion, "ingest_multimodal_data", failing_ingest)
+    jobs = IngestionJobs(max_workers=1)
+    path = _spool(jobs, "scan.bin")
+    job = _wait(jobs, jobs.submit(path, "scan.bin", "application/octet-stream"))
+    assert (job["status"], job["error"]) == ("failed", "unsupported file")
+    jobs._pool.shutdown(wait=True)
+    assert not os.path.exists(path)
+    assert jobs.get("unknown") is None
@@ -0,0 +1,49 @@
+from langchain_core.documents import Document
+from rag.lexical import BM25Index, tokenize, reciprocal_rank_fusion
+
+def _index():
+    index = BM25Index()
+    index.add(["rules", "form", "roi"], [
+        Document(page_content="Drone Rules 2021: a remote pilot certificate is required.", metadata={"doc_type": "regulation", "year": 2021}),
+        Document(page_content="Apply with form DTC-1-of-2022 on the Digital Sky platform.", metadata={"doc_type": "regulation", "year": 2022}),
+        Document(page_content="Agricultural spraying drones break even within a season.", metadata={"doc_type": "business_case"})
+    ])
+    return index
+
+def test_tokenize_keeps_identifiers():
+    assert tokenize("Form DTC-1-of-2022") == ["form", "dtc-1-of-2022", "dtc", "1", "of", "2022"]
+
+def test_bm25_search():
+    index = _index()
+    assert [doc.id for doc, _ in index.search("DTC-1-of-2022")] == ["form"]
+    results = index.search("remote pilot certificate rules")
+    assert results[0][0].id == "rules"
+    assert results[0][1] > 0
+    assert index.search("quadcopter") == []
+
+def test_bm25_filters():
+    index = _index()
+    assert [doc.id for doc, _ in index.search("drones", filters={"doc_type": "business_case"})] == ["roi"]
+    assert [doc.id for doc, _ in index.search("2021 2022", filters={"year": [2022]})] == ["form"]
+
+def test_bm25_add_remove_and_reload(tmp_path):
+    index = _index()
+    index.add(["roi"], [Document(page_content="Survey drones map fields.", metadata={})])
+    assert index.search("spraying") == []
+    assert [doc.id for doc, _ in index.search("survey")] == ["roi"]
+    index.remove(["roi", "missing"])
+    assert len(index) == 2
+    assert index.search("survey") == []
+
+    path = str(tmp_path / "lexical_index.json")
+    index.save(path)
+    reloaded = BM25Index.load(path)
+    assert reloaded.docs == index.docs
+    assert reloaded.search("pilot") == index.search("pilot")
+
+def test_reciprocal_rank_fusion():
+    a, b, c = (Document(page_content=text, id=text) for text in "abc")
+    fused = reciprocal_rank_fusion([[a, b], [b, c]])
+    assert [doc.id for doc in fused] == ["b", "a", "c"]
+    # Documents without an id are matched on their text
+    assert len(reciprocal_rank_fusion([[Document(page_content="x")], [Document(page_content="x")]])) == 1
@@ -0,0 +1,59 @@
+import pytest
+from rag.metadata import classify_document, extract_year, document_metadata, to_chroma_filter, matches_filters
+from rag.vector_store import _matches_where
+
+@pytest.mark.parametrize("name, origin, doc_type", [
+    ("Drone (Amendment) Rules 2022.pdf", "raw", "regulation"),
+    ("DTC-1-of-2022-RPTO-Authorisation.pdf", "raw", "regulation"),
+    ("DGCA-APPROVED-RPI-LIST-INDUSTRY.pdf", "raw", "regulation"),
+    # "enlistment" is checked before the technical "models"
+    ("EnlistmentDroneModels.pdf", "raw", "regulation"),
+    ("TrainingInstitutes and certification.json", "processed", "regulation"),
+    ("Making-a-successful-business-case-for-drone-technology.pdf", "raw", "business_case"),
+    ("Use of Drone Technology on Commercial Construction Projects.pdf", "raw", "business_case"),
+    ("roi_scenarios.csv", "synthetic", "business_case"),
+    ("flight_logs.csv", "synthetic", "flight_log"),
+    ("technical.txt", "raw", "technical"),
+    ("drone_models.csv", "processed", "technical"),
+    # No keyword: the origin folder decides
+    ("drone_companies.csv", "processed", "dataset"),
+    ("photo.png", "upload", "upload"),
+    ("notes.txt", "raw", "reference"),
+    ("rules_overview.md", "docs", "documentation"),
+])
+def test_classify_document(name, origin, doc_type):
+    assert classify_document(f"/data/{origin}/{name}", origin) == doc_type
+
+@pytest.mark.parametrize("name, text, year", [
+    ("Drone (Amendment) Rules 2022.pdf", "", 2022),
+    ("DTC-1-of-2022-RPTO-Authorisation.pdf", "", 2022),
+    ("Drone  Rules.pdf", "MINISTRY OF CIVIL AVIATION\nThe Drone Rules, 2021", 2021),
+    ("Drone  Rules.pdf", "Circular 2023 on drone imports", 2023),
+    ("Drone  Rules.pdf", "A 2019 survey of drone operators", None),
+    ("Drone  Rules.pdf", "", None),
+])
+def test_extract_year(name, text, year):
+    assert extract_year(name, text) == year
+
+def test_document_metadata():
+    assert document_metadata("Drone  Rules.pdf", "raw", "The Drone Rules, 2021") == \
+        {"doc_type": "regulation", "origin": "raw", "year": 2021}
+    assert document_metadata("Drone  Rules.pdf", "raw") == {"doc_type": "regulation", "origin": "raw"}
+    # Only regulations carry a year
+    assert document_metadata("roi_2023.csv", "synthetic") == {"doc_type": "business_case", "origin": "synthetic"}
+
+@pytest.mark.parametrize("metadata, filters, expected", [
+    ({"doc_type": "regulation", "year": 2021}, None, True),
+    ({"doc_type": "regulation", "year": 2021}, {"doc_type": "regulation"}, True),
+    ({"doc_type": "technical"}, {"doc_type": "regulation"}, False),
+    ({"doc_type": "regulation", "year": 2022}, {"year": [2021, 2022]}, True),
+    ({"doc_type": "regulation", "year": 2020}, {"year": [2021, 2022]}, False),
+    # A regulation without a known year does not match a year filter
+    ({"doc_type": "regulation"}, {"year": 2022}, False),
+    ({"doc_type": "regulation", "year": 2022}, {"doc_type": "regulation", "year": (2022,)}, True),
+    ({"doc_type": "regulation", "year": 2022}, {"doc_type": "technical", "year": 2022}, False),
+])
+def test_metadata_filters(metadata, filters, expected):
+    # The BM25 index (matches_filters) and the vector stores (Chroma `where`) agree
+    assert matches_filters(metadata, filters) is expected
+    assert _matches_where(metadata, to_chroma_filter(filters)) is expected
@@ -0,0 +1,185 @@
+import asyncio
+import pytest
+import api.services.orchestrator as orchestrator
+from api.services.answer_cache import AnswerCache
+from api.services.orchestrator import DroneOrchestrator, _Broadcast
+
+TOKENS = ["Drones ", "need ", "a ", "UIN."]
+
+@pytest.fixture
+def stubbed(monkeypatch):
+    """
+    A DroneOrchestrator with an empty answer cache and stubbed generation.
+    `calls` lists the queries actually generated; set `fail` to make generation raise.
+    """
+    state = {"calls": [], "fail": None}
+
+    async def fake_stream(user_query, filters=None):
+        state["calls"].append(user_query)
+        yield {"event": "sources", "sources": ["Drone Rules 2021.pdf (p. 4)"]}
+        for i, token in enumerate(TOKENS):
+            await asyncio.sleep(0.02)
+            if state["fail"] and i == 2:
+                raise state["fail"]
+            yield {"event": "token", "content": token}
+
+    async def fake_route(self, user_query):
+        state["calls"].append(user_query)
+        await asyncio.sleep(0.05)
+        if state["fail"]:
+            raise state["fail"]
+        return {"answer": "".join(TOKENS), "sources": []}
+
+    async def no_cached_answer(self, user_query):
+        return None, None
+
+    monkeypatch.setattr(orchestrator, "astream_drone_response", fake_stream)
+    monkeypatch.setattr(orchestrator, "answer_cache", AnswerCache())
+    monkeypatch.setattr(DroneOrchestrator, "_route", fake_route)
+    monkeypatch.setattr(DroneOrchestrator, "_cached_answer", no_cached_answer)
+    return DroneOrchestrator(), state
+
+async def _later(coro, delay: float):
+    await asyncio.sleep(delay)
+    return await coro
+
+async def _collect(stream, delay: float = 0):
+    await asyncio.sleep(delay)
+    return [event async for event in stream]
+
+def _answer(events):
+    return "".join(e["content"] for e in events if e["event"] == "token")
+
+def test_concurrent_identical_queries_generate_once(stubbed):
+    orch, state = stubbed
+
+    async def main():
+        return await asyncio.gather(*[orch.process_query("What is a UIN?") for _ in range(5)],
+                                    orch.process_query("what is a  UIN"))
+
+    results = asyncio.run(main())
+    assert state["calls"] == ["What is a UIN?"]
+    assert all(r["answer"] == "Drones need a UIN." and r["cached"] is False for r in results)
+    assert orch.stats()["coalescing"] == {"in_flight": 0, "leader_requests": 1, "coalesced_requests": 5}
+
+def test_concurrent_identical_streams_generate_once(stubbed):
+    orch, state = stubbed
+
+    async def main():
+        return await asyncio.gather(*[_collect(orch.stream_query("What is a UIN?")) for _ in range(4)])
+
+    streams = asyncio.run(main())
+    assert state["calls"] == ["What is a UIN?"]
+    assert all(events == streams[0] for events in streams)
+    assert _answer(streams[0]) == "Drones need a UIN."
+    assert streams[0][0]["event"] == "sources" and streams[0][-1] == {"event": "done", "cached": False}
+    assert orch.coalesced_requests == 3
+
+def test_late_stream_follower_replays_missed_chunks(stubbed):
+    orch, state = stubbed
+
+    async def main():
+        # Joins after the leader has already sent the sources and some tokens
+        return await asyncio.gather(_collect(orch.stream_query("What is a UIN?")),
+                                    _collect(orch.stream_query("What is a UIN?"), delay=0.05),
+                                    _later(orch.process_query("What is a UIN?"), 0.01))
+
+    leader, follower, joined = asyncio.run(main())
+    assert state["calls"] == ["What is a UIN?"]
+    assert follower == leader
+    # Non-streaming requests join the streamed answer too
+    assert joined["answer"] == "Drones need a UIN." and joined["sources"] == ["Drone Rules 2021.pdf (p. 4)"]
+    assert orchestrator.answer_cache.get("what is a uin")["answer"] == "Drones need a UIN."
+
+def test_leader_error_reaches_every_follower(stubbed):
+    orch, state = stubbed
+    state["fail"] = RuntimeError("LLM down")
+
+    async def main():
+        return await asyncio.gather(_collect(orch.stream_query("What is a UIN?")),
+                                    _collect(orch.stream_query("What is a UIN?"), delay=0.01),
+                                    _later(orch.process_query("What is a UIN?"), 0.01),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert state["calls"] == ["What is a UIN?"]
+    assert all(isinstance(r, RuntimeError) and str(r) == "LLM down" for r in results)
+    assert orch._in_flight == {} and orch._broadcasts == {}
+
+    async def non_streaming():
+        return await asyncio.gather(*[orch.process_query("Rules?") for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(non_streaming()))
+    assert orch._in_flight == {}
+    assert orchestrator.answer_cache.stats()["entries"] == 0
+
+def test_in_flight_cleaned_up_after_success(stubbed):
+    orch, state = stubbed
+
+    async def main():
+        await _collect(orch.stream_query("What is a UIN?"))
+        await orch.process_query("Rules?")
+        return dict(orch._in_flight), dict(orch._broadcasts)
+
+    assert asyncio.run(main()) == ({}, {})
+    # Finished answers are not joined again: the next identical request starts a new one
+    asyncio.run(orch.process_query("Rules?"))
+    assert state["calls"] == ["What is a UIN?", "Rules?", "Rules?"]
+
+def test_broadcast_replays_to_late_subscribers():
+    async def main():
+        broadcast = _Broadcast()
+        early = asyncio.create_task(_collect(broadcast.subscribe()))
+        for i in range(3):
+            await broadcast.publish({"n": i})
+        await broadcast.close()
+        return await early, await _collect(broadcast.subscribe())
+
+    early, late = asyncio.run(main())
+    assert early == late == [{"n": 0}, {"n": 1}, {"n": 2}]
+
+def test_embedding_failure_falls_back_to_lexical(monkeypatch):
+    import rag.retriever as retriever
+    from langchain_core.documents import Document
+
+    class DownEmbeddings:
+        async def aembed_query(self, query):
+            raise ConnectionError("embedding service down")
+
+    lexical = [Document(page_content="Drone Rules 2021", metadata={})]
+    monkeypatch.setattr(retriever, "get_embeddings", lambda: DownEmbeddings())
+    monkeypatch.setattr(retriever, "_lexical_search", lambda query, filters=None: lexical)
+    monkeypatch.setattr(orchestrator, "answer_cache", AnswerCache())
+
+    assert asyncio.run(DroneOrchestrator()._cached_answer("Is a UIN needed for a nano drone?")) == (None, None)
+    assert asyncio.run(retriever.aretrieve_relevant_docs("Is a UIN needed for a nano drone?", mode="hybrid")) == lexical
+
+@pytest.mark.parametrize("query", [
+    "What are the rules for flying near an airport?",
+    "Do I need a UIN for a nano drone?",
+    "How do I get a Remote Pilot Certificate?",
+    "Is my farm in a red zone?",
+    "What is the penalty for flying without registration?",
+    "How do I register my drone?",
+    "Which drones need a type certificate?",
+    "How do I apply on Digital Sky?",
+    "Can I fly over a no-fly area?",
+    "List of DGCA approved RPTOs",
+    "Is it legal to fly at night?",
+    "What fines apply for flying in controlled airspace?",
+])
+def test_regulation_questions_are_filtered(query):
+    assert orchestrator.retrieval_filters(query) == {"doc_type": "regulation"}
+
+@pytest.mark.parametrize("query", [
+    "What is the ROI of a spraying drone?",
+    "How long can a quadcopter fly on one battery?",
+    "Top agricultural drone companies in India",
+    "Which is the finest camera drone?",
+    "How do I calibrate the compass before takeoff?",
+    # Keywords only match whole words
+    "Lawson drone review",
+    "Rulers and scales for aerial survey maps",
+])
+def test_other_questions_search_every_document(query):
+    assert orchestrator.retrieval_filters(query) is None
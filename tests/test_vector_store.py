@@ -0,0 +1,112 @@
+import numpy as np
+from rag.metadata import to_chroma_filter, matches_filters
+from rag.vector_store import NumpyVectorStore, mmr_select, quantize_rows
+
+def _corpus(n: int = 200, dim: int = 32, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"doc::{i}" for i in range(n)]
+    metadatas = [{"doc_type": "regulation" if i % 2 else "technical", "year": 2021 + i % 3} for i in range(n)]
+    return ids, vectors, [f"chunk {i}" for i in range(n)], metadatas
+
+def _store(path, precision: str = "float32", **kwargs):
+    ids, vectors, texts, metadatas = _corpus(**kwargs)
+    store = NumpyVectorStore(str(path), precision=precision)
+    store.upsert(ids, vectors, texts, metadatas)
+    store.save()
+    return store, vectors
+
+def test_to_chroma_filter():
+    assert to_chroma_filter(None) is None
+    assert to_chroma_filter({"doc_type": "regulation"}) == {"doc_type": {"$eq": "regulation"}}
+    assert to_chroma_filter({"doc_type": "regulation", "year": [2021, 2022]}) == \
+        {"$and": [{"doc_type": {"$eq": "regulation"}}, {"year": {"$in": [2021, 2022]}}]}
+    assert matches_filters({"doc_type": "regulation", "year": 2022}, {"year": [2021, 2022]})
+    assert not matches_filters({"doc_type": "regulation"}, {"year": 2022})
+
+def test_numpy_store_search_and_reload(tmp_path):
+    store, vectors = _store(tmp_path)
+    assert store.count() == 200
+    assert store.similarity_search_by_vector(vectors[17], k=1)[0].id == "doc::17"
+    # A second process sees the saved rows
+    reopened = NumpyVectorStore(str(tmp_path))
+    result = reopened.similarity_search_by_vector(vectors[42] * 3, k=3)
+    assert result[0].id == "doc::42" and result[0].page_content == "chunk 42"
+    assert result[0].metadata == {"doc_type": "technical", "year": 2021}
+
+def test_numpy_store_upsert_and_delete(tmp_path):
+    store, vectors = _store(tmp_path)
+    store.upsert(["doc::5"], [vectors[6]], ["replaced"], [{"doc_type": "technical"}])
+    store.delete(["doc::6"])
+    assert store.count() == 199
+    assert store.similarity_search_by_vector(vectors[6], k=1)[0].page_content == "replaced"
+
+def test_numpy_store_filter_masks(tmp_path):
+    store, vectors = _store(tmp_path)
+    where = to_chroma_filter({"doc_type": "regulation", "year": [2022]})
+    results = store.similarity_search_by_vector(vectors[0], k=10, filter=where)
+    assert len(results) == 10
+    assert all(doc.metadata["doc_type"] == "regulation" and doc.metadata["year"] == 2022 for doc in results)
+    # Fewer matches than k: only the matching rows come back
+    assert [doc.id for doc in store.similarity_search_by_vector(vectors[0], k=5, filter={"year": {"$eq": 1999}})] == []
+    # The cached mask is dropped when rows change
+    store.upsert(["new"], [vectors[0]], ["new"], [{"doc_type": "regulation", "year": 2022}])
+    assert store.similarity_search_by_vector(vectors[0], k=1, filter=where)[0].id == "new"
+
+def test_mmr_select_prefers_diverse_rows():
+    candidates = np.array([[1.0, 0.0], [0.99, 0.141], [0.6, 0.8]], dtype=np.float32)
+    candidates /= np.linalg.norm(candidates, axis=1, keepdims=True)
+    assert mmr_select(np.array([1.0, 0.0], dtype=np.float32), candidates, k=2, lambda_mult=0.3) == [0, 2]
+    assert mmr_select(np.array([1.0, 0.0], dtype=np.float32), candidates, k=2, lambda_mult=1.0) == [0, 1]
+
+def test_quantize_rows():
+    rows = _corpus(n=50)[1]
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    codes, scales = quantize_rows(rows, "float16")
+    assert codes.dtype == np.float16 and scales is None
+    codes, scales = quantize_rows(rows, "int8")
+    assert codes.dtype == np.int8 and scales.shape == (50,)
+    assert np.abs(codes * scales[:, None] - rows).max() <= scales.max() / 2 + 1e-6
+
+def test_quantized_store_matches_float32(tmp_path):
+    exact, vectors = _store(tmp_path / "f32")
+    queries = _corpus(n=20, seed=1)[1]
+    where = to_chroma_filter({"doc_type": "regulation"})
+    for precision, files in (("float16", ["vectors.f16"]), ("int8", ["vectors.i8", "scales.f32"])):
+        store, _ = _store(tmp_path / precision, precision=precision)
+        assert all((tmp_path / precision / name).exists() for name in files)
+        for query in queries:
+            # The quantized scan only shortlists; rescoring at float32 restores the exact order
+            assert [d.id for d in store.similarity_search_by_vector(query, k=5)] == \
+                [d.id for d in exact.similarity_search_by_vector(query, k=5)]
+            assert [d.id for d in store.max_marginal_relevance_search_by_vector(query, k=4, fetch_k=10, filter=where)] == \
+                [d.id for d in exact.max_marginal_relevance_search_by_vector(query, k=4, fetch_k=10, filter=where)]
+
+def test_quantized_copy_rebuilt_from_float32_files(tmp_path):
+    _, vectors = _store(tmp_path)
+    store = NumpyVectorStore(str(tmp_path), precision="int8")
+    assert (tmp_path / "vectors.i8").exists()
+    assert store.similarity_search_by_vector(vectors[7], k=1)[0].id == "doc::7"
+
+def test_mmr_search_returns_selection_order(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+    store.upsert(["a", "b", "c", "d"], [[1, 0, 0], [0.95, 0.3, 0], [0.8, 0, 0.6], [0.7, -0.7, 0]], ["a", "b", "c", "d"])
+    store.save()
+    # "d" is the least similar but the most different from "a", so it is picked (and returned) second
+    results = store.max_marginal_relevance_search_by_vector([1.0, 0.0, 0.0], k=3, fetch_k=4, lambda_mult=0.3)
+    assert [doc.id for doc in results] == ["a", "d", "c"]
+
+def test_numpy_store_skips_matrix_without_its_index(tmp_path):
+    store, vectors = _store(tmp_path, n=10)
+    reader = NumpyVectorStore(str(tmp_path))
+    # A save stopped between its two renames: the new matrix next to the old index
+    np.concatenate([vectors, vectors[:1]]).astype(np.float32).tofile(tmp_path / "vectors.f32")
+    assert NumpyVectorStore(str(tmp_path)).count() == 0
+    (tmp_path / "index.json").touch()
+    assert reader.similarity_search_by_vector(vectors[3], k=1)[0].id == "doc::3"
+    assert reader.count() == 10
+    # Once the index is replaced too, the next lookup picks up the new rows
+    store.upsert(["new"], [vectors[0]], ["new"])
+    store.save()
+    assert reader.count() == 10
+    assert len(reader.similarity_search_by_vector(vectors[0], k=20)) == 11